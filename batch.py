@@ -0,0 +1,246 @@
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from tqdm import tqdm
+import cv2
+
+import run
+import corpus_index
+from frame_stream import get_video_frame_count
+from parallel_metrics import resolve_workers
+
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.avi', '.mkv', '.m4v', '.webm', '.mpg', '.mpeg')
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "NUMEXPR_NUM_THREADS")
+
+
+def find_videos(source):
+    """
+    Lists the videos to process.
+
+    Parameters:
+        source (str): A directory (its video files, sorted) or a text file with one video
+            path per line. Blank lines and lines starting with '#' are ignored, and relative
+            paths are relative to the list file.
+
+    Returns:
+        list of str: Absolute video paths.
+    """
+    if os.path.isdir(source):
+        return sorted(
+            os.path.abspath(os.path.join(source, filename)) for filename in os.listdir(source)
+            if os.path.isfile(os.path.join(source, filename)) and filename.lower().endswith(VIDEO_EXTENSIONS)
+        )
+
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source) as f:
+        lines = [line.strip() for line in f]
+    return [os.path.abspath(os.path.join(base, line)) for line in lines if line and not line.startswith("#")]
+
+
+class BatchManifest:
+    """
+    Per-video job status of a batch run, saved as JSON after every change so that an
+    interrupted run can resume.
+
+    Each entry has a status ('pending', 'running', 'done' or 'failed') plus the video's size
+    and mtime, its frame count, the seconds it took and the error of a failed run.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.entries = json.load(f)
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.entries, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def update(self, video_path, **fields):
+        self.entries.setdefault(video_path, {}).update(fields)
+        self.save()
+
+    def needs_run(self, video_path, retry_failed=False):
+        """
+        False for videos that finished (and have not changed since) and, unless retry_failed,
+        for videos that failed. Videos left 'running' by a crash are run again.
+        """
+        entry = self.entries.get(video_path)
+        if entry is None:
+            return True
+        if entry.get("status") == "done" and os.path.exists(video_path):
+            stat = os.stat(video_path)
+            return entry.get("size") != stat.st_size or entry.get("mtime") != stat.st_mtime
+        if entry.get("status") == "failed":
+            return retry_failed
+        return True
+
+
+def limit_threads(threads):
+    """
+    Caps the threads OpenCV and the BLAS/OpenMP libraries use in this process.
+
+    numpy and OpenCV are already loaded by the time this runs (workers fork from a parent that
+    imported them), so their thread pools are resized in place with threadpoolctl. The
+    environment variables only reach libraries that are first loaded in the worker.
+    """
+    for name in THREAD_ENV_VARS:
+        os.environ[name] = str(threads)
+    cv2.setNumThreads(threads)
+    try:
+        from threadpoolctl import threadpool_limits  # installed with scikit-learn
+    except ImportError:
+        print("threadpoolctl is not installed, BLAS/OpenMP threads of loaded libraries are not capped")
+        return
+    threadpool_limits(limits=threads)
+
+
+def process_video_job(video_path, args):
+    """
+    Runs the run.py pipeline for one video, with its stages in this process. The corpus
+    index is left to run_batch, which updates it from the parent process.
+
+    Returns:
+        dict: frames, seconds, the video's output folder and the stages that did not complete.
+    """
+    start = time.time()
+    status = run.process_video(video_path, args, workers=1, update_index=False)
+    return {
+        "frames": get_video_frame_count(video_path),
+        "folder_path": run.video_folder(video_path),
+        "seconds": time.time() - start,
+        "incomplete_stages": [name for name, result in status.items() if result in ("failed", "skipped")],
+    }
+
+
+def throughput_report(entries, elapsed):
+    """
+    Aggregate throughput of the videos finished in a batch run.
+
+    Parameters:
+        entries (list of dict): Manifest entries of the videos completed in this run.
+        elapsed (float): Wall-clock seconds of the run.
+
+    Returns:
+        dict: videos, frames, seconds, videos_per_hour and frames_per_second.
+    """
+    frames = sum(entry.get("frames", 0) for entry in entries)
+    return {
+        "videos": len(entries),
+        "frames": frames,
+        "seconds": elapsed,
+        "videos_per_hour": len(entries) * 3600 / elapsed if elapsed > 0 else 0.0,
+        "frames_per_second": frames / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def run_batch(videos, args, manifest_path, workers=None, threads_per_worker=None, retry_failed=False,
+              process_func=process_video_job):
+    """
+    Processes a corpus of videos across a process pool, recording each video's status in a manifest.
+
+    Parameters:
+        videos (list of str): Video paths.
+        args (Namespace): Pipeline options (see run.add_pipeline_arguments).
+        manifest_path (str): JSON manifest. Videos already 'done' in it are skipped.
+        workers (int): Videos processed at once. None uses one per CPU.
+        threads_per_worker (int): OpenCV/BLAS threads per worker. None splits the CPUs evenly.
+        retry_failed (bool): Also rerun videos that failed in an earlier run.
+        process_func (callable): process_func(video_path, args) -> dict with 'frames' and 'seconds',
+            and 'folder_path' to have the video's row of the corpus index updated.
+
+    Returns:
+        dict: The throughput report of this run, plus the number of failed videos.
+    """
+    workers = resolve_workers(workers)
+    if threads_per_worker is None:
+        threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+
+    manifest = BatchManifest(manifest_path)
+    todo = [video for video in videos if manifest.needs_run(video, retry_failed)]
+    print(f"{len(videos) - len(todo)} of {len(videos)} videos already processed, {len(todo)} to go")
+
+    completed, failed = [], 0
+
+    def record(video, result=None, error=None):
+        nonlocal failed
+        if error is None and result.get("incomplete_stages"):
+            error = f"Stages not completed: {', '.join(result['incomplete_stages'])}"
+        if error is None:
+            stat = os.stat(video)
+            manifest.update(video, status="done", size=stat.st_size, mtime=stat.st_mtime,
+                            frames=result["frames"], seconds=result["seconds"], error=None)
+            completed.append(manifest.entries[video])
+            if result.get("folder_path"):
+                corpus_index.update_index(os.path.dirname(result["folder_path"]), [result["folder_path"]])
+        else:
+            manifest.update(video, status="failed", error=error)
+            failed += 1
+            print(f"{video} failed: {error}")
+
+    start = time.time()
+    for video in todo:
+        manifest.entries.setdefault(video, {})["status"] = "pending"
+    manifest.save()
+
+    if workers == 1:
+        limit_threads(threads_per_worker)
+        for video in tqdm(todo, desc="Processing videos", unit="video"):
+            manifest.update(video, status="running")
+            try:
+                record(video, process_func(video, args))
+            except Exception as e:
+                record(video, error=repr(e))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=limit_threads,
+                                 initargs=(threads_per_worker,)) as executor:
+            futures = {executor.submit(process_func, video, args): video for video in todo}
+            for future in tqdm(as_completed(futures), total=len(futures), desc="Processing videos", unit="video"):
+                try:
+                    record(futures[future], future.result())
+                except Exception as e:
+                    record(futures[future], error=repr(e))
+
+    report = throughput_report(completed, time.time() - start)
+    report["failed"] = failed
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Process a corpus of videos with run.py's pipeline.")
+    parser.add_argument("source", help="Directory of videos, or a text file with one video path per line")
+    run.add_pipeline_arguments(parser)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Videos processed at once (default: one per CPU)")
+    parser.add_argument("--threads-per-worker", type=int, default=None,
+                        help="OpenCV/BLAS threads per worker (default: CPUs divided by workers)")
+    parser.add_argument("--manifest", default=os.path.join("processed_videos", "batch_manifest.json"),
+                        help="Job manifest used to resume an interrupted batch")
+    parser.add_argument("--retry-failed", action="store_true",
+                        help="Also rerun videos that failed in an earlier run")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.source):
+        print(f"Error: '{args.source}' not found.")
+        sys.exit(1)
+
+    videos = find_videos(args.source)
+    report = run_batch(videos, args, args.manifest, workers=args.workers,
+                       threads_per_worker=args.threads_per_worker, retry_failed=args.retry_failed)
+
+    print(f"Processed {report['videos']} videos ({report['frames']} frames) in {report['seconds']:.1f}s: "
+          f"{report['videos_per_hour']:.1f} videos/hour, {report['frames_per_second']:.1f} frames/s")
+    if report["failed"]:
+        print(f"{report['failed']} videos failed, see {args.manifest}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
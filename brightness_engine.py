@@ -0,0 +1,227 @@
+import os
+import cv2
+import numpy as np
+
+from tqdm import tqdm
+
+import frame_container
+from frame_stream import iter_folder_frames, iter_video_frames, get_video_fps
+
+HEATMAP_FPS = 25.0  # Frame rate of heatmap videos when the source has none, e.g. a frame folder
+HEATMAP_VIDEO_CODECS = {".avi": "MJPG", ".mp4": "mp4v", ".mov": "mp4v", ".mkv": "MJPG"}
+
+
+def _stack_brightness(stack):
+    """Per-frame mean grayscale brightness of an (n, H, W, 3) BGR uint8 block."""
+    n, h, w = stack.shape[:3]
+    block = np.ascontiguousarray(stack).reshape(n * h, w, 3)
+    gray = cv2.cvtColor(block, cv2.COLOR_BGR2GRAY)
+    return gray.reshape(n, h * w).mean(axis=1)
+
+
+def frame_brightness_means(source, chunk_size=256):
+    """
+    Computes the average brightness of every frame exactly once.
+
+    Args:
+        source: A folder of frame images or a packed container (see frame_export), an
+            (N, H, W, 3) BGR uint8 ndarray or np.memmap, or any iterable of BGR frames
+            (e.g. frame_stream.iter_video_frames).
+        chunk_size (int): Number of frames converted at a time when source is an array.
+            Only one chunk is resident in memory, so memmaps of feature-length films are fine.
+
+    Returns:
+        ndarray: float64 array of per-frame average brightness values.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        container = frame_container.open_container(source)
+        if container is not None and container.container == "chunked":
+            # Chunks are memory-mapped frame stacks: convert them a block at a time
+            blocks = [frame_brightness_means(block, chunk_size) for block in container.iter_blocks()]
+            return np.concatenate(blocks) if blocks else np.empty(0, dtype=np.float64)
+        source = iter_folder_frames(source)
+
+    if isinstance(source, np.ndarray):
+        if source.ndim != 4 or source.shape[3] != 3:
+            raise ValueError(f"Expected an (N, H, W, 3) frame stack, got shape {source.shape}")
+        means = np.empty(len(source), dtype=np.float64)
+        for start in range(0, len(source), chunk_size):
+            stop = min(start + chunk_size, len(source))
+            means[start:stop] = _stack_brightness(source[start:stop])
+        return means
+
+    return np.array([_stack_brightness(frame[np.newaxis])[0] for frame in source], dtype=np.float64)
+
+
+def sliding_window_stats(values, window_size):
+    """
+    Mean and variance of every full window of values, in O(n) using prefix sums.
+
+    Args:
+        values (array-like): Per-frame values, e.g. from frame_brightness_means.
+        window_size (int): Size of the sliding window.
+
+    Returns:
+        tuple: (window_means, window_variances), each of length len(values) - window_size + 1
+        (empty if there are fewer values than window_size).
+    """
+    if window_size < 1:
+        raise ValueError(f"window_size must be at least 1, got {window_size}")
+
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) < window_size:
+        return np.empty(0), np.empty(0)
+
+    # Centre the values first so the sum-of-squares prefix does not lose precision
+    offset = values.mean()
+    centred = values - offset
+
+    prefix = np.concatenate(([0.0], np.cumsum(centred)))
+    prefix_sq = np.concatenate(([0.0], np.cumsum(centred * centred)))
+
+    window_sum = prefix[window_size:] - prefix[:-window_size]
+    window_sq = prefix_sq[window_size:] - prefix_sq[:-window_size]
+
+    means = window_sum / window_size
+    variances = np.maximum(window_sq / window_size - means * means, 0.0)
+    return means + offset, variances
+
+
+def get_sliding_window_brightness_list(source, window_size=100, chunk_size=256):
+    """
+    Drop-in replacement for brightness_processing.get_sliding_window_brightness_list that
+    decodes each frame once instead of once per window.
+
+    Args:
+        source: Folder path, (N, H, W, 3) ndarray/memmap or iterable of frames.
+        window_size (int): Size of the sliding window. Defaults to 100.
+        chunk_size (int): Frames converted at a time for array sources.
+
+    Returns:
+        list: Average brightness of each sliding window of frames.
+    """
+    means, _ = sliding_window_stats(frame_brightness_means(source, chunk_size), window_size)
+    return means.tolist()
+
+
+def iter_source_frames(source):
+    """Frames of a video file, a frame folder or packed container, or an iterable of frames."""
+    if isinstance(source, (str, os.PathLike)):
+        if os.path.isfile(source):
+            return iter_video_frames(source)
+        return iter_folder_frames(source)
+    return iter(source)
+
+
+def iter_brightness_change_heatmaps(source):
+    """
+    Streaming replacement for brightness_processing.calculate_pixel_brightness_change_heatmaps:
+    yields the absolute grayscale difference of each pair of consecutive frames.
+
+    Two grayscale frames and one heatmap are held at a time, in buffers reused for every pair,
+    so memory does not grow with video length. Each yielded heatmap is overwritten by the
+    next one; copy it to keep it.
+
+    Args:
+        source: Video file, frame folder or iterable of BGR frames (see iter_source_frames).
+
+    Yields:
+        ndarray: (H, W) uint8 heatmap of frame i to frame i + 1.
+    """
+    previous = current = heatmap = None
+    for frame in iter_source_frames(source):
+        if previous is None:
+            previous = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            current = np.empty_like(previous)
+            heatmap = np.empty_like(previous)
+            continue
+        if frame.shape[:2] != previous.shape:
+            raise ValueError(f"Frame shape {frame.shape[:2]} does not match {previous.shape}")
+        cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=current)
+        cv2.absdiff(previous, current, dst=heatmap)
+        yield heatmap
+        previous, current = current, previous
+
+
+class HeatmapImageWriter:
+    """Writes heatmaps to a folder as heatmap_0001.jpg, heatmap_0002.jpg, ..., replacing earlier ones."""
+
+    def __init__(self, folder_path):
+        self.folder_path = folder_path
+        self.count = 0
+        os.makedirs(folder_path, exist_ok=True)
+        for filename in os.listdir(folder_path):
+            if filename.startswith("heatmap_") and filename.endswith(".jpg"):
+                os.remove(os.path.join(folder_path, filename))
+
+    def write(self, heatmap):
+        self.count += 1
+        cv2.imwrite(os.path.join(self.folder_path, f"heatmap_{self.count:04d}.jpg"), heatmap)
+
+    def close(self):
+        return self.count
+
+
+class HeatmapVideoWriter:
+    """
+    Encodes heatmaps as the frames of one video with cv2.VideoWriter. The codec follows the
+    file extension (see HEATMAP_VIDEO_CODECS) unless fourcc is given.
+    """
+
+    def __init__(self, path, fps=HEATMAP_FPS, fourcc=None):
+        extension = os.path.splitext(path)[1].lower()
+        if fourcc is None and extension not in HEATMAP_VIDEO_CODECS:
+            raise ValueError(f"No heatmap video codec for '{extension}' files, pass a fourcc")
+        self.path = path
+        self.fps = fps
+        self.fourcc = fourcc or HEATMAP_VIDEO_CODECS[extension]
+        self.count = 0
+        self.writer = None
+        self.bgr = None
+
+    def write(self, heatmap):
+        if self.writer is None:
+            height, width = heatmap.shape
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self.writer = cv2.VideoWriter(self.path, cv2.VideoWriter_fourcc(*self.fourcc), self.fps, (width, height))
+            if not self.writer.isOpened():
+                raise ValueError(f"Could not open a {self.fourcc} video writer for '{self.path}'")
+            self.bgr = np.empty((height, width, 3), dtype=np.uint8)
+        # Not every codec takes single-channel frames, so expand into a reused 3-channel buffer
+        cv2.cvtColor(heatmap, cv2.COLOR_GRAY2BGR, dst=self.bgr)
+        self.writer.write(self.bgr)
+        self.count += 1
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.release()
+            self.writer = None
+        return self.count
+
+
+def save_brightness_change_heatmaps(source, output_path, fps=None):
+    """
+    Computes the brightness change heatmaps of source and writes each one as soon as it is
+    computed, so peak memory stays constant however long the video is.
+
+    Args:
+        source: Video file, frame folder or iterable of BGR frames (see iter_source_frames).
+        output_path (str): Folder for an image sequence, or a video file (.avi, .mp4, .mov, .mkv).
+        fps (float): Frame rate of a heatmap video. Defaults to that of a source video file,
+            otherwise HEATMAP_FPS.
+
+    Returns:
+        int: Number of heatmaps written.
+    """
+    if os.path.splitext(output_path)[1].lower() in HEATMAP_VIDEO_CODECS:
+        if fps is None and isinstance(source, (str, os.PathLike)) and os.path.isfile(source):
+            fps = get_video_fps(source)
+        writer = HeatmapVideoWriter(output_path, fps or HEATMAP_FPS)
+    else:
+        writer = HeatmapImageWriter(output_path)
+    try:
+        for heatmap in tqdm(iter_brightness_change_heatmaps(source), desc="Saving heatmaps", unit="frame"):
+            writer.write(heatmap)
+    finally:
+        count = writer.close()
+    return count
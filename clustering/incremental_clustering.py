@@ -0,0 +1,237 @@
+import os
+import sys
+import time
+import pickle
+import argparse
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+from sklearn.cluster import MiniBatchKMeans, Birch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import corpus_index
+
+MODEL_FILENAME = "cluster_model.pkl"
+CLUSTERS_FILENAME = "video_clusters.csv"
+METHODS = ("minibatch_kmeans", "birch")
+
+# Index columns used as features, in the order of metric_clustering's feature matrix
+FEATURE_COLUMNS = ["brightness_mean", "colourfulness_mean", "optical_flow_mean", "cuts_per_min", "short_cut_percent"]
+# The last three are divided by their corpus maximum in video_clusters.csv
+NORMALIZED_COLUMNS = ["optical_flow_mean", "cuts_per_min", "short_cut_percent"]
+
+
+def index_features(index):
+    """
+    The feature matrix of the videos in a corpus index, without videos that have missing values.
+
+    Returns:
+        tuple: (video_labels, features) with features an (N, 5) array in FEATURE_COLUMNS order.
+    """
+    features = index[FEATURE_COLUMNS].to_numpy(dtype=float)
+    valid = np.isfinite(features).all(axis=1)
+    return index["video_label"][valid].tolist(), features[valid]
+
+
+def fit_clusters(features, n_clusters=2, method="minibatch_kmeans", batch_size=4096, random_state=0):
+    """
+    Fits a clustering model whose memory grows linearly with the number of videos, instead of
+    the O(n^2) distance matrix of Ward linkage.
+
+    Dividing features by a constant does not change their standardized values, so clustering
+    the raw index features matches metric_clustering's max-normalized ones.
+
+    Parameters:
+        features (ndarray): (N, num_features) feature matrix.
+        n_clusters (int): Number of clusters.
+        method (str): 'minibatch_kmeans' or 'birch'.
+        batch_size (int): Rows per mini-batch (MiniBatchKMeans) or per partial_fit call (BIRCH).
+        random_state (int): Seed of MiniBatchKMeans.
+
+    Returns:
+        dict: The fitted model: 'scaler', 'model', 'method' and 'feature_max' (the maxima used
+        for the normalized columns of video_clusters.csv).
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown clustering method '{method}', expected one of {METHODS}")
+
+    scaler = StandardScaler().fit(features)
+    scaled = scaler.transform(features)
+    if method == "minibatch_kmeans":
+        model = MiniBatchKMeans(n_clusters=n_clusters, batch_size=batch_size, n_init=3, random_state=random_state)
+        model.fit(scaled)
+    else:
+        # BIRCH builds its CF-tree chunk by chunk, then clusters the subclusters once
+        model = Birch(n_clusters=None, threshold=0.5)
+        for start in range(0, len(scaled), batch_size):
+            model.partial_fit(scaled[start:start + batch_size])
+        model.set_params(n_clusters=n_clusters)
+        model.partial_fit()
+
+    return {
+        "scaler": scaler,
+        "model": model,
+        "method": method,
+        "feature_max": dict(zip(FEATURE_COLUMNS, features.max(axis=0))),
+    }
+
+
+def assign_clusters(fitted, features):
+    """
+    Assigns videos to the clusters of a fitted model, without refitting it.
+
+    Returns:
+        ndarray: Cluster numbers starting at 1, as fcluster numbers them.
+    """
+    if len(features) == 0:
+        return np.empty(0, dtype=int)
+    return fitted["model"].predict(fitted["scaler"].transform(features)) + 1
+
+
+def save_model(path, fitted):
+    with open(path, "wb") as f:
+        pickle.dump(fitted, f)
+
+
+def load_model(path):
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def cluster_table(video_labels, clusters, features, feature_max):
+    """
+    Cluster results in the layout of metric_clustering's video_clusters.csv.
+    """
+    features = np.asarray(features, dtype=float).reshape(-1, len(FEATURE_COLUMNS))
+    columns = dict(zip(FEATURE_COLUMNS, features.T))
+    return pd.DataFrame({
+        "video_label": video_labels,
+        "cluster": clusters,
+        "avg_brightness": columns["brightness_mean"],
+        "avg_colourfulness": columns["colourfulness_mean"],
+        "norm_optical_flow": columns["optical_flow_mean"] / feature_max["optical_flow_mean"],
+        "norm_cuts_per_min": columns["cuts_per_min"] / feature_max["cuts_per_min"],
+        "norm_short_cut_percent": columns["short_cut_percent"] / feature_max["short_cut_percent"],
+    })
+
+
+def fit_corpus(root_folder="processed_videos", n_clusters=2, method="minibatch_kmeans",
+               model_path=None, output_path=CLUSTERS_FILENAME, refresh=False):
+    """
+    Clusters every video in the corpus index and saves the fitted model and video_clusters.csv.
+    With refresh, the index is first rescanned (see corpus_index.load_index).
+
+    Returns:
+        DataFrame: The cluster table.
+    """
+    video_labels, features = index_features(corpus_index.load_index(root_folder, refresh=refresh))
+    if len(video_labels) < n_clusters:
+        raise ValueError(f"{len(video_labels)} videos with complete metrics, need at least {n_clusters}")
+
+    fitted = fit_clusters(features, n_clusters, method)
+    save_model(model_path or os.path.join(root_folder, MODEL_FILENAME), fitted)
+    table = cluster_table(video_labels, assign_clusters(fitted, features), features, fitted["feature_max"])
+    table.to_csv(output_path, index=False)
+    return table
+
+
+def assign_new_videos(root_folder="processed_videos", model_path=None, output_path=CLUSTERS_FILENAME,
+                      refresh=False):
+    """
+    Adds the videos of the corpus index that are not yet in video_clusters.csv to it, using the
+    saved model. Videos already clustered keep their cluster. With refresh, the index is first
+    rescanned (see corpus_index.load_index).
+
+    Returns:
+        DataFrame: The rows added.
+    """
+    fitted = load_model(model_path or os.path.join(root_folder, MODEL_FILENAME))
+    existing = pd.read_csv(output_path, dtype={"video_label": str}) if os.path.exists(output_path) else None
+    index = corpus_index.load_index(root_folder, refresh=refresh)
+    if existing is not None:
+        index = index[~index["video_label"].isin(existing["video_label"])]
+
+    video_labels, features = index_features(index)
+    added = cluster_table(video_labels, assign_clusters(fitted, features), features, fitted["feature_max"])
+    table = added if existing is None else pd.concat([existing, added], ignore_index=True)
+    table.to_csv(output_path, index=False)
+    return added
+
+
+def synthetic_features(num_rows, n_clusters=4, seed=0):
+    """Gaussian blobs in the range of the real features, with their true cluster labels."""
+    rng = np.random.default_rng(seed)
+    centres = rng.uniform([20, 0.0, 0.5, 2, 5], [200, 1.0, 10.0, 60, 90], size=(n_clusters, len(FEATURE_COLUMNS)))
+    spread = np.array([15, 0.08, 1.0, 5, 8])
+    labels = rng.integers(0, n_clusters, num_rows)
+    return centres[labels] + rng.normal(size=(num_rows, len(FEATURE_COLUMNS))) * spread, labels
+
+
+def benchmark(sizes=(10_000, 100_000, 1_000_000), n_clusters=4, methods=METHODS, ward_max_rows=20_000):
+    """
+    Times fitting and assignment on synthetic feature matrices, and compares the labels with
+    Ward linkage (metric_clustering's algorithm) on the sizes it can still handle.
+
+    Returns:
+        list of dict: One row per size and method with rows, method, fit_seconds,
+        assign_rows_per_second and ari_vs_ward (adjusted Rand index, NaN above ward_max_rows).
+    """
+    from scipy.cluster.hierarchy import linkage, fcluster
+    from sklearn.metrics import adjusted_rand_score
+
+    results = []
+    for num_rows in sizes:
+        features, _ = synthetic_features(num_rows, n_clusters)
+        ward_labels = None
+        if num_rows <= ward_max_rows:
+            start = time.perf_counter()
+            ward_labels = fcluster(linkage(StandardScaler().fit_transform(features), method='ward'),
+                                   t=n_clusters, criterion='maxclust')
+            results.append({"rows": num_rows, "method": "ward", "fit_seconds": time.perf_counter() - start,
+                            "assign_rows_per_second": np.nan, "ari_vs_ward": 1.0})
+
+        for method in methods:
+            start = time.perf_counter()
+            fitted = fit_clusters(features, n_clusters, method)
+            fit_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            labels = assign_clusters(fitted, features)
+            assign_seconds = time.perf_counter() - start
+            results.append({
+                "rows": num_rows, "method": method, "fit_seconds": fit_seconds,
+                "assign_rows_per_second": num_rows / assign_seconds if assign_seconds > 0 else np.inf,
+                "ari_vs_ward": adjusted_rand_score(ward_labels, labels) if ward_labels is not None else np.nan,
+            })
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cluster large corpora from the corpus index, incrementally.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    fit_parser = subparsers.add_parser("fit", help="Cluster every indexed video and save the model")
+    fit_parser.add_argument("--method", choices=METHODS, default="minibatch_kmeans")
+    fit_parser.add_argument("--clusters", type=int, default=2)
+    subparsers.add_parser("assign", help="Add newly indexed videos to video_clusters.csv with the saved model")
+    bench_parser = subparsers.add_parser("benchmark", help="Time the clustering methods on synthetic features")
+    bench_parser.add_argument("--sizes", default="10000,100000,1000000", help="Comma-separated row counts")
+    for sub in (fit_parser, subparsers.choices["assign"]):
+        sub.add_argument("--root", default="processed_videos")
+        sub.add_argument("--model", default=None, help=f"Model file (default: <root>/{MODEL_FILENAME})")
+        sub.add_argument("--output", default=CLUSTERS_FILENAME)
+        sub.add_argument("--refresh", action="store_true",
+                         help="Rescan the root first, picking up folders not yet in the corpus index")
+    args = parser.parse_args(argv)
+
+    if args.command == "fit":
+        table = fit_corpus(args.root, args.clusters, args.method, args.model, args.output, args.refresh)
+        print(f"✅ Clustered {len(table)} videos, results saved to {args.output}")
+    elif args.command == "assign":
+        added = assign_new_videos(args.root, args.model, args.output, args.refresh)
+        print(f"✅ Assigned {len(added)} new videos, results saved to {args.output}")
+    else:
+        sizes = [int(size) for size in args.sizes.split(",")]
+        print(pd.DataFrame(benchmark(sizes)).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,4 +1,6 @@
 import os
+import sys
+import argparse
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
@@ -8,95 +10,31 @@ from scipy.cluster.hierarchy import dendrogram, linkage, fcluster, inconsistent
 from scipy.cluster.hierarchy import set_link_color_palette
 from sklearn.preprocessing import StandardScaler
 
-def natural_sort_key(s):
-    return [int(text) if text.isdigit() else text for text in re.split(r'(\d+)', s)]
-
-def read_flat_csv_row(csv_path):
-    try:
-        df = pd.read_csv(csv_path)
-        if df.shape[0] == 1:
-            values = df.iloc[0].values[1:]  # Skip the frame column
-            return np.array(values, dtype=float)
-    except Exception as e:
-        print(f"Failed to read {csv_path}: {e}")
-    return None
-
-def extract_scalar(csv_path, column_name):
-    try:
-        df = pd.read_csv(csv_path)
-        if column_name in df.columns:
-            return float(df[column_name].iloc[0])
-    except Exception as e:
-        print(f"Failed to extract {column_name} from {csv_path}: {e}")
-    return np.nan
-
-def calculate_short_cut_percentage(csv_path, threshold=2.0):
-    try:
-        df = pd.read_csv(csv_path)
-        if df.empty or df.columns[0].lower() != "scene length (seconds)":
-            return np.nan
-        lengths = df[df.columns[0]]
-        total_cuts = len(lengths)
-        short_cuts = (lengths < threshold).sum()
-        return (short_cuts / total_cuts) * 100 if total_cuts > 0 else np.nan
-    except Exception:
-        return np.nan
-
-def main():
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import corpus_index
+
+def main(refresh=False):
+    """
+    Clusters the videos in processed_videos by their summary scalars, read from the
+    corpus index (see corpus_index.py) instead of each video's metric files.
+
+    Parameters:
+        refresh (bool): Rescan processed_videos for videos changed outside run.py/batch.py first.
+    """
     base_folder = "processed_videos"
-    subfolders = sorted(
-        [f for f in os.listdir(base_folder) if os.path.isdir(os.path.join(base_folder, f))],
-        key=natural_sort_key
-    )
+    index = corpus_index.load_index(base_folder, refresh=refresh)
+
+    valid = np.isfinite(index[corpus_index.SUMMARY_COLUMNS].to_numpy(dtype=float)).all(axis=1)
+    for label in index["video_label"][~valid]:
+        print(f"⚠️ Skipping {label}: missing or non-finite metric values.")
+    index = index[valid]
 
-    video_labels = []
-    brightness_means = []
-    colourfulness_means = []
-    optical_flow_means = []
-    cuts_per_min = []
-    short_cut_percents = []
-
-    for subfolder in subfolders:
-        folder_path = os.path.join(base_folder, subfolder)
-        brightness_path = os.path.join(folder_path, "brightness.csv")
-        colour_path = os.path.join(folder_path, "HS_colourfulness.csv")
-        flow_path = os.path.join(folder_path, "optical_flow_magnitude.csv")
-        pacing_path = os.path.join(folder_path, "pacing.csv")
-        scene_lengths_path = os.path.join(folder_path, "scene_lengths.csv")
-
-        if not (os.path.exists(brightness_path) and os.path.exists(colour_path) and os.path.exists(flow_path) and os.path.exists(pacing_path) and os.path.exists(scene_lengths_path)):
-            print(f"⚠️ Skipping {subfolder}: missing one or more required CSVs.")
-            continue
-
-        brightness = read_flat_csv_row(brightness_path)
-        colourfulness = read_flat_csv_row(colour_path)
-        flow = read_flat_csv_row(flow_path)
-
-        if brightness is None or colourfulness is None or flow is None:
-            print(f"⚠️ Skipping {subfolder}: invalid brightness/colour/flow")
-            continue
-
-        flow = flow[np.isfinite(flow)]
-        if len(flow) == 0:
-            print(f"⚠️ Skipping {subfolder}: all optical flow values are non-finite.")
-            continue
-
-        b_mean = np.mean(brightness)
-        c_mean = np.mean(colourfulness)
-        f_mean = np.mean(flow)
-
-        cpm = extract_scalar(pacing_path, "cuts_per_min")
-        scp = calculate_short_cut_percentage(scene_lengths_path)
-
-        if all(np.isfinite(x) for x in [b_mean, c_mean, f_mean, cpm, scp]):
-            brightness_means.append(b_mean)
-            colourfulness_means.append(c_mean)
-            optical_flow_means.append(f_mean)
-            cuts_per_min.append(cpm)
-            short_cut_percents.append(scp)
-            video_labels.append(subfolder)
-        else:
-            print(f"⚠️ Skipping {subfolder}: non-finite metric values.")
+    video_labels = index["video_label"].tolist()
+    brightness_means = index["brightness_mean"].to_numpy()
+    colourfulness_means = index["colourfulness_mean"].to_numpy()
+    optical_flow_means = index["optical_flow_mean"].to_numpy()
+    cuts_per_min = index["cuts_per_min"].to_numpy()
+    short_cut_percents = index["short_cut_percent"].to_numpy()
 
     if not video_labels:
         print("❌ No valid data found.")
@@ -120,7 +58,7 @@ def main():
     scaler = StandardScaler()
     data_scaled = scaler.fit_transform(data)
 
-    # Hierarchical clustering
+    # Hierarchical clustering. Ward linkage needs O(n^2) memory; for large corpora use incremental_clustering.py
     linkage_matrix = linkage(data_scaled, method='ward')
 
     # Clean x-axis labels
@@ -197,4 +135,9 @@ def main():
 print("✅ Cluster results saved to video_clusters.csv")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Hierarchically cluster the processed videos by their summary metrics.")
+    parser.add_argument("--refresh", action="store_true",
+                        help="Rescan processed_videos first, picking up folders processed before the corpus index "
+                             "existed or changed outside run.py/batch.py")
+    args = parser.parse_args()
+    main(refresh=args.refresh)
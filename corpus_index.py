@@ -0,0 +1,218 @@
+import os
+import re
+import sys
+import argparse
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+
+import metrics_store
+
+INDEX_FILENAME = "corpus_index.csv"
+SHORT_CUT_THRESHOLD = 2.0  # Seconds
+
+# One row per processed video folder; source_mtime_ns is the newest mtime of the files the row was computed from
+INDEX_COLUMNS = ["video_label", "num_frames", "brightness_mean", "colourfulness_mean", "optical_flow_mean",
+                 "cuts_per_min", "short_cut_percent", "source_mtime_ns"]
+SUMMARY_COLUMNS = INDEX_COLUMNS[2:-1]
+
+# Files a summary is computed from, relative to the video folder
+SOURCE_FILES = (metrics_store.METRICS_FILENAME, "brightness.csv", "HS_colourfulness.csv",
+                "optical_flow_magnitude.csv", "pacing.csv", "scene_lengths.csv")
+
+
+def natural_sort_key(s):
+    return [int(text) if text.isdigit() else text for text in re.split(r'(\d+)', s)]
+
+
+def read_metric(folder_path, metric_name):
+    """Per-frame values of a metric, from metrics.npz if the folder has one, else from <metric>.csv."""
+    metrics_path = os.path.join(folder_path, metrics_store.METRICS_FILENAME)
+    if os.path.exists(metrics_path):
+        metrics = metrics_store.load_metrics(metrics_path, columns=[metric_name])
+        if metric_name in metrics:
+            return np.asarray(metrics[metric_name], dtype=float)
+    csv_path = os.path.join(folder_path, f"{metric_name}.csv")
+    if os.path.exists(csv_path):
+        try:
+            _, values, _ = metrics_store.read_flat_csv(csv_path)
+            return values
+        except Exception as e:
+            print(f"Failed to read {csv_path}: {e}")
+    return None
+
+
+def extract_scalar(csv_path, column_name):
+    try:
+        df = pd.read_csv(csv_path)
+        if column_name in df.columns:
+            return float(df[column_name].iloc[0])
+    except Exception as e:
+        print(f"Failed to extract {column_name} from {csv_path}: {e}")
+    return np.nan
+
+
+def calculate_short_cut_percentage(csv_path, threshold=SHORT_CUT_THRESHOLD):
+    try:
+        df = pd.read_csv(csv_path)
+        if df.empty or df.columns[0].lower() != "scene length (seconds)":
+            return np.nan
+        lengths = df[df.columns[0]]
+        total_cuts = len(lengths)
+        short_cuts = (lengths < threshold).sum()
+        return (short_cuts / total_cuts) * 100 if total_cuts > 0 else np.nan
+    except Exception:
+        return np.nan
+
+
+def source_mtime_ns(folder_path):
+    """Newest mtime of the files a video's summary is computed from, or 0 if there are none."""
+    newest = 0
+    for filename in SOURCE_FILES:
+        try:
+            newest = max(newest, os.stat(os.path.join(folder_path, filename)).st_mtime_ns)
+        except FileNotFoundError:
+            pass
+    return newest
+
+
+def summarize_video(folder_path):
+    """
+    Computes the per-video scalars used for clustering.
+
+    Parameters:
+        folder_path (str): A processed video folder, processed_videos/<name>.
+
+    Returns:
+        dict: A row of the index (see INDEX_COLUMNS). Metrics that are missing or have no
+        finite values are NaN.
+    """
+    row = {"video_label": os.path.basename(os.path.normpath(folder_path)),
+           "source_mtime_ns": source_mtime_ns(folder_path), "num_frames": 0}
+
+    for column, metric_name in (("brightness_mean", "brightness"),
+                                ("colourfulness_mean", "HS_colourfulness"),
+                                ("optical_flow_mean", "optical_flow_magnitude")):
+        values = read_metric(folder_path, metric_name)
+        values = values[np.isfinite(values)] if values is not None else np.empty(0)
+        row[column] = float(np.mean(values)) if len(values) else np.nan
+        row["num_frames"] = max(row["num_frames"], len(values))
+
+    pacing_path = os.path.join(folder_path, "pacing.csv")
+    scene_lengths_path = os.path.join(folder_path, "scene_lengths.csv")
+    row["cuts_per_min"] = extract_scalar(pacing_path, "cuts_per_min") if os.path.exists(pacing_path) else np.nan
+    row["short_cut_percent"] = (calculate_short_cut_percentage(scene_lengths_path)
+                                if os.path.exists(scene_lengths_path) else np.nan)
+    return row
+
+
+def index_path(root_folder):
+    return os.path.join(root_folder, INDEX_FILENAME)
+
+
+def read_index(root_folder="processed_videos"):
+    """
+    Reads the corpus index of root_folder, or an empty index if there is none yet.
+    """
+    path = index_path(root_folder)
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=INDEX_COLUMNS)
+    return pd.read_csv(path, dtype={"video_label": str})
+
+
+def write_index(root_folder, index):
+    """Writes the index, naturally sorted by label, and returns it in that order."""
+    index = index.sort_values("video_label", key=lambda labels: labels.map(natural_sort_key)).reset_index(drop=True)
+    path = index_path(root_folder)
+    tmp_path = path + ".tmp"
+    index.to_csv(tmp_path, index=False, columns=INDEX_COLUMNS)
+    os.replace(tmp_path, path)
+    return index
+
+
+def _replace_rows(index, rows):
+    """Replaces or adds the index rows of the videos in rows."""
+    if not rows:
+        return index
+    index = index[~index["video_label"].isin({row["video_label"] for row in rows})]
+    new_rows = pd.DataFrame(rows, columns=INDEX_COLUMNS)
+    return new_rows if index.empty else pd.concat([index, new_rows], ignore_index=True)
+
+
+def update_index(root_folder, folder_paths):
+    """
+    Recomputes the index rows of the given video folders and writes the index.
+
+    The index is rewritten as a whole, so only one process should update it at a time
+    (batch.py does so from its parent process).
+
+    Parameters:
+        root_folder (str): Folder holding the processed video folders and the index.
+        folder_paths (list of str): Video folders to (re)summarise.
+
+    Returns:
+        DataFrame: The updated index.
+    """
+    rows = [summarize_video(folder_path) for folder_path in folder_paths]
+    return write_index(root_folder, _replace_rows(read_index(root_folder), rows))
+
+
+def refresh_index(root_folder="processed_videos", rebuild=False):
+    """
+    Brings the index in line with the video folders under root_folder: folders that are new
+    or whose source files changed since their row was computed are summarised again, and rows
+    of folders that no longer exist are dropped. Unchanged folders only cost a few stat calls.
+
+    Parameters:
+        root_folder (str): Folder holding the processed video folders.
+        rebuild (bool): Summarise every folder again.
+
+    Returns:
+        DataFrame: The index.
+    """
+    index = read_index(root_folder)
+    known = {} if rebuild else dict(zip(index["video_label"], index["source_mtime_ns"]))
+    mtimes = {}
+    for name in os.listdir(root_folder):
+        folder_path = os.path.join(root_folder, name)
+        if os.path.isdir(folder_path):
+            mtime = source_mtime_ns(folder_path)
+            if mtime:
+                mtimes[name] = mtime
+
+    stale = [os.path.join(root_folder, name) for name, mtime in mtimes.items() if known.get(name) != mtime]
+    rows = [summarize_video(folder_path) for folder_path in tqdm(stale, desc="Summarising videos", unit="video")]
+    return write_index(root_folder, _replace_rows(index[index["video_label"].isin(mtimes)], rows))
+
+
+def load_index(root_folder="processed_videos", refresh=False):
+    """
+    The corpus index for clustering, built on first use.
+
+    Parameters:
+        root_folder (str): Folder holding the processed video folders.
+        refresh (bool): Also pick up folders changed outside run.py/batch.py (see refresh_index).
+
+    Returns:
+        DataFrame: One row per video, naturally sorted by label.
+    """
+    if refresh or not os.path.exists(index_path(root_folder)):
+        return refresh_index(root_folder)
+    return read_index(root_folder)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Update the per-video summary index used for clustering.")
+    parser.add_argument("root", nargs="?", default="processed_videos")
+    parser.add_argument("--rebuild", action="store_true", help="Summarise every video again")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.root):
+        print(f"Error: '{args.root}' not found.")
+        sys.exit(1)
+    index = refresh_index(args.root, rebuild=args.rebuild)
+    print(f"Indexed {len(index)} videos in {index_path(args.root)}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,111 @@
+import cv2
+import numpy as np
+
+DEFAULT_FARNEBACK_PARAMS = {
+    'pyr_scale': 0.5,
+    'levels': 3,
+    'winsize': 15,
+    'iterations': 3,
+    'poly_n': 5,
+    'poly_sigma': 1.2,
+    'flags': 0,
+}
+
+DIS_PRESETS = {
+    'ultrafast': cv2.DISOPTICAL_FLOW_PRESET_ULTRAFAST,
+    'fast': cv2.DISOPTICAL_FLOW_PRESET_FAST,
+    'medium': cv2.DISOPTICAL_FLOW_PRESET_MEDIUM,
+}
+
+
+class FarnebackEngine:
+    """Dense Farneback flow (the original behaviour)."""
+
+    dense = True
+
+    def __init__(self, farneback_params=None):
+        self.params = dict(DEFAULT_FARNEBACK_PARAMS)
+        if farneback_params:
+            self.params.update(farneback_params)
+
+    def compute(self, prev_gray, gray):
+        p = self.params
+        return cv2.calcOpticalFlowFarneback(prev_gray, gray, None, p['pyr_scale'], p['levels'], p['winsize'],
+                                            p['iterations'], p['poly_n'], p['poly_sigma'], p['flags'])
+
+
+class DISEngine:
+    """Dense inverse search flow with one of OpenCV's ultrafast/fast/medium presets."""
+
+    dense = True
+
+    def __init__(self, preset='fast'):
+        if preset not in DIS_PRESETS:
+            raise ValueError(f"Unknown DIS preset '{preset}', expected one of {list(DIS_PRESETS)}")
+        self.preset = preset
+        self.dis = cv2.DISOpticalFlow_create(DIS_PRESETS[preset])
+
+    def compute(self, prev_gray, gray):
+        return self.dis.calc(prev_gray, gray, None)
+
+
+class SparseLKEngine:
+    """
+    Pyramidal Lucas-Kanade tracking of Shi-Tomasi corners.
+
+    Returns an (N, 2) array of displacement vectors for the successfully tracked corners
+    rather than a dense field, which is enough for the scalar flow-magnitude metric.
+    """
+
+    dense = False
+
+    def __init__(self, max_corners=300, quality_level=0.01, min_distance=7, win_size=(15, 15), max_level=3):
+        self.max_corners = max_corners
+        self.quality_level = quality_level
+        self.min_distance = min_distance
+        self.win_size = win_size
+        self.max_level = max_level
+
+    def compute(self, prev_gray, gray):
+        corners = cv2.goodFeaturesToTrack(prev_gray, self.max_corners, self.quality_level, self.min_distance)
+        if corners is None:
+            return np.zeros((0, 2), dtype=np.float32)
+        tracked, status, _ = cv2.calcOpticalFlowPyrLK(prev_gray, gray, corners, None,
+                                                      winSize=self.win_size, maxLevel=self.max_level)
+        ok = status.ravel() == 1
+        return (tracked[ok] - corners[ok]).reshape(-1, 2)
+
+
+FLOW_ENGINES = {
+    'farneback': lambda **options: FarnebackEngine(**options),
+    'dis_ultrafast': lambda **options: DISEngine('ultrafast', **options),
+    'dis_fast': lambda **options: DISEngine('fast', **options),
+    'dis_medium': lambda **options: DISEngine('medium', **options),
+    'lk': lambda **options: SparseLKEngine(**options),
+}
+
+
+def get_flow_engine(engine='farneback', **options):
+    """
+    Returns a flow engine instance.
+
+    Args:
+        engine (str or engine): One of FLOW_ENGINES, or an object with a compute(prev_gray, gray)
+            method and a 'dense' attribute, which is returned unchanged.
+        **options: Passed to the engine constructor when engine is a name.
+    """
+    if not isinstance(engine, str):
+        return engine
+    if engine not in FLOW_ENGINES:
+        raise ValueError(f"Unknown flow engine '{engine}', expected one of {list(FLOW_ENGINES)}")
+    return FLOW_ENGINES[engine](**options)
+
+
+def mean_flow_magnitude(flow):
+    """
+    Average magnitude of a dense HxWx2 field or of (N, 2) sparse vectors (0.0 if there are none).
+    """
+    if flow.size == 0:
+        return 0.0
+    magnitude, _ = cv2.cartToPolar(flow[..., 0], flow[..., 1])
+    return float(np.mean(magnitude))
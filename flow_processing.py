@@ -0,0 +1,419 @@
+import os
+import sys
+import time
+import threading
+from queue import Queue
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+import numpy as np
+from tqdm import tqdm
+
+from frame_stream import FrameFolder
+from parallel_metrics import resolve_workers, split_into_chunks
+from flow_store import FlowStoreWriter
+from flow_engines import FLOW_ENGINES, get_flow_engine, mean_flow_magnitude
+
+MAX_CHUNK_PAIRS = 32  # Flow pairs per worker task: a finished chunk holds this many dense fields until merged
+
+
+def flow_to_bgr(magnitude, angle):
+    """
+    Renders a flow field as a BGR image: hue encodes direction, value encodes magnitude.
+    """
+    hsv = np.zeros(magnitude.shape + (3,), dtype=np.uint8)
+    hsv[..., 0] = angle * 180 / np.pi / 2
+    hsv[..., 1] = 255
+    hsv[..., 2] = cv2.normalize(magnitude, None, 0, 255, cv2.NORM_MINMAX)
+    return cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
+
+
+class VisualisationWriter:
+    """
+    Renders and saves flow visualisations on a background thread, behind a bounded queue,
+    so JPEG encoding overlaps with flow computation.
+    """
+
+    def __init__(self, output_folder, max_queue=16):
+        self.output_folder = output_folder
+        self.queue = Queue(maxsize=max_queue)
+        self.error = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            index, flow = item
+            if self.error is not None:
+                continue
+            try:
+                magnitude, angle = cv2.cartToPolar(flow[..., 0], flow[..., 1])
+                output_path = os.path.join(self.output_folder, f"flow_{index:04d}.jpg")
+                cv2.imwrite(output_path, flow_to_bgr(magnitude, angle))
+            except Exception as e:
+                self.error = e
+
+    def put(self, index, flow):
+        self.queue.put((index, flow))
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+
+
+def to_analysis_gray(frame, scale=1.0):
+    """
+    Converts a BGR frame to grayscale at the analysis resolution.
+    """
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    if scale != 1.0:
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return gray
+
+
+def resolve_engine(engine='farneback', farneback_params=None):
+    """
+    Returns a flow engine, applying farneback_params when the engine is 'farneback'.
+    """
+    if farneback_params and engine == 'farneback':
+        return get_flow_engine(engine, farneback_params=farneback_params)
+    return get_flow_engine(engine)
+
+
+def flow_pair_indices(num_frames, stride=1):
+    """
+    Indices of the frames read for a given stride: every stride-th frame plus the last one.
+    Empty when there are fewer than two frames, as there is no pair to compute flow for.
+    """
+    if num_frames < 2:
+        return []
+    indices = list(range(0, num_frames, stride))
+    if indices[-1] != num_frames - 1:
+        indices.append(num_frames - 1)
+    return indices
+
+
+def _iter_flow_pairs(frames, indices, scale, engine):
+    prev_gray = to_analysis_gray(frames[indices[0]], scale)
+    for start, end in zip(indices[:-1], indices[1:]):
+        gray = to_analysis_gray(frames[end], scale)
+        flow = engine.compute(prev_gray, gray)
+        step = end - start
+        if scale != 1.0 or step != 1:
+            flow /= scale * step
+        yield start, end, flow
+        prev_gray = gray
+
+
+def _flow_chunk(frames, indices, scale, engine, farneback_params):
+    """
+    Worker entry point: flow for one contiguous chunk of frame pairs. frames is already
+    sliced to the chunk, so indices are shifted back to absolute positions on return.
+    """
+    offset = indices[0]
+    local_indices = [i - offset for i in indices]
+    engine = resolve_engine(engine, farneback_params)
+    return [(start + offset, end + offset, flow)
+            for start, end, flow in _iter_flow_pairs(frames, local_indices, scale, engine)]
+
+
+def iter_flow(frames, scale=1.0, stride=1, farneback_params=None, engine='farneback', workers=1):
+    """
+    Yields optical flow between frames stride apart, at a reduced analysis resolution.
+
+    Only every stride-th frame is read, plus the last frame so the whole sequence is covered.
+    Flow vectors are rescaled to source-resolution pixels per frame, so magnitudes are
+    comparable to the full-resolution, stride-1 baseline.
+
+    Parameters:
+        frames (sequence of ndarray): Indexable BGR frames, e.g. a list or frame_stream.FrameFolder.
+        scale (float): Analysis resolution as a fraction of the source resolution.
+        stride (int): Compute flow between frame i and frame i + stride.
+        farneback_params (dict): Overrides for DEFAULT_FARNEBACK_PARAMS (pyramid, window, iterations).
+        engine (str or engine): Flow engine name from flow_engines.FLOW_ENGINES, or an engine instance.
+        workers (int): Worker processes. Pairs are split into contiguous chunks that overlap by
+            one frame and yielded in order, identical to the serial output. At most 2 * workers
+            chunks of MAX_CHUNK_PAIRS pairs are in flight at once. None uses every CPU.
+            Engines must be given by name (or be picklable) when workers > 1.
+
+    Yields:
+        tuple: (start_index, end_index, flow) with flow an HxWx2 float32 array, or an (N, 2)
+        array of tracked-point displacements for sparse engines.
+    """
+    if not 0 < scale <= 1:
+        raise ValueError(f"scale must be in (0, 1], got {scale}")
+    if stride < 1:
+        raise ValueError(f"stride must be at least 1, got {stride}")
+
+    indices = flow_pair_indices(len(frames), stride)
+    workers = resolve_workers(workers)
+    if not indices:
+        return
+
+    if workers == 1:
+        yield from _iter_flow_pairs(frames, indices, scale, resolve_engine(engine, farneback_params))
+        return
+
+    num_chunks = max(workers * 4, -(-(len(indices) - 1) // MAX_CHUNK_PAIRS))
+    chunks = split_into_chunks(indices, num_chunks, overlap=1)
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        try:
+            for chunk in chunks:
+                pending.append(executor.submit(_flow_chunk, frames[chunk[0]:chunk[-1] + 1], chunk, scale,
+                                               engine, farneback_params))
+                # Bounded queue: merge the oldest chunk before submitting more, so finished flow
+                # fields do not pile up while the consumer is still writing earlier ones
+                while len(pending) > 2 * workers:
+                    yield from pending.popleft().result()
+            while pending:  # Merge in chunk order
+                yield from pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def average_flow_magnitudes(frames, scale=1.0, stride=1, farneback_params=None, engine='farneback'):
+    """
+    Per-frame average flow magnitude for every frame after the first.
+
+    With stride > 1, each frame in a strided pair's span gets that pair's per-frame magnitude.
+
+    Returns:
+        list of float: len(frames) - 1 values.
+    """
+    magnitudes = []
+    for start, end, flow in iter_flow(frames, scale, stride, farneback_params, engine):
+        magnitudes.extend([mean_flow_magnitude(flow)] * (end - start))
+    return magnitudes
+
+
+def process_optical_flow(input_folder, output_folder, store_path=None, store_dtype="float32",
+                         store_downsample=1, store_chunk_frames=256, scale=1.0, stride=1,
+                         farneback_params=None, engine='farneback', workers=1, save_visualisations=True):
+    """
+    Computes dense optical flow for a folder of video frames and saves visualizations.
+
+    With store_path set, flow fields are written to an on-disk FlowStore instead of being
+    kept in memory, and the returned motion data is a lazy dict-like view of that store.
+
+    Parameters:
+        input_folder (str): Path to the folder containing video frames.
+        output_folder (str): Path to the folder where optical flow visualizations will be saved.
+        store_path (str): Directory for the memory-mapped flow store. None keeps flow in a dict.
+        store_dtype (str): 'float32', 'float16' or 'int8' (quantized) storage in the store.
+        store_downsample (int): Spatial downsample factor of the stored flow fields.
+        store_chunk_frames (int): Flow fields per chunk file of the store.
+        scale (float): Analysis resolution as a fraction of the source (e.g. 0.25 for quarter).
+        stride (int): Compute flow between frames i and i + stride (see iter_flow).
+        farneback_params (dict): Overrides for DEFAULT_FARNEBACK_PARAMS.
+        engine (str or engine): Flow engine (see flow_engines). Sparse engines such as 'lk' only
+            produce the average magnitudes: no visualisations are saved and motion_data_dict is empty.
+        workers (int): Worker processes for flow computation (see iter_flow). None uses every CPU.
+        save_visualisations (bool): Save the HSV visualisations, written on a separate thread.
+
+    Returns:
+        tuple: (avg_magnitude_dict, motion_data_dict), where avg_magnitude_dict maps each frame
+        filename to its average flow magnitude and motion_data_dict maps 'frame_i' to its HxWx2 flow.
+    """
+    frames = FrameFolder(input_folder)
+    frame_files = frames.frame_files
+    if len(frame_files) < 2:
+        raise ValueError(f"Need at least two frames to compute optical flow, found {len(frame_files)}")
+
+    os.makedirs(output_folder, exist_ok=True)
+
+    dense = resolve_engine(engine, farneback_params).dense
+    if store_path and not dense:
+        raise ValueError("A flow store needs a dense flow engine")
+
+    writer = None
+    if store_path:
+        writer = FlowStoreWriter(store_path, chunk_frames=store_chunk_frames,
+                                 dtype=store_dtype, downsample=store_downsample)
+
+    vis_writer = None
+    if save_visualisations and dense:
+        vis_writer = VisualisationWriter(output_folder)
+
+    avg_magnitude_dict = {}
+    motion_data_dict = {}
+
+    flows = iter_flow(frames, scale, stride, farneback_params, engine, workers)
+    total = -(-(len(frame_files) - 1) // stride)
+    for start, end, flow in tqdm(flows, total=total, desc="Processing optical flow", unit="pair"):
+        avg_magnitude = mean_flow_magnitude(flow)
+        for i in range(start + 1, end + 1):
+            avg_magnitude_dict[frame_files[i]] = avg_magnitude
+
+        if not dense:
+            continue
+
+        if writer is not None:
+            writer.append(f"frame_{end}", flow)
+        else:
+            motion_data_dict[f"frame_{end}"] = flow
+
+        if vis_writer is not None:
+            vis_writer.put(end, flow)
+
+    if vis_writer is not None:
+        vis_writer.close()
+    if writer is not None:
+        motion_data_dict = writer.close()
+
+    return avg_magnitude_dict, motion_data_dict
+
+
+def make_synthetic_clip(num_frames=60, size=(640, 360), seed=0):
+    """
+    Builds a clip of a textured rectangle moving at a varying speed over a slowly panning
+    textured background, so the per-frame flow magnitude changes over time.
+
+    Returns:
+        list of ndarray: BGR frames.
+    """
+    rng = np.random.default_rng(seed)
+    width, height = size
+    pad = num_frames * 2
+    background = cv2.GaussianBlur(rng.integers(0, 256, (height, width + pad, 3), dtype=np.uint8), (7, 7), 0)
+    texture = cv2.GaussianBlur(rng.integers(0, 256, (height // 3, width // 5, 3), dtype=np.uint8), (5, 5), 0)
+
+    frames = []
+    x = 0.0
+    for i in range(num_frames):
+        pan = i % 20 if (i // 20) % 2 else 0  # alternate static and panning segments
+        frame = background[:, pan:pan + width].copy()
+        x += 2 + 10 * abs(np.sin(i / 6))
+        left = int(x) % (width - texture.shape[1])
+        top = height // 3
+        frame[top:top + texture.shape[0], left:left + texture.shape[1]] = texture
+        frames.append(frame)
+    return frames
+
+
+def flow_accuracy_report(configs=None, frames=None):
+    """
+    Compares the average-magnitude output of reduced-cost flow settings against the
+    full-resolution, stride-1 baseline on a synthetic clip.
+
+    Parameters:
+        configs (list of dict): Each with optional 'scale', 'stride' and 'farneback_params'.
+        frames (list of ndarray): Clip to use. Defaults to make_synthetic_clip().
+
+    Returns:
+        list of dict: One row per config (baseline first) with 'seconds', 'fps', 'speedup',
+        'mean_abs_error' and 'correlation' against the baseline.
+    """
+    if frames is None:
+        frames = make_synthetic_clip()
+    if configs is None:
+        configs = [
+            {'scale': 0.5},
+            {'scale': 0.25},
+            {'scale': 0.25, 'stride': 2},
+            {'scale': 0.25, 'farneback_params': {'levels': 2, 'iterations': 2}},
+        ]
+
+    def run(config):
+        start = time.perf_counter()
+        magnitudes = average_flow_magnitudes(frames, config.get('scale', 1.0), config.get('stride', 1),
+                                             config.get('farneback_params'))
+        return np.array(magnitudes), time.perf_counter() - start
+
+    baseline, baseline_seconds = run({})
+    rows = [{'config': {}, 'seconds': baseline_seconds, 'fps': (len(frames) - 1) / baseline_seconds,
+             'speedup': 1.0, 'mean_abs_error': 0.0, 'correlation': 1.0}]
+
+    for config in configs:
+        magnitudes, seconds = run(config)
+        if np.std(magnitudes) > 0 and np.std(baseline) > 0:
+            correlation = float(np.corrcoef(baseline, magnitudes)[0, 1])
+        else:
+            correlation = float('nan')
+        rows.append({
+            'config': config,
+            'seconds': seconds,
+            'fps': (len(frames) - 1) / seconds,
+            'speedup': baseline_seconds / seconds,
+            'mean_abs_error': float(np.mean(np.abs(magnitudes - baseline))),
+            'correlation': correlation,
+        })
+    return rows
+
+
+def make_moving_rectangle_clip(num_frames=60, size=(320, 240), seed=0):
+    """
+    Builds a clip of a white rectangle moving over a black background at a random speed
+    per frame, like the frames used in tests/test_optical_flow.py.
+
+    Returns:
+        list of ndarray: BGR frames.
+    """
+    rng = np.random.default_rng(seed)
+    width, height = size
+    speeds = rng.integers(0, 8, num_frames)
+    frames = []
+    x = 10
+    for i in range(num_frames):
+        frame = np.zeros((height, width, 3), dtype=np.uint8)
+        x = (x + int(speeds[i])) % (width - width // 4)
+        cv2.rectangle(frame, (x, height // 3), (x + width // 5, height // 3 + height // 4), (255, 255, 255), -1)
+        frames.append(frame)
+    return frames
+
+
+def benchmark_flow_engines(engines=None, clips=None):
+    """
+    Compares flow engines by throughput and by how well their average-magnitude series
+    correlates with the Farneback baseline.
+
+    Parameters:
+        engines (list of str): Engine names from flow_engines.FLOW_ENGINES. Defaults to all of them.
+        clips (dict): Clip name -> list of frames. Defaults to moving-rectangle and textured clips.
+
+    Returns:
+        list of dict: One row per (clip, engine) with 'fps' and 'correlation'.
+    """
+    if engines is None:
+        engines = list(FLOW_ENGINES)
+    if clips is None:
+        clips = {'rectangle': make_moving_rectangle_clip(), 'textured': make_synthetic_clip()}
+
+    rows = []
+    for clip_name, frames in clips.items():
+        baseline = None
+        for engine in ['farneback'] + [e for e in engines if e != 'farneback']:
+            start = time.perf_counter()
+            magnitudes = np.array(average_flow_magnitudes(frames, engine=engine))
+            seconds = time.perf_counter() - start
+            if baseline is None:
+                baseline = magnitudes
+            if np.std(magnitudes) > 0 and np.std(baseline) > 0:
+                correlation = float(np.corrcoef(baseline, magnitudes)[0, 1])
+            else:
+                correlation = float('nan')
+            if engine in engines:
+                rows.append({'clip': clip_name, 'engine': engine,
+                             'fps': (len(frames) - 1) / seconds, 'correlation': correlation})
+    return rows
+
+
+if __name__ == "__main__":
+    num_frames = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    clip = make_synthetic_clip(num_frames, size=(1280, 720))
+    print("Resolution / stride settings:")
+    for row in flow_accuracy_report(frames=clip):
+        name = ", ".join(f"{k}={v}" for k, v in row['config'].items()) or "baseline (full resolution)"
+        print(f"{name:<60} {row['fps']:7.1f} fps  {row['speedup']:5.1f}x  "
+              f"MAE {row['mean_abs_error']:.3f}  r={row['correlation']:.3f}")
+
+    print("\nFlow engines:")
+    clips = {'rectangle': make_moving_rectangle_clip(num_frames), 'textured': clip}
+    for row in benchmark_flow_engines(clips=clips):
+        print(f"{row['clip']:<10} {row['engine']:<14} {row['fps']:8.1f} fps  r={row['correlation']:.3f}")
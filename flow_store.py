@@ -0,0 +1,176 @@
+import os
+import json
+from collections import OrderedDict
+from collections.abc import Mapping
+import cv2
+import numpy as np
+
+STORE_DTYPES = ("float32", "float16", "int8")
+
+
+class FlowStoreWriter:
+    """
+    Writes dense HxWx2 optical-flow fields into chunked, memory-mapped .npy files.
+
+    Frames are stored in files of chunk_frames fields each, so a feature-length film never
+    needs more than the chunk being written in memory. The last chunk is cut to the fields
+    it holds on close.
+
+    int8 vectors beyond +-max_abs are clipped; how many components were is counted in the
+    store's metadata (FlowStore.clipped_values).
+
+    Args:
+        path (str): Directory of the store. Created if it does not exist.
+        chunk_frames (int): Number of flow fields per chunk file.
+        dtype (str): 'float32' (lossless), 'float16', or 'int8' (linearly quantized to +-max_abs).
+        downsample (int): Spatial downsample factor. Vectors keep source-pixel units.
+        max_abs (float): Clipping range of the int8 quantization, in pixels per frame.
+    """
+
+    def __init__(self, path, chunk_frames=256, dtype="float32", downsample=1, max_abs=32.0):
+        if dtype not in STORE_DTYPES:
+            raise ValueError(f"dtype must be one of {STORE_DTYPES}, got '{dtype}'")
+        if downsample < 1:
+            raise ValueError(f"downsample must be at least 1, got {downsample}")
+
+        self.path = path
+        self.chunk_frames = chunk_frames
+        self.dtype = dtype
+        self.downsample = downsample
+        self.scale = max_abs / 127.0 if dtype == "int8" else 1.0
+        self.keys = []
+        self.shape = None
+        self.source_shape = None
+        self.chunk = None
+        self.clipped_values = 0
+        os.makedirs(path, exist_ok=True)
+
+    def _chunk_path(self, chunk_index):
+        return os.path.join(self.path, f"chunk_{chunk_index:05d}.npy")
+
+    def append(self, key, flow):
+        """
+        Stores the flow field for a frame under the given key.
+        """
+        if self.source_shape is None:
+            self.source_shape = flow.shape[:2]
+            h, w = self.source_shape
+            self.shape = (max(1, h // self.downsample), max(1, w // self.downsample))
+        elif flow.shape[:2] != self.source_shape:
+            raise ValueError(f"Flow shape {flow.shape[:2]} does not match store shape {self.source_shape}")
+
+        if self.downsample > 1:
+            flow = cv2.resize(flow, (self.shape[1], self.shape[0]), interpolation=cv2.INTER_AREA)
+
+        index = len(self.keys)
+        row = index % self.chunk_frames
+        if row == 0:
+            if self.chunk is not None:
+                self.chunk.flush()
+            self.chunk = np.lib.format.open_memmap(
+                self._chunk_path(index // self.chunk_frames), mode="w+",
+                dtype=self.dtype, shape=(self.chunk_frames,) + self.shape + (2,)
+            )
+
+        if self.dtype == "int8":
+            quantized = np.rint(flow / self.scale)
+            self.clipped_values += int(np.count_nonzero(np.abs(quantized) > 127))
+            self.chunk[row] = np.clip(quantized, -127, 127)
+        else:
+            self.chunk[row] = flow
+        self.keys.append(key)
+
+    def close(self):
+        """
+        Flushes the last chunk and writes the index. Returns a FlowStore reader.
+        """
+        if self.chunk is not None:
+            self.chunk.flush()
+            rows = len(self.keys) % self.chunk_frames
+            if rows:
+                # Rewrite a partly filled last chunk at its real length, rather than leaving
+                # the unused rows of a whole chunk on disk
+                last = np.array(self.chunk[:rows])
+                self.chunk = None
+                chunk_path = self._chunk_path((len(self.keys) - 1) // self.chunk_frames)
+                np.save(chunk_path + ".tmp.npy", last)
+                os.replace(chunk_path + ".tmp.npy", chunk_path)
+            self.chunk = None
+
+        if self.clipped_values:
+            print(f"Flow store: {self.clipped_values} flow components beyond +-{self.scale * 127:g} px "
+                  f"were clipped by int8 quantization")
+
+        meta = {
+            "keys": self.keys,
+            "chunk_frames": self.chunk_frames,
+            "dtype": self.dtype,
+            "scale": self.scale,
+            "downsample": self.downsample,
+            "shape": list(self.shape) if self.shape else None,
+            "source_shape": list(self.source_shape) if self.source_shape else None,
+            "clipped_values": self.clipped_values,
+        }
+        with open(os.path.join(self.path, "meta.json"), "w") as f:
+            json.dump(meta, f)
+        return FlowStore(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class FlowStore(Mapping):
+    """
+    Lazy, read-only dict-like view of a flow store written by FlowStoreWriter.
+
+    Chunk files are memory-mapped on first access and only the most recently used
+    max_open_chunks stay mapped. Values are returned as float32 HxWx2 arrays, so code
+    written for motion_data_dict works on this unchanged.
+    """
+
+    def __init__(self, path, max_open_chunks=4):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        self.keys_list = meta["keys"]
+        self.index = {key: i for i, key in enumerate(self.keys_list)}
+        self.chunk_frames = meta["chunk_frames"]
+        self.dtype = meta["dtype"]
+        self.scale = meta["scale"]
+        self.downsample = meta["downsample"]
+        self.shape = tuple(meta["shape"]) if meta["shape"] else None
+        self.source_shape = tuple(meta["source_shape"]) if meta["source_shape"] else None
+        self.clipped_values = meta.get("clipped_values", 0)  # Stores from before it was counted have none
+        self.max_open_chunks = max_open_chunks
+        self.open_chunks = OrderedDict()
+
+    def _chunk(self, chunk_index):
+        if chunk_index in self.open_chunks:
+            self.open_chunks.move_to_end(chunk_index)
+        else:
+            chunk_path = os.path.join(self.path, f"chunk_{chunk_index:05d}.npy")
+            self.open_chunks[chunk_index] = np.load(chunk_path, mmap_mode="r")
+            if len(self.open_chunks) > self.max_open_chunks:
+                self.open_chunks.popitem(last=False)
+        return self.open_chunks[chunk_index]
+
+    def __getitem__(self, key):
+        i = self.index[key]
+        stored = self._chunk(i // self.chunk_frames)[i % self.chunk_frames]
+        flow = stored.astype(np.float32)
+        if self.dtype == "int8":
+            flow *= self.scale
+        return flow
+
+    def __iter__(self):
+        return iter(self.keys_list)
+
+    def __len__(self):
+        return len(self.keys_list)
+
+    def __reduce__(self):
+        # Pickle by path: the arrays stay on disk and are re-mapped on load
+        return (FlowStore, (self.path, self.max_open_chunks))
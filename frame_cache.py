@@ -0,0 +1,197 @@
+import threading
+from collections import OrderedDict
+from PIL import Image
+
+DEFAULT_CACHE_BYTES = 256 * 1024 * 1024
+DEFAULT_PREFETCH = 32
+
+
+def load_display_image(path, display_size=None):
+    """
+    Decodes one frame image, shrunk to fit display_size (width, height) with its aspect ratio kept.
+
+    The file is closed before returning, and JPEGs are decoded at reduced scale when
+    display_size allows it.
+    """
+    with Image.open(path) as img:
+        if display_size:
+            img.draft("RGB", display_size)
+            img.thumbnail(display_size, Image.Resampling.LANCZOS)
+        else:
+            img.load()
+        return img.copy()
+
+
+def image_bytes(img):
+    return img.width * img.height * len(img.getbands())
+
+
+class FrameCache:
+    """
+    Bounded LRU cache of decoded, display-sized frames of one frame folder, with a background
+    thread that prefetches ahead of the playhead.
+
+    Frames are decoded from their files on demand and never modified once cached, so a resize
+    decodes again from the source instead of shrinking an already shrunk image. When the cache is
+    over its memory budget, frames behind the playhead (in the play direction) are evicted first,
+    then the least recently used ones.
+
+    Parameters:
+        paths (list of str): Frame image paths, in frame order.
+        max_bytes (int): Memory budget of the decoded frames.
+        prefetch (int): Frames to decode ahead of the playhead. Capped so that the prefetched
+            frames fit in half the budget.
+        display_size (tuple): (width, height) frames are shrunk to fit, or None for full size.
+        loader (callable): loader(path, display_size) -> PIL Image, defaults to load_display_image.
+    """
+
+    def __init__(self, paths, max_bytes=DEFAULT_CACHE_BYTES, prefetch=DEFAULT_PREFETCH, display_size=None,
+                 loader=load_display_image):
+        self.paths = list(paths)
+        self.max_bytes = max_bytes
+        self.prefetch = prefetch
+        self.display_size = tuple(display_size) if display_size else None
+        self.loader = loader
+
+        self.hits = 0
+        self.misses = 0
+        self.prefetched = 0
+
+        self._entries = OrderedDict()  # Frame index -> image, least recently used first
+        self._bytes = 0
+        self._frame_bytes = 0  # Size of the last decoded frame, to size the prefetch window
+        self._generation = 0  # Bumped when the display size changes, invalidating in-flight loads
+        self._position = 0
+        self._direction = 1
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+    def __len__(self):
+        return len(self.paths)
+
+    @property
+    def cached_bytes(self):
+        return self._bytes
+
+    def cached_indices(self):
+        with self._condition:
+            return list(self._entries)
+
+    def set_display_size(self, display_size):
+        """Changes the size frames are decoded at, dropping the frames cached at the old size."""
+        display_size = tuple(display_size) if display_size else None
+        with self._condition:
+            if display_size == self.display_size:
+                return
+            self.display_size = display_size
+            self._generation += 1
+            self._entries.clear()
+            self._bytes = 0
+            self._condition.notify()
+
+    def get(self, index):
+        """
+        The display-sized frame at index, decoded now if it is not cached. The returned image
+        is shared with the cache and must not be modified.
+        """
+        with self._condition:
+            img = self._entries.get(index)
+            if img is not None:
+                self._entries.move_to_end(index)
+                self.hits += 1
+                return img
+            self.misses += 1
+            generation, display_size = self._generation, self.display_size
+
+        img = self.loader(self.paths[index], display_size)
+        with self._condition:
+            if generation == self._generation:
+                self._insert(index, img)
+        return img
+
+    def seek(self, index, direction=1):
+        """
+        Moves the playhead, so the prefetch thread decodes the frames following index in
+        direction (1 forwards, -1 backwards). Starts the thread on first use.
+        """
+        with self._condition:
+            self._position = index
+            self._direction = 1 if direction >= 0 else -1
+            if self._thread is None and not self._stopped and self.prefetch > 0:
+                self._thread = threading.Thread(target=self._prefetch_loop, daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def close(self):
+        """Stops the prefetch thread and drops the cached frames."""
+        with self._condition:
+            self._stopped = True
+            self._entries.clear()
+            self._bytes = 0
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _window(self):
+        """Number of frames to keep decoded ahead of the playhead."""
+        if self._frame_bytes == 0:
+            return min(self.prefetch, len(self.paths) - 1)
+        return max(0, min(self.prefetch, len(self.paths) - 1, self.max_bytes // 2 // self._frame_bytes))
+
+    def _ahead(self, index):
+        """How many frames index lies ahead of the playhead in the play direction, wrapping around."""
+        return ((index - self._position) * self._direction) % len(self.paths)
+
+    def _insert(self, index, img):
+        # Caller holds the lock
+        if index in self._entries:
+            self._entries.move_to_end(index)
+            return
+        size = image_bytes(img)
+        self._entries[index] = img
+        self._bytes += size
+        self._frame_bytes = size
+
+        window = self._window()
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            victim = next((i for i in self._entries if i != index and self._ahead(i) > window), None)
+            if victim is None:
+                victim = next(i for i in self._entries if i != index)
+            self._bytes -= image_bytes(self._entries.pop(victim))
+
+    def _next_to_prefetch(self):
+        # Caller holds the lock
+        for step in range(1, self._window() + 1):
+            index = (self._position + step * self._direction) % len(self.paths)
+            if index not in self._entries:
+                return index
+        return None
+
+    def _prefetch_loop(self):
+        while True:
+            with self._condition:
+                index = None
+                while not self._stopped:
+                    index = self._next_to_prefetch()
+                    if index is not None:
+                        break
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                generation, display_size = self._generation, self.display_size
+
+            try:
+                img = self.loader(self.paths[index], display_size)
+            except Exception as e:
+                print(f"Failed to prefetch {self.paths[index]}: {e}")
+                with self._condition:
+                    # Stop prefetching until the playhead moves, rather than retrying the same frame
+                    self._condition.wait()
+                continue
+
+            with self._condition:
+                if generation == self._generation and not self._stopped:
+                    self._insert(index, img)
+                    self.prefetched += 1
@@ -0,0 +1,201 @@
+import os
+import json
+import numpy as np
+import cv2
+
+CONTAINERS = ("files", "chunked", "archive")
+ENCODINGS = ("jpeg", "png", "raw")
+META_FILENAME = "frames.json"
+ARCHIVE_FILENAME = "frames.pack"
+ARCHIVE_MAGIC = b"WSPFRM01"
+FRAME_EXTENSIONS = {"jpeg": ".jpg", "png": ".png", "raw": ".raw"}
+
+
+def frame_name(index, encoding):
+    """Name of the index-th exported frame (0-based), e.g. frame_000001.jpg. Sorts in frame order."""
+    return f"frame_{index + 1:06d}{FRAME_EXTENSIONS[encoding]}"
+
+
+def encode_frame(frame, encoding, quality=95):
+    """Encodes a BGR uint8 frame as JPEG, PNG or raw bytes."""
+    if encoding == "raw":
+        return np.ascontiguousarray(frame).tobytes()
+    if encoding == "jpeg":
+        ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    else:
+        ok, buffer = cv2.imencode(".png", frame)
+    if not ok:
+        raise ValueError(f"Could not encode frame as {encoding}")
+    return buffer.tobytes()
+
+
+def decode_frame(data, encoding, shape):
+    """Decodes bytes written by encode_frame back into a BGR uint8 frame of the given shape."""
+    if encoding == "raw":
+        return np.frombuffer(data, dtype=np.uint8).reshape(shape)
+    return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+def read_meta(folder_path):
+    """The container description of an exported frame folder, or None for a plain image folder."""
+    meta_path = os.path.join(folder_path, META_FILENAME)
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path) as f:
+        return json.load(f)
+
+
+def is_packed(folder_path):
+    """True if the folder holds its frames in a chunked array or archive instead of image files."""
+    meta = read_meta(folder_path)
+    return meta is not None and meta["container"] != "files"
+
+
+class ChunkedFrameWriter:
+    """
+    Writes frames into chunked, memory-mapped (chunk_frames, H, W, 3) uint8 .npy files,
+    like FlowStoreWriter does for flow fields.
+    """
+
+    def __init__(self, folder_path, chunk_frames=256):
+        self.folder_path = folder_path
+        self.chunk_frames = chunk_frames
+        self.num_frames = 0
+        self.shape = None
+        self.chunk = None
+
+    def append(self, frame):
+        if self.shape is None:
+            self.shape = frame.shape
+        elif frame.shape != self.shape:
+            raise ValueError(f"Frame shape {frame.shape} does not match {self.shape}")
+        row = self.num_frames % self.chunk_frames
+        if row == 0:
+            if self.chunk is not None:
+                self.chunk.flush()
+            chunk_path = os.path.join(self.folder_path, f"chunk_{self.num_frames // self.chunk_frames:05d}.npy")
+            self.chunk = np.lib.format.open_memmap(chunk_path, mode="w+", dtype=np.uint8,
+                                                   shape=(self.chunk_frames,) + self.shape)
+        self.chunk[row] = frame
+        self.num_frames += 1
+
+    def close(self):
+        if self.chunk is not None:
+            self.chunk.flush()
+            self.chunk = None
+        return {"chunk_frames": self.chunk_frames}
+
+
+class ArchiveFrameWriter:
+    """
+    Appends encoded frames to a single frames.pack file. On close, the byte offsets of the
+    frames are appended as an index, followed by the frame count and a magic marker:
+
+        [frame 0][frame 1]...[offsets: int64 x (n + 1)][n: int64][ARCHIVE_MAGIC]
+    """
+
+    def __init__(self, folder_path):
+        self.file = open(os.path.join(folder_path, ARCHIVE_FILENAME), "wb")
+        self.offsets = [0]
+
+    def append(self, data):
+        self.file.write(data)
+        self.offsets.append(self.offsets[-1] + len(data))
+
+    def close(self):
+        self.file.write(np.asarray(self.offsets, dtype="<i8").tobytes())
+        self.file.write(np.int64(len(self.offsets) - 1).astype("<i8").tobytes())
+        self.file.write(ARCHIVE_MAGIC)
+        self.file.close()
+        return {}
+
+
+def write_meta(folder_path, meta):
+    tmp_path = os.path.join(folder_path, META_FILENAME + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, os.path.join(folder_path, META_FILENAME))
+
+
+class PackedFrames:
+    """
+    Read-only sequence over the frames of a chunked or archive container.
+
+    Chunk files and the archive are memory-mapped, so opening a container costs nothing and
+    only the frames accessed are read. Pickles by path, like FlowStore.
+    """
+
+    def __init__(self, folder_path):
+        self.folder_path = folder_path
+        meta = read_meta(folder_path)
+        if meta is None or meta["container"] == "files":
+            raise ValueError(f"'{folder_path}' is not a packed frame container")
+        self.meta = meta
+        self.container = meta["container"]
+        self.encoding = meta["encoding"]
+        self.shape = tuple(meta["shape"]) if meta["shape"] else None
+        self.num_frames = meta["num_frames"]
+        self.frame_names = [frame_name(i, self.encoding) for i in range(self.num_frames)]
+        self.name_index = {name: i for i, name in enumerate(self.frame_names)}
+        self._chunks = {}
+
+        if self.container == "archive":
+            data = np.memmap(os.path.join(folder_path, ARCHIVE_FILENAME), dtype=np.uint8, mode="r")
+            if bytes(data[-len(ARCHIVE_MAGIC):]) != ARCHIVE_MAGIC:
+                raise ValueError(f"'{folder_path}' has an incomplete frame archive")
+            footer = len(data) - len(ARCHIVE_MAGIC) - 8
+            count = int(np.frombuffer(bytes(data[footer:footer + 8]), dtype="<i8")[0])
+            index_start = footer - 8 * (count + 1)
+            self.offsets = np.frombuffer(bytes(data[index_start:footer]), dtype="<i8")
+            self.data = data
+
+    def __len__(self):
+        return self.num_frames
+
+    def __iter__(self):
+        for i in range(self.num_frames):
+            yield self[i]
+
+    def chunk(self, chunk_index):
+        """The memory-mapped (chunk_frames, H, W, 3) array of a chunked container."""
+        if chunk_index not in self._chunks:
+            chunk_path = os.path.join(self.folder_path, f"chunk_{chunk_index:05d}.npy")
+            self._chunks[chunk_index] = np.load(chunk_path, mmap_mode="r")
+        return self._chunks[chunk_index]
+
+    def iter_blocks(self):
+        """
+        Yields the frames as (n, H, W, 3) blocks: whole chunks of a chunked container without
+        copying, single frames of an archive.
+        """
+        if self.container == "chunked":
+            chunk_frames = self.meta["chunk_frames"]
+            for start in range(0, self.num_frames, chunk_frames):
+                yield self.chunk(start // chunk_frames)[:min(chunk_frames, self.num_frames - start)]
+        else:
+            for frame in self:
+                yield frame[np.newaxis]
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.num_frames
+        if not 0 <= index < self.num_frames:
+            raise IndexError(f"Frame {index} out of range for {self.num_frames} frames")
+        if self.container == "chunked":
+            chunk_frames = self.meta["chunk_frames"]
+            return np.array(self.chunk(index // chunk_frames)[index % chunk_frames])
+        data = self.data[self.offsets[index]:self.offsets[index + 1]]
+        frame = decode_frame(data, self.encoding, self.shape)
+        return frame.copy() if self.encoding == "raw" else frame  # Raw frames are views of the archive
+
+    def read(self, name):
+        """The frame stored under one of frame_names."""
+        return self[self.name_index[name]]
+
+    def __reduce__(self):
+        return (PackedFrames, (self.folder_path,))
+
+
+def open_container(folder_path):
+    """PackedFrames for a packed frame folder, None for a folder of image files."""
+    return PackedFrames(folder_path) if is_packed(folder_path) else None
@@ -0,0 +1,196 @@
+import os
+import sys
+import argparse
+from collections import deque
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+from tqdm import tqdm
+
+import frame_container
+from frame_container import CONTAINERS, ENCODINGS
+from frame_stream import iter_video_frames, get_video_frame_count, list_frame_files
+from parallel_metrics import resolve_workers
+
+DEFAULT_ENCODINGS = {"files": "jpeg", "chunked": "raw", "archive": "jpeg"}
+
+
+def clear_exported_frames(save_dir):
+    """Removes the frames of an earlier export, so a new export never mixes with them."""
+    # Container files first: with frames.json gone, list_frame_files sees the image files again
+    for filename in os.listdir(save_dir):
+        if (filename in (frame_container.META_FILENAME, frame_container.ARCHIVE_FILENAME)
+                or (filename.startswith("chunk_") and filename.endswith(".npy"))):
+            os.remove(os.path.join(save_dir, filename))
+    for filename in list_frame_files(save_dir):
+        os.remove(os.path.join(save_dir, filename))
+
+
+def resize_frame(frame, scale):
+    if scale == 1.0:
+        return frame
+    h, w = frame.shape[:2]
+    size = (max(1, int(round(w * scale))), max(1, int(round(h * scale))))
+    return cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+
+
+def _export_segment(segment, save_dir, scale, encoding, quality):
+    """Writes the frames of a sharded_decode.VideoSegment as image files; returns their shapes."""
+    shapes = []
+    for i, frame in enumerate(segment):
+        frame = resize_frame(frame, scale)
+        data = frame_container.encode_frame(frame, encoding, quality)
+        name = frame_container.frame_name(segment.start // segment.stride + i, encoding)
+        with open(os.path.join(save_dir, name), "wb") as f:
+            f.write(data)
+        shapes.append(frame.shape)
+    return shapes
+
+
+def export_frames(video_filepath, save_dir=None, stride=1, scale=1.0, encoding=None, container="files",
+                  quality=95, chunk_frames=256, workers=None, max_queue=None, decode_workers=1):
+    """
+    Decodes a video and saves its frames, like pre_processing.export_as_frames but with a choice
+    of frame rate, resolution, encoding and container, and with resizing and encoding done on a
+    thread pool while the next frames are decoded.
+
+    Parameters:
+        video_filepath (str): Path to the video file.
+        save_dir (str): Folder to save the frames in. Defaults to a folder named after the video
+            in the current directory. Frames of an earlier export in it are removed.
+        stride (int): Keep every stride-th frame.
+        scale (float): Downscale factor of the saved frames (e.g. 0.5 for half size).
+        encoding (str): 'jpeg', 'png' or 'raw' (uint8 pixels). Defaults to 'jpeg', or 'raw' for
+            the chunked container, which only stores raw frames.
+        container (str): 'files' (one image per frame), 'chunked' (memory-mappable .npy arrays of
+            chunk_frames frames) or 'archive' (one frames.pack file with an offset index).
+            Packed containers are read through frame_stream.FrameFolder and iter_folder_frames.
+        quality (int): JPEG quality.
+        chunk_frames (int): Frames per chunk file of the chunked container.
+        workers (int): Encoding threads. None uses one per CPU.
+        max_queue (int): Frames decoded ahead of the writer at most. Defaults to 4 per thread.
+        decode_workers (int): With the files container, decode the video in this many time
+            segments at once, each process encoding its own frames (see sharded_decode).
+
+    Returns:
+        str: Path to the folder where the frames are saved.
+    """
+    if container not in CONTAINERS:
+        raise ValueError(f"container must be one of {CONTAINERS}, got '{container}'")
+    encoding = encoding or DEFAULT_ENCODINGS[container]
+    if encoding not in ENCODINGS:
+        raise ValueError(f"encoding must be one of {ENCODINGS}, got '{encoding}'")
+    if container == "chunked" and encoding != "raw":
+        raise ValueError("The chunked container only stores raw frames")
+    if container == "files" and encoding == "raw":
+        raise ValueError("Raw frames need a packed container ('chunked' or 'archive')")
+    if scale <= 0:
+        raise ValueError(f"scale must be positive, got {scale}")
+    if decode_workers > 1 and container != "files":
+        raise ValueError("Parallel decoding needs the files container, packed containers are written in order")
+
+    if save_dir is None:
+        save_dir = os.path.splitext(os.path.basename(video_filepath))[0]
+    os.makedirs(save_dir, exist_ok=True)
+    clear_exported_frames(save_dir)
+
+    if decode_workers > 1:
+        from sharded_decode import map_video_segments
+        export = partial(_export_segment, save_dir=save_dir, scale=scale, encoding=encoding, quality=quality)
+        map_video_segments(export, video_filepath, decode_workers, stride=stride)
+        return save_dir
+
+    workers = resolve_workers(workers)
+    max_queue = max_queue or 4 * workers
+    writer = None
+    if container == "chunked":
+        writer = frame_container.ChunkedFrameWriter(save_dir, chunk_frames)
+    elif container == "archive":
+        writer = frame_container.ArchiveFrameWriter(save_dir)
+
+    def prepare(index, frame):
+        frame = resize_frame(frame, scale)
+        if container == "files":
+            data = frame_container.encode_frame(frame, encoding, quality)
+            with open(os.path.join(save_dir, frame_container.frame_name(index, encoding)), "wb") as f:
+                f.write(data)
+            return frame.shape, None
+        if container == "chunked":
+            return frame.shape, frame
+        return frame.shape, frame_container.encode_frame(frame, encoding, quality)
+
+    shape = None
+    num_frames = 0
+    pending = deque()
+
+    def write_next():
+        nonlocal shape
+        frame_shape, payload = pending.popleft().result()
+        if shape is None:
+            shape = frame_shape
+        if writer is not None:
+            writer.append(payload)
+
+    total = -(-get_video_frame_count(video_filepath) // stride) or None
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        try:
+            frames = iter_video_frames(video_filepath, stride=stride)
+            for frame in tqdm(frames, total=total, desc="Exporting frames", unit="frame"):
+                pending.append(executor.submit(prepare, num_frames, frame))
+                num_frames += 1
+                # Bounded queue: wait for the oldest frame before decoding further ahead
+                while len(pending) >= max_queue:
+                    write_next()
+            while pending:
+                write_next()
+        finally:
+            for future in pending:
+                future.cancel()
+
+    if writer is None:
+        # A plain image folder stays just images: wisper's folder readers open every file in it
+        return save_dir
+
+    meta = {
+        "container": container,
+        "encoding": encoding,
+        "num_frames": num_frames,
+        "shape": list(shape) if shape else None,
+        "stride": stride,
+        "scale": scale,
+        "quality": quality if encoding == "jpeg" else None,
+    }
+    meta.update(writer.close())
+    frame_container.write_meta(save_dir, meta)
+    return save_dir
+
+
+def add_export_arguments(parser, prefix="export-"):
+    """Adds the frame export options, shared by frame_export.py and run.py."""
+    parser.add_argument(f"--{prefix}stride", type=int, default=1, help="Keep every n-th frame")
+    parser.add_argument(f"--{prefix}scale", type=float, default=1.0, help="Downscale factor of the saved frames")
+    parser.add_argument(f"--{prefix}encoding", choices=ENCODINGS, default=None,
+                        help="Frame encoding (default: jpeg, raw for the chunked container)")
+    parser.add_argument(f"--{prefix}container", choices=CONTAINERS, default="files",
+                        help="One image per frame, chunked memory-mappable arrays, or a single archive")
+    parser.add_argument(f"--{prefix}quality", type=int, default=95, help="JPEG quality")
+    parser.add_argument(f"--{prefix}decode-workers", type=int, default=1,
+                        help="Decode the video in this many segments in parallel (files container only)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the frames of a video.")
+    parser.add_argument("video_filepath")
+    parser.add_argument("save_dir", nargs="?", default=None)
+    add_export_arguments(parser, prefix="")
+    parser.add_argument("--workers", type=int, default=None, help="Encoding threads (default: one per CPU)")
+    args = parser.parse_args(argv)
+
+    save_dir = export_frames(args.video_filepath, args.save_dir, stride=args.stride, scale=args.scale,
+                             encoding=args.encoding, container=args.container, quality=args.quality,
+                             workers=args.workers, decode_workers=args.decode_workers)
+    print(f"Frames saved to {save_dir}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,288 @@
+import os
+import cv2
+from tqdm import tqdm
+
+from wisper import brightness_processing, colour_processing
+import frame_container
+import metrics_store
+from flow_engines import get_flow_engine, mean_flow_magnitude
+
+FRAME_EXTENSIONS = ('png', 'jpg', 'jpeg', 'bmp')
+
+
+def list_frame_files(folder_path):
+    """
+    Lists the frame images in a folder in sorted order. For a packed container (see
+    frame_export) these are the names its frames are read by through FrameFolder.
+
+    Args:
+        folder_path (str): Path to the folder containing frame images.
+
+    Returns:
+        list of str: Sorted frame filenames (not full paths).
+    """
+    container = frame_container.open_container(folder_path)
+    if container is not None:
+        return container.frame_names
+    return sorted(
+        [filename for filename in os.listdir(folder_path)
+         if os.path.isfile(os.path.join(folder_path, filename)) and filename.lower().endswith(FRAME_EXTENSIONS)]
+    )
+
+
+class FrameFolder:
+    """
+    Lazy, indexable sequence over the frames of a folder. Frames are read on access,
+    so callers can skip frames without decoding them. Slicing returns another FrameFolder,
+    which is cheap to send to a worker process. Folders holding a packed container
+    (see frame_export) are read from the container.
+    """
+
+    def __init__(self, folder_path, frame_files=None, container=None):
+        self.folder_path = folder_path
+        self.container = container if container is not None else frame_container.open_container(folder_path)
+        if frame_files is None:
+            frame_files = self.container.frame_names if self.container is not None else list_frame_files(folder_path)
+        self.frame_files = frame_files
+
+    def __len__(self):
+        return len(self.frame_files)
+
+    def __iter__(self):
+        for i in range(len(self.frame_files)):
+            yield self[i]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return FrameFolder(self.folder_path, self.frame_files[index], self.container)
+        if self.container is not None:
+            return self.container.read(self.frame_files[index])
+        return cv2.imread(os.path.join(self.folder_path, self.frame_files[index]))
+
+
+def iter_folder_frames(folder_path):
+    """
+    Yields the frames of a folder of exported images, in sorted order.
+
+    Args:
+        folder_path (str): Path to the folder containing frame images, or a packed container.
+
+    Yields:
+        ndarray: Each frame in BGR format.
+    """
+    container = frame_container.open_container(folder_path)
+    if container is not None:
+        yield from container
+        return
+    for filename in list_frame_files(folder_path):
+        yield cv2.imread(os.path.join(folder_path, filename))
+
+
+def get_video_frame_count(video_filepath):
+    """
+    Returns the frame count reported by the container (may be approximate).
+    """
+    cap = cv2.VideoCapture(video_filepath)
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    return frame_count
+
+
+def get_video_fps(video_filepath):
+    """
+    Returns the frame rate reported by the container, or None if it reports none.
+    """
+    cap = cv2.VideoCapture(video_filepath)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    cap.release()
+    return fps if fps > 0 else None
+
+
+def iter_video_frames(video_filepath, stride=1):
+    """
+    Decodes a video once and yields its frames without writing anything to disk.
+
+    Args:
+        video_filepath (str): Path to the video file.
+        stride (int): Yield every stride-th frame. Skipped frames are grabbed but not decoded.
+
+    Yields:
+        ndarray: Each decoded frame in BGR format.
+    """
+    if stride < 1:
+        raise ValueError(f"stride must be at least 1, got {stride}")
+
+    cap = cv2.VideoCapture(video_filepath)
+    if not cap.isOpened():
+        raise ValueError(f"Could not open video '{video_filepath}'")
+
+    try:
+        index = 0
+        while True:
+            if index % stride == 0:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                yield frame
+            elif not cap.grab():
+                break
+            index += 1
+    finally:
+        cap.release()
+
+
+class BrightnessStage:
+    """Per-frame average brightness, as computed by brightness_processing."""
+
+    def __init__(self):
+        self.brightness = []
+
+    def update(self, frame):
+        self.brightness.append(brightness_processing.calculate_frame_brightness(frame))
+
+    def result(self):
+        return {"brightness": self.brightness}
+
+
+class ColourStage:
+    """Per-frame chroma and Hasler & Süsstrunk colourfulness, as computed by colour_processing."""
+
+    def __init__(self):
+        self.chroma = []
+        self.colourfulness = []
+
+    def update(self, frame):
+        metrics = colour_processing.compute_metrics(frame)
+        self.chroma.append(metrics['average_chroma'])
+        self.colourfulness.append(metrics['colorfulness'])
+
+    def result(self):
+        return {
+            "chroma": self.chroma,
+            "HS_colourfulness": colour_processing.normalize_colourfulness(self.colourfulness),
+        }
+
+
+class OpticalFlowStage:
+    """
+    Average optical flow magnitude between each pair of consecutive frames.
+
+    Only the previous grayscale frame is kept, so memory does not grow with video length.
+    Dense flow fields are discarded unless a flow_store.FlowStoreWriter is given.
+    With scale < 1, flow is computed at reduced resolution and rescaled to source pixels.
+    Visualisations and the flow store need a dense engine; sparse engines only give magnitudes.
+    """
+
+    def __init__(self, output_folder=None, flow_store=None, scale=1.0, engine='farneback'):
+        self.output_folder = output_folder
+        self.scale = scale
+        self.engine = get_flow_engine(engine)
+        if (output_folder or flow_store is not None) and not self.engine.dense:
+            raise ValueError("Flow visualisations and the flow store need a dense flow engine")
+        if output_folder:
+            os.makedirs(output_folder, exist_ok=True)
+        self.flow_store = flow_store
+        self.prev_gray = None
+        self.magnitudes = []
+
+    def update(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if self.scale != 1.0:
+            gray = cv2.resize(gray, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        if self.prev_gray is not None:
+            flow = self.engine.compute(self.prev_gray, gray)
+            if self.scale != 1.0:
+                flow /= self.scale
+            self.magnitudes.append(mean_flow_magnitude(flow))
+            if self.flow_store is not None:
+                self.flow_store.append(f"frame_{len(self.magnitudes)}", flow)
+
+            if self.output_folder:
+                from flow_processing import flow_to_bgr  # flow_processing imports this module
+                magnitude, angle = cv2.cartToPolar(flow[..., 0], flow[..., 1])
+                output_path = os.path.join(self.output_folder, f"flow_{len(self.magnitudes):04d}.jpg")
+                cv2.imwrite(output_path, flow_to_bgr(magnitude, angle))
+        self.prev_gray = gray
+
+    def result(self):
+        if self.flow_store is not None:
+            self.flow_store.close()
+        return {"optical_flow_magnitude": self.magnitudes}
+
+
+def default_stages(flow_output_folder=None, fused=False, flow_store=None, flow_scale=1.0, flow_engine='farneback'):
+    """
+    Returns the metric stages run by the standard pipeline.
+
+    Args:
+        flow_output_folder (str): If given, optical flow visualisations are saved here.
+        fused (bool): Compute brightness and colour with the fused kernel from fused_metrics.
+        flow_store (FlowStoreWriter): If given, dense flow fields are written to this store.
+        flow_scale (float): Optical flow analysis resolution as a fraction of the source.
+        flow_engine (str): Optical flow engine name from flow_engines.FLOW_ENGINES.
+    """
+    flow_stage = OpticalFlowStage(flow_output_folder, flow_store, flow_scale, flow_engine)
+    if fused:
+        from fused_metrics import FusedMetricsStage
+        return [FusedMetricsStage(), flow_stage]
+    return [BrightnessStage(), ColourStage(), flow_stage]
+
+
+def run_metric_stream(frames, stages, total=None, desc="Processing frames"):
+    """
+    Feeds every frame from an iterable through all stages in a single pass.
+
+    Args:
+        frames (iterable of ndarray): Frames in BGR format, e.g. from iter_video_frames.
+        stages (list): Objects with update(frame) and result() methods.
+        total (int): Expected frame count for the progress bar. Optional.
+        desc (str): Progress bar description.
+
+    Returns:
+        dict: The merged results of all stages, plus 'num_frames'.
+    """
+    num_frames = 0
+    for frame in tqdm(frames, total=total, desc=desc, unit="frame"):
+        for stage in stages:
+            stage.update(frame)
+        num_frames += 1
+
+    results = {"num_frames": num_frames}
+    for stage in stages:
+        results.update(stage.result())
+    return results
+
+
+def process_video_stream(video_filepath, flow_output_folder=None, stages=None):
+    """
+    Computes all per-frame metrics of a video in one decode pass, without exporting frames.
+
+    Args:
+        video_filepath (str): Path to the video file.
+        flow_output_folder (str): If given, optical flow visualisations are saved here.
+        stages (list): Metric stages to run. Defaults to default_stages().
+
+    Returns:
+        dict: Per-frame metric lists keyed by metric name, plus 'num_frames'.
+    """
+    if stages is None:
+        stages = default_stages(flow_output_folder)
+    total = get_video_frame_count(video_filepath) or None
+    return run_metric_stream(iter_video_frames(video_filepath), stages, total=total)
+
+
+def save_stream_metrics_to_csv(results, save_path):
+    """
+    Writes the metrics from process_video_stream in the same one-row CSV layout as save_metrics_to_csv.
+    Only the per-frame metrics of metrics_store.PER_FRAME_METRICS are written; other keys that
+    stages return are left out.
+
+    Args:
+        results (dict): Output of process_video_stream.
+        save_path (str): Folder to write the CSV files to.
+    """
+    for metric_name in metrics_store.PER_FRAME_METRICS:
+        if metric_name in results:
+            metrics_store.write_metric_to_csv(save_path, metric_name, results[metric_name], results["num_frames"])
+
+    print(f"Metrics saved in {save_path}")
@@ -0,0 +1,139 @@
+import sys
+import time
+import cv2
+import numpy as np
+
+from wisper import brightness_processing, colour_processing
+
+
+class FusedFrameMetrics:
+    """
+    Computes brightness, average chroma, average hue and Hasler & Süsstrunk colourfulness
+    of a BGR frame in one call.
+
+    Each colour-space conversion is done once per frame, into scratch buffers that are
+    allocated on the first frame and reused for every following frame of the same size.
+    """
+
+    def __init__(self):
+        self.shape = None
+
+    def _allocate(self, shape):
+        h, w = shape[:2]
+        self.shape = shape
+        self.gray = np.empty((h, w), dtype=np.uint8)
+        self.lab = np.empty((h, w, 3), dtype=np.uint8)
+        self.bgr = np.empty((h, w, 3), dtype=np.float32)
+        self.a = np.empty((h, w), dtype=np.float32)
+        self.b = np.empty((h, w), dtype=np.float32)
+        self.chroma = np.empty((h, w), dtype=np.float32)
+        self.hue = np.empty((h, w), dtype=np.float32)
+        self.rg = np.empty((h, w), dtype=np.float32)
+        self.yb = np.empty((h, w), dtype=np.float32)
+        self.channels = [np.empty((h, w), dtype=np.float32) for _ in range(3)]
+
+    def __call__(self, frame):
+        """
+        Args:
+            frame (ndarray): The frame in BGR format (uint8).
+
+        Returns:
+            dict: Keys 'brightness', 'average_chroma', 'average_hue' and 'colorfulness'.
+        """
+        if frame.shape != self.shape:
+            self._allocate(frame.shape)
+
+        # Luminance
+        cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self.gray)
+        brightness = cv2.mean(self.gray)[0]
+
+        # CIELab chroma and hue from the a/b channels (offset by 128 in 8-bit Lab)
+        cv2.cvtColor(frame, cv2.COLOR_BGR2LAB, dst=self.lab)
+        np.subtract(self.lab[..., 1], 128.0, out=self.a)
+        np.subtract(self.lab[..., 2], 128.0, out=self.b)
+        cv2.cartToPolar(self.a, self.b, magnitude=self.chroma, angle=self.hue, angleInDegrees=True)
+        avg_chroma = cv2.mean(self.chroma)[0]
+        avg_hue = cv2.mean(self.hue)[0]
+
+        # Opponent channels for Hasler & Süsstrunk colourfulness
+        self.bgr[...] = frame
+        blue, green, red = cv2.split(self.bgr, self.channels)
+        cv2.absdiff(red, green, dst=self.rg)
+        cv2.addWeighted(red, 0.5, green, 0.5, 0.0, dst=self.yb)
+        cv2.absdiff(self.yb, blue, dst=self.yb)
+        rg_mean, rg_std = cv2.meanStdDev(self.rg)
+        yb_mean, yb_std = cv2.meanStdDev(self.yb)
+        std_root = np.sqrt(rg_std[0, 0] ** 2 + yb_std[0, 0] ** 2)
+        mean_root = np.sqrt(rg_mean[0, 0] ** 2 + yb_mean[0, 0] ** 2)
+        colorfulness = std_root + 0.3 * mean_root
+
+        return {
+            'brightness': float(brightness),
+            'average_chroma': float(avg_chroma),
+            'average_hue': float(avg_hue),
+            'colorfulness': float(colorfulness),
+        }
+
+
+class FusedMetricsStage:
+    """
+    Stream stage that replaces BrightnessStage and ColourStage with a single fused kernel.
+    """
+
+    def __init__(self):
+        self.kernel = FusedFrameMetrics()
+        self.brightness = []
+        self.chroma = []
+        self.colourfulness = []
+
+    def update(self, frame):
+        metrics = self.kernel(frame)
+        self.brightness.append(metrics['brightness'])
+        self.chroma.append(metrics['average_chroma'])
+        self.colourfulness.append(metrics['colorfulness'])
+
+    def result(self):
+        return {
+            "brightness": self.brightness,
+            "chroma": self.chroma,
+            "HS_colourfulness": colour_processing.normalize_colourfulness(self.colourfulness),
+        }
+
+
+def benchmark_fused_metrics(frame_shape=(1080, 1920, 3), num_frames=30, seed=0):
+    """
+    Times the fused kernel against calling the separate brightness and colour functions.
+
+    Parameters:
+        frame_shape (tuple): Shape of the synthetic BGR frames.
+        num_frames (int): Number of frames to time.
+        seed (int): Seed for the random test frames.
+
+    Returns:
+        dict: Milliseconds per frame for 'separate' and 'fused', and the 'speedup'.
+    """
+    rng = np.random.default_rng(seed)
+    frames = [rng.integers(0, 256, frame_shape, dtype=np.uint8) for _ in range(num_frames)]
+
+    start = time.perf_counter()
+    for frame in frames:
+        brightness_processing.calculate_frame_brightness(frame)
+        colour_processing.compute_metrics(frame)
+    separate = (time.perf_counter() - start) / num_frames * 1000
+
+    kernel = FusedFrameMetrics()
+    kernel(frames[0])  # Allocate the scratch buffers outside the timed loop
+    start = time.perf_counter()
+    for frame in frames:
+        kernel(frame)
+    fused = (time.perf_counter() - start) / num_frames * 1000
+
+    return {'separate': separate, 'fused': fused, 'speedup': separate / fused}
+
+
+if __name__ == "__main__":
+    num_frames = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    for shape in [(480, 854, 3), (720, 1280, 3), (1080, 1920, 3)]:
+        timings = benchmark_fused_metrics(shape, num_frames)
+        print(f"{shape[1]}x{shape[0]}: separate {timings['separate']:.2f} ms/frame, "
+              f"fused {timings['fused']:.2f} ms/frame ({timings['speedup']:.1f}x)")
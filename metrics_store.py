@@ -0,0 +1,265 @@
+import os
+import sys
+import csv
+import zipfile
+import argparse
+import numpy as np
+
+METRICS_FILENAME = "metrics.npz"
+NUM_FRAMES_KEY = "num_frames"
+STRIDE_KEY = "stride"  # Only stored for metrics of every stride-th source frame (stride > 1)
+
+# Per-frame metrics as written by run.py, in the order they are exported
+PER_FRAME_METRICS = ("brightness", "chroma", "HS_colourfulness", "optical_flow_magnitude",
+                     "shot_probability", "shot_boundary")
+
+
+def save_metrics(save_path, metrics, num_frames=None, filename=METRICS_FILENAME, stride=1):
+    """
+    Writes per-frame metrics to a single columnar file, one array per metric.
+
+    The file is an uncompressed .npz, so plain np.load reads it and load_metrics can
+    memory-map single columns without reading the others.
+
+    Parameters:
+        save_path (str): Folder to write to, usually processed_videos/<name>.
+        metrics (dict): Metric name -> per-frame values. Metrics may differ in length
+            (optical flow has one value per frame pair).
+        num_frames (int): Frame count of the video. Defaults to the longest metric.
+        filename (str): File name inside save_path.
+        stride (int): The metrics are of every stride-th frame of the source video.
+
+    Returns:
+        str: Path of the written file.
+    """
+    os.makedirs(save_path, exist_ok=True)
+    arrays = {}
+    for name, values in metrics.items():
+        if name in (NUM_FRAMES_KEY, STRIDE_KEY):
+            continue
+        values = np.asarray(values)
+        arrays[name] = values if values.dtype.kind in "iub" else values.astype(np.float64)
+    if num_frames is None:
+        num_frames = metrics.get(NUM_FRAMES_KEY, max((len(v) for v in arrays.values()), default=0))
+    arrays[NUM_FRAMES_KEY] = np.array(num_frames, dtype=np.int64)
+    if stride != 1:
+        arrays[STRIDE_KEY] = np.array(stride, dtype=np.int64)
+
+    path = os.path.join(save_path, filename)
+    tmp_path = path + ".tmp.npz"
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _member_memmaps(path, names=None):
+    """
+    Memory-maps the arrays of an uncompressed .npz in place (only `names`, if given).
+
+    Returns:
+        dict: Array name -> np.memmap, or None for members that cannot be mapped (compressed,
+        object dtype or empty), which load_metrics then reads normally.
+    """
+    maps = {}
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as f:
+        for info in archive.infolist():
+            name = info.filename[:-4] if info.filename.endswith(".npy") else info.filename
+            if names is not None and name not in names:
+                continue
+            maps[name] = None
+            if info.compress_type != zipfile.ZIP_STORED:
+                continue
+            # The local header (30 bytes + name + extra field) precedes the .npy data
+            f.seek(info.header_offset + 26)
+            name_length = int.from_bytes(f.read(2), "little")
+            extra_length = int.from_bytes(f.read(2), "little")
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            if dtype.hasobject or int(np.prod(shape)) == 0:
+                continue
+            maps[name] = np.memmap(path, dtype=dtype, mode="r", offset=f.tell(), shape=shape,
+                                   order="F" if fortran_order else "C")
+    return maps
+
+
+def metric_names(path):
+    """Names of the per-frame metrics in a metrics file."""
+    with zipfile.ZipFile(path) as archive:
+        names = [info.filename[:-4] for info in archive.infolist()]
+    return [name for name in names if name not in (NUM_FRAMES_KEY, STRIDE_KEY)]
+
+
+def load_metrics(path, columns=None, mmap=True):
+    """
+    Loads per-frame metrics from a file written by save_metrics.
+
+    Parameters:
+        path (str): The metrics file, or a processed video folder containing metrics.npz.
+        columns (list of str): Metrics to load. None loads all. Missing metrics are left out.
+        mmap (bool): Memory-map the columns instead of reading them into memory.
+
+    Returns:
+        dict: Metric name -> 1D array, plus 'num_frames', and 'stride' when the metrics are of
+        every stride-th source frame.
+    """
+    if os.path.isdir(path):
+        path = os.path.join(path, METRICS_FILENAME)
+    wanted = None if columns is None else set(columns) | {NUM_FRAMES_KEY, STRIDE_KEY}
+
+    maps = _member_memmaps(path, wanted) if mmap else {}
+    metrics = {}
+    with np.load(path) as data:
+        for name in data.files:
+            if wanted is not None and name not in wanted:
+                continue
+            mapped = maps.get(name)
+            metrics[name] = mapped if mapped is not None else data[name]
+    metrics[NUM_FRAMES_KEY] = int(metrics[NUM_FRAMES_KEY])
+    if STRIDE_KEY in metrics:
+        metrics[STRIDE_KEY] = int(metrics[STRIDE_KEY])
+    return metrics
+
+
+def read_flat_csv(csv_path):
+    """
+    Reads a one-row-wide metric CSV (header frame, frame_1, ..., frame_n).
+
+    Returns:
+        tuple: (metric_name, values, num_frames) where num_frames is the header width.
+    """
+    with open(csv_path, newline='') as f:
+        header = f.readline()
+        row = f.readline().rstrip("\r\n")
+    name, _, rest = row.partition(",")
+    values = np.array(rest.split(","), dtype=np.float64) if rest else np.empty(0)
+    return name, values, header.count(",")
+
+
+def read_scenes_csv(csv_path):
+    """
+    Reads predicted_scenes.csv as an (N, 2) array of (start_frame, end_frame).
+    """
+    scenes = np.loadtxt(csv_path, delimiter=",", skiprows=1, dtype=np.int64, ndmin=2)
+    return scenes.reshape(-1, 2)
+
+
+def scenes_to_boundaries(scenes, num_frames, stride=1):
+    """
+    Per-frame shot boundary flags: 1 on the first frame of every shot except the first.
+
+    Scenes are in source video frames. With stride > 1 the flags are for every stride-th
+    source frame, and each cut is flagged on the first kept frame at or after it.
+    """
+    boundaries = np.zeros(num_frames, dtype=np.int8)
+    starts = -(-np.asarray(scenes, dtype=np.int64).reshape(-1, 2)[1:, 0] // stride)
+    boundaries[starts[(starts > 0) & (starts < num_frames)]] = 1
+    return boundaries
+
+
+def write_metric_to_csv(save_path, metric_name, metric_values, num_frames):
+    """
+    Writes one metric as a one-row CSV with header frame, frame_1, ..., frame_n.
+    """
+    os.makedirs(save_path, exist_ok=True)
+    frame_columns = [f'frame_{i+1}' for i in range(num_frames)]  # frame_1, frame_2, ..., frame_n
+    header = ['frame'] + frame_columns  # No 'average' here, as averages are computed separately
+
+    file_path = os.path.join(save_path, f"{metric_name}.csv")
+    with open(file_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)  # Write header
+        writer.writerow([metric_name] + list(metric_values))  # Write metric values
+
+
+def export_metrics_csv(path, save_path=None, columns=None):
+    """
+    Writes the metrics of a metrics file as the legacy one-row-wide CSVs
+    (<metric>.csv with header frame, frame_1, ..., frame_n).
+
+    Parameters:
+        path (str): The metrics file, or a folder containing metrics.npz.
+        save_path (str): Folder for the CSVs. Defaults to the metrics file's folder.
+        columns (list of str): Metrics to export. None exports all.
+    """
+    if os.path.isdir(path):
+        path = os.path.join(path, METRICS_FILENAME)
+    save_path = save_path or os.path.dirname(path)
+
+    metrics = load_metrics(path, columns)
+    num_frames = metrics.pop(NUM_FRAMES_KEY)
+    metrics.pop(STRIDE_KEY, None)
+    for metric_name, values in metrics.items():
+        write_metric_to_csv(save_path, metric_name, values.tolist(), num_frames)
+
+
+def convert_folder(folder_path, overwrite=False):
+    """
+    Builds metrics.npz for a processed video folder from its legacy metric CSVs and
+    predicted_scenes.csv.
+
+    Returns:
+        str: Path of the metrics file, or None if there was nothing to convert or it
+        already exists and overwrite is False.
+    """
+    path = os.path.join(folder_path, METRICS_FILENAME)
+    if os.path.exists(path) and not overwrite:
+        return None
+
+    metrics, num_frames = {}, 0
+    for metric_name in PER_FRAME_METRICS:
+        csv_path = os.path.join(folder_path, f"{metric_name}.csv")
+        if os.path.exists(csv_path):
+            _, values, width = read_flat_csv(csv_path)
+            metrics[metric_name] = values
+            num_frames = max(num_frames, width, len(values))
+    if not metrics:
+        return None
+
+    scenes_path = os.path.join(folder_path, "predicted_scenes.csv")
+    if "shot_boundary" not in metrics and os.path.exists(scenes_path):
+        metrics["shot_boundary"] = scenes_to_boundaries(read_scenes_csv(scenes_path), num_frames)
+    return save_metrics(folder_path, metrics, num_frames)
+
+
+def convert_processed_videos(root_folder="processed_videos", overwrite=False):
+    """
+    Converts every processed video folder under root_folder (see convert_folder).
+
+    Returns:
+        list of str: The metrics files written.
+    """
+    written = []
+    for name in sorted(os.listdir(root_folder)):
+        folder_path = os.path.join(root_folder, name)
+        if os.path.isdir(folder_path):
+            path = convert_folder(folder_path, overwrite)
+            if path:
+                written.append(path)
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert between metric CSVs and the columnar metrics.npz.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    convert_parser = subparsers.add_parser("convert", help="Build metrics.npz for every folder in a processed_videos tree")
+    convert_parser.add_argument("root", nargs="?", default="processed_videos")
+    convert_parser.add_argument("--overwrite", action="store_true", help="Rebuild existing metrics.npz files")
+    export_parser = subparsers.add_parser("export", help="Write the CSVs of a metrics.npz file or folder")
+    export_parser.add_argument("path")
+    export_parser.add_argument("--save-path", default=None)
+    args = parser.parse_args(argv)
+
+    if args.command == "convert":
+        written = convert_processed_videos(args.root, args.overwrite)
+        print(f"Wrote {len(written)} metrics files")
+    else:
+        export_metrics_csv(args.path, args.save_path)
+        print(f"Metrics exported from {args.path}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
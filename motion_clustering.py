@@ -0,0 +1,204 @@
+import os
+import cv2
+import numpy as np
+from tqdm import tqdm
+
+from frame_stream import FrameFolder
+
+CLUSTERING_METHODS = ("components", "grid", "dbscan")
+
+
+def motion_data_to_fields(motion_data, shape=None):
+    """
+    Converts motion data back to 2D magnitude and angle arrays, without a Python loop.
+
+    Args:
+        motion_data (ndarray): Either an HxWx2 flow field or (N, 4) rows of [x, y, magnitude, angle].
+        shape (tuple): (height, width) of the output for (N, 4) input. Defaults to the extent of the points.
+
+    Returns:
+        tuple: (magnitude_2d, angle_2d) float32 arrays.
+    """
+    motion_data = np.asarray(motion_data)
+    if motion_data.ndim == 3 and motion_data.shape[2] == 2:
+        flow = np.ascontiguousarray(motion_data, dtype=np.float32)
+        return cv2.cartToPolar(flow[..., 0], flow[..., 1])
+
+    if shape is None:
+        shape = (int(motion_data[:, 1].max()) + 1, int(motion_data[:, 0].max()) + 1)
+    magnitude_2d = np.zeros(shape, dtype=np.float32)
+    angle_2d = np.zeros(shape, dtype=np.float32)
+    xs = motion_data[:, 0].astype(np.intp)
+    ys = motion_data[:, 1].astype(np.intp)
+    magnitude_2d[ys, xs] = motion_data[:, 2]
+    angle_2d[ys, xs] = motion_data[:, 3]
+    return magnitude_2d, angle_2d
+
+
+def _downsample_fields(magnitude, angle, grid_size):
+    """Block-averages the flow vectors over grid_size x grid_size cells."""
+    h, w = magnitude.shape
+    grid_w, grid_h = max(1, w // grid_size), max(1, h // grid_size)
+    dx, dy = cv2.polarToCart(magnitude, angle)
+    dx = cv2.resize(dx, (grid_w, grid_h), interpolation=cv2.INTER_AREA)
+    dy = cv2.resize(dy, (grid_w, grid_h), interpolation=cv2.INTER_AREA)
+    return cv2.cartToPolar(dx, dy)
+
+
+def _label_direction_components(mask, angle, angle_bins, angle_threshold):
+    """
+    Connected components of the moving mask, split by quantized direction and then merged
+    back across neighbouring components whose mean directions are within angle_threshold.
+
+    Returns:
+        ndarray: Label image with 0 for background and 1..n for the merged components.
+    """
+    h, w = mask.shape
+    direction_bin = (angle * (angle_bins / (2 * np.pi))).astype(np.int32) % angle_bins
+
+    labels = np.zeros((h, w), dtype=np.int32)
+    next_label = 1
+    for b in range(angle_bins):
+        bin_mask = (mask & (direction_bin == b)).astype(np.uint8)
+        count, bin_labels = cv2.connectedComponents(bin_mask, connectivity=8)
+        if count > 1:
+            moving = bin_labels > 0
+            labels[moving] = bin_labels[moving] + (next_label - 1)
+            next_label += count - 1
+
+    if next_label <= 2:
+        return labels
+
+    # Mean direction of each component, as the angle of its summed unit vectors
+    flat = labels.ravel()
+    cos_sum = np.bincount(flat, weights=np.cos(angle).ravel(), minlength=next_label)
+    sin_sum = np.bincount(flat, weights=np.sin(angle).ravel(), minlength=next_label)
+    mean_angle = np.arctan2(sin_sum, cos_sum)
+
+    # Touching component pairs (4-neighbourhood and diagonals)
+    pairs = []
+    for a, b in [(labels[:, :-1], labels[:, 1:]), (labels[:-1, :], labels[1:, :]),
+                 (labels[:-1, :-1], labels[1:, 1:]), (labels[:-1, 1:], labels[1:, :-1])]:
+        touching = (a > 0) & (b > 0) & (a != b)
+        pairs.append(np.stack([a[touching], b[touching]], axis=1))
+    pairs = np.unique(np.sort(np.concatenate(pairs), axis=1), axis=0)
+
+    # Union-find over touching pairs with similar mean direction
+    parent = np.arange(next_label)
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for a, b in pairs:
+        difference = abs((mean_angle[a] - mean_angle[b] + np.pi) % (2 * np.pi) - np.pi)
+        if difference <= angle_threshold:
+            root_a, root_b = find(a), find(b)
+            if root_a != root_b:
+                parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    roots = np.array([find(i) for i in range(next_label)])
+    _, compact = np.unique(roots, return_inverse=True)  # background (root 0) stays 0
+    return compact[labels]
+
+
+def detect_objects_fast(magnitude, angle, min_magnitude=1.0, method="components", grid_size=4,
+                        angle_bins=8, angle_threshold=np.pi / 4, min_area=10, eps=2.0, min_samples=4):
+    """
+    Groups moving pixels into objects, as a fast replacement for per-pixel DBSCAN in
+    optical_flow.detect_objects_with_optical_flow.
+
+    Parameters:
+        magnitude (ndarray): 2D flow magnitude.
+        angle (ndarray): 2D flow angle in radians.
+        min_magnitude (float): Pixels (or grid cells) above this magnitude are considered moving.
+        method (str): 'components' labels every moving pixel with direction-aware connected
+            components; 'grid' does the same on a grid_size-downsampled motion grid; 'dbscan' runs
+            DBSCAN on the moving grid cells, with eps in grid cells.
+        grid_size (int): Cell size in pixels for 'grid' and 'dbscan'.
+        angle_bins (int): Direction bins used to split components with different motion.
+        angle_threshold (float): Touching components whose mean directions differ by at most this
+            many radians are merged.
+        min_area (int): Components with fewer points are labelled -1 (noise), like DBSCAN.
+        eps (float): DBSCAN neighbourhood radius in grid cells ('dbscan' only).
+        min_samples (int): DBSCAN core-point threshold ('dbscan' only).
+
+    Returns:
+        tuple: (labels, clustered_points) where clustered_points is an (N, 4) array of
+        [x, y, magnitude, angle] in full-resolution pixel coordinates, as expected by
+        optical_flow.visualize_clusters. Both are empty when nothing moves.
+    """
+    if method not in CLUSTERING_METHODS:
+        raise ValueError(f"Unknown method '{method}', expected one of {CLUSTERING_METHODS}")
+
+    magnitude = np.asarray(magnitude, dtype=np.float32)
+    angle = np.asarray(angle, dtype=np.float32)
+    cell = 1
+    if method in ("grid", "dbscan") and grid_size > 1:
+        magnitude, angle = _downsample_fields(magnitude, angle, grid_size)
+        cell = grid_size
+
+    mask = magnitude > min_magnitude
+    ys, xs = np.nonzero(mask)
+    if len(xs) == 0:
+        return np.array([]), np.array([])
+
+    points = np.column_stack((xs * cell + cell // 2, ys * cell + cell // 2, magnitude[ys, xs], angle[ys, xs]))
+
+    if method == "dbscan":
+        # Imported here so that scikit-learn is only loaded when DBSCAN is asked for
+        from sklearn.cluster import DBSCAN
+        labels = DBSCAN(eps=eps, min_samples=min_samples).fit(np.column_stack((xs, ys))).labels_
+        return labels, points
+
+    label_image = _label_direction_components(mask, angle, angle_bins, angle_threshold)
+    labels = label_image[ys, xs] - 1
+
+    sizes = np.bincount(labels)
+    labels[sizes[labels] < max(1, min_area // (cell * cell))] = -1
+    return labels, points
+
+
+def run_optical_flow_object_detection(input_folder, clustered_output_folder, motion_data_dict, **options):
+    """
+    Runs fast motion-object clustering on every frame and saves cluster visualizations.
+
+    Parameters:
+        input_folder (str): Path to the folder containing video frames.
+        clustered_output_folder (str): Path to save object detection visualizations.
+        motion_data_dict (Mapping): 'frame_i' -> HxWx2 flow or (N, 4) motion data. A
+            flow_store.FlowStore works as well as a dict.
+        **options: Passed to detect_objects_fast.
+    """
+    from wisper import optical_flow  # pulls in scikit-learn, so only loaded when visualising
+
+    os.makedirs(clustered_output_folder, exist_ok=True)
+    frames = FrameFolder(input_folder)
+
+    for i in tqdm(range(1, len(frames)), desc="Processing Object Detection", unit="frame"):
+        motion_data = motion_data_dict.get(f"frame_{i}")
+        if motion_data is None or motion_data.size == 0:
+            continue
+
+        frame = frames[i]
+        shape = frame.shape[:2] if motion_data.ndim == 2 else None
+        magnitude_2d, angle_2d = motion_data_to_fields(motion_data, shape)
+        if magnitude_2d.shape != frame.shape[:2]:
+            # Downsampled flow (e.g. from a flow store): label at flow resolution, draw at frame resolution
+            scale_x = frame.shape[1] / magnitude_2d.shape[1]
+            scale_y = frame.shape[0] / magnitude_2d.shape[0]
+        else:
+            scale_x = scale_y = 1.0
+
+        labels, clustered_points = detect_objects_fast(magnitude_2d, angle_2d, **options)
+        if len(clustered_points):
+            clustered_points[:, 0] *= scale_x
+            clustered_points[:, 1] *= scale_y
+
+        clustered_frame = optical_flow.visualize_clusters(frame, labels, clustered_points)
+        output_path = os.path.join(clustered_output_folder, f"clustered_{i:04d}.jpg")
+        cv2.imwrite(output_path, clustered_frame)
+
+    print("Optical flow and object detection processing completed.")
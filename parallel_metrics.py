@@ -0,0 +1,148 @@
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from wisper import brightness_processing, colour_processing
+from frame_stream import FrameFolder
+
+
+def resolve_workers(workers):
+    """Returns the worker count to use; None means one per CPU."""
+    if workers is None:
+        return os.cpu_count() or 1
+    if workers < 1:
+        raise ValueError(f"workers must be at least 1, got {workers}")
+    return workers
+
+
+def split_into_chunks(items, num_chunks, overlap=0):
+    """
+    Splits a list into contiguous chunks, each extended by `overlap` items from the next chunk.
+
+    Args:
+        items (list): Items to split, in order.
+        num_chunks (int): Maximum number of chunks.
+        overlap (int): Number of trailing items each chunk shares with the following one.
+            Use 1 for pairwise metrics so that the pair spanning a boundary is not lost.
+
+    Returns:
+        list of list: The chunks, in order.
+    """
+    num_steps = len(items) - overlap
+    if num_steps <= 0:
+        return []
+    num_chunks = max(1, min(num_chunks, num_steps))
+    base, extra = divmod(num_steps, num_chunks)
+
+    chunks = []
+    start = 0
+    for i in range(num_chunks):
+        stop = start + base + (1 if i < extra else 0)
+        chunks.append(items[start:stop + overlap])
+        start = stop
+    return chunks
+
+
+def map_frame_chunks(func, folder_path, workers=1, overlap=0, chunks_per_worker=4):
+    """
+    Runs func over the frames of a folder, split into ordered chunks across a process pool.
+    A video file is decoded in segments instead, each in the worker that runs func on it
+    (see sharded_decode.map_video_segments).
+
+    Args:
+        func (callable): Top-level function taking a frame_stream.FrameFolder slice and returning a list
+            of results. Slices only hold frame names, so they are cheap to send to a worker.
+        folder_path (str): Path to the folder containing frame images, a packed container, or a video file.
+        workers (int): Number of worker processes. 1 runs in this process; None uses every CPU.
+        overlap (int): Frames shared between neighbouring chunks (see split_into_chunks).
+        chunks_per_worker (int): Chunks per worker, so that uneven chunks balance out.
+
+    Returns:
+        list: The concatenated results of every chunk, in frame order.
+    """
+    workers = resolve_workers(workers)
+    if os.path.isfile(folder_path):
+        from sharded_decode import map_video_segments  # sharded_decode imports this module
+        return map_video_segments(func, folder_path, workers, overlap=overlap)
+    frames = FrameFolder(folder_path)
+
+    if workers == 1:
+        chunks = split_into_chunks(frames, 1, overlap)
+        return [result for chunk in chunks for result in func(chunk)]
+
+    chunks = split_into_chunks(frames, workers * chunks_per_worker, overlap)
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for chunk_results in executor.map(func, chunks):  # map() keeps submission order
+            results.extend(chunk_results)
+    return results
+
+
+def _brightness_chunk(frames):
+    return [brightness_processing.calculate_frame_brightness(frame) for frame in frames]
+
+
+def _brightness_diff_chunk(frames):
+    results = []
+    previous = None
+    for frame in frames:
+        if previous is not None:
+            results.append(brightness_processing.calculate_frame_brightness_diff(previous, frame))
+        previous = frame
+    return results
+
+
+def _colour_chunk(frames):
+    results = []
+    for frame in frames:
+        metrics = colour_processing.compute_metrics(frame)
+        results.append((metrics['average_chroma'], metrics['colorfulness']))
+    return results
+
+
+def get_brightness_list(folder_path, workers=1):
+    """
+    Reads in frames from a folder and returns a list of average brightness values for each frame.
+
+    Args:
+        folder_path (str): Path to the folder containing frame images.
+        workers (int): Number of worker processes. None uses every CPU.
+
+    Returns:
+        list: List of average brightness values for each frame.
+    """
+    return map_frame_chunks(_brightness_chunk, folder_path, workers)
+
+
+def get_brightness_diff_list(folder_path, workers=1):
+    """
+    Reads in frames from a folder and returns a list of brightness differences between consecutive frames.
+
+    Chunks overlap by one frame, so every consecutive pair is computed exactly once.
+
+    Args:
+        folder_path (str): Path to the folder containing frame images.
+        workers (int): Number of worker processes. None uses every CPU.
+
+    Returns:
+        list: List of brightness differences between consecutive frames.
+    """
+    return map_frame_chunks(_brightness_diff_chunk, folder_path, workers, overlap=1)
+
+
+def process_frames(folder_path, workers=1):
+    """
+    Computes average chroma and colourfulness for every frame in a directory.
+
+    Parameters:
+        folder_path (str): Path to the directory containing frame images.
+        workers (int): Number of worker processes. None uses every CPU.
+
+    Returns:
+        OrderedDict: Lists of 'average_chroma' and normalised 'colorfulness' values.
+    """
+    results = map_frame_chunks(_colour_chunk, folder_path, workers)
+    metrics = OrderedDict()
+    metrics['average_chroma'] = [chroma for chroma, _ in results]
+    metrics['colorfulness'] = colour_processing.normalize_colourfulness([c for _, c in results])
+    return metrics
@@ -0,0 +1,81 @@
+import time
+
+DEFAULT_FPS = 30.0
+RENDER_TIME_SMOOTHING = 0.1  # Weight of the newest render time in the moving average
+
+
+class PlaybackClock:
+    """
+    Wall-clock timeline for playing back a sequence of frames in real time.
+
+    The frame to show is derived from the time elapsed since playback started, not from how
+    many frames have been rendered, so when rendering falls behind, frames are dropped instead
+    of playback slowing down. Playback loops at the end of the sequence.
+
+    Parameters:
+        num_frames (int): Length of the timeline.
+        fps (float): Playback rate.
+        clock (callable): Returns the current time in seconds.
+    """
+
+    def __init__(self, num_frames, fps=DEFAULT_FPS, clock=time.perf_counter):
+        self.num_frames = num_frames
+        self.fps = fps
+        self.clock = clock
+        self.running = False
+        self.reset_stats()
+        self._start_time = 0.0
+        self._start_frame = 0
+        self._position = 0  # Frames since the start of the timeline, not wrapped around
+
+    def reset_stats(self):
+        self.rendered = 0
+        self.dropped = 0
+        self.render_ms = 0.0
+        self.max_render_ms = 0.0
+
+    def start(self, frame=0):
+        """Starts (or restarts) playback at frame."""
+        self._start_time = self.clock()
+        self._start_frame = frame
+        self._position = frame - 1  # So the first tick shows `frame`
+        self.running = True
+
+    def seek(self, frame):
+        """Restarts playback from frame, which is already on screen: the next tick shows the one after it."""
+        self.start(frame)
+        self._position = frame
+
+    def stop(self):
+        self.running = False
+
+    def tick(self):
+        """
+        The frame due now, or None if the frame due has already been returned. Frames that
+        fell due since the last tick but were never returned count as dropped.
+        """
+        if not self.running or self.num_frames <= 0:
+            return None
+        # The epsilon keeps a frame due exactly on time from rounding down to the previous one
+        position = self._start_frame + int((self.clock() - self._start_time) * self.fps + 1e-6)
+        if position <= self._position:
+            return None
+        self.dropped += position - self._position - 1
+        self._position = position
+        return position % self.num_frames
+
+    def seconds_until_next(self):
+        """Time until the next frame falls due."""
+        due = self._start_time + (self._position + 1 - self._start_frame) / self.fps
+        return max(0.0, due - self.clock())
+
+    def record_render(self, seconds):
+        """Adds the time one frame took to render to the counters."""
+        ms = seconds * 1000
+        self.render_ms = ms if self.rendered == 0 else (1 - RENDER_TIME_SMOOTHING) * self.render_ms + RENDER_TIME_SMOOTHING * ms
+        self.max_render_ms = max(self.max_render_ms, ms)
+        self.rendered += 1
+
+    def status_text(self):
+        return (f"render {self.render_ms:.1f} ms (max {self.max_render_ms:.1f}) | "
+                f"dropped {self.dropped} of {self.rendered + self.dropped}")
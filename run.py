@@ -1,242 +1,389 @@
-from wisper import pre_processing, brightness_processing, optical_flow, colour_processing
+import wisper
+from wisper import brightness_processing, colour_processing
 import sys
+import argparse
 import cv2
 import numpy as np
 from tqdm import tqdm
 import os
-import csv
 import scene_classifier
 import scene_length_dist
-
-# # Auxiliary function defninitions (May be factored out eventually)
-# def save_change_heatmaps(change_heatmaps, output_folder_name):
-#     """
-#     Saves each heatmap in the change_heatmaps list as an image file in a specified folder.
-
-#     Args:
-#         change_heatmaps (list of ndarray): List of heatmaps (each as an ndarray).
-#         output_folder_name (str): Name of the output folder. Defaults to 'brightness_heatmaps'.
-#     """
-#     # Create the output folder if it doesn't exist
-#     os.makedirs(output_folder_name, exist_ok=True)
-
-#     # Save each heatmap as an image
-#     for i, heatmap in enumerate(tqdm(change_heatmaps, desc="Saving heatmaps")):
-#         output_path = os.path.join(output_folder_name, f"heatmap_{i + 1:04d}.jpg")
-#         cv2.imwrite(output_path, heatmap)
-        
-# def run_optical_flow_object_detection(input_folder, clustered_output_folder, motion_data_dict):
-#     """
-#     Runs optical flow processing, object detection using DBSCAN, and saves cluster visualizations.
-
-#     Parameters:
-#         input_folder (str): Path to the folder containing video frames.
-#         output_folder (str): Path to save optical flow visualizations.
-#         clustered_output_folder (str): Path to save object detection visualizations.
-#         motion_data_dict (dict): Dictionary containing motion data for clustering.
-#     """
-#     os.makedirs(clustered_output_folder, exist_ok=True)  # Ensure output directory exists
-
-#     # Sort frames to process them sequentially
-#     frame_files = sorted([f for f in os.listdir(input_folder) if f.endswith(('.png', '.jpg', '.jpeg'))])
-
-#     # Initialize tqdm progress bar
-#     with tqdm(total=len(frame_files) - 1, desc="Processing Object Detection", unit="frame") as pbar:
-#         for i in range(1, len(frame_files)):
-#             frame_id = f"frame_{i}"
-#             motion_data = motion_data_dict.get(frame_id, np.empty((0, 4)))  # Retrieve motion data
-
-#             if motion_data.size == 0:
-#                 pbar.update(1)  # Update progress even if frame is skipped
-#                 continue  # Skip if no motion data
-
-#             # Get image dimensions from motion data
-#             h, w = int(motion_data[:, 1].max()) + 1, int(motion_data[:, 0].max()) + 1  
-#             magnitude_2d = np.zeros((h, w), dtype=np.float32)
-#             angle_2d = np.zeros((h, w), dtype=np.float32)
-
-#             # Convert motion data back to 2D format
-#             for x, y, mag, ang in motion_data:
-#                 magnitude_2d[int(y), int(x)] = mag
-#                 angle_2d[int(y), int(x)] = ang
-
-#             # Now pass 2D arrays to detect_objects_with_optical_flow
-#             labels, clustered_points = optical_flow.detect_objects_with_optical_flow(magnitude_2d, angle_2d)
-
-
-#             # Load original frame
-#             frame_path = os.path.join(input_folder, frame_files[i])
-#             frame = cv2.imread(frame_path)
-
-#             # Step 4: Visualize detected objects
-#             clustered_frame = optical_flow.visualize_clusters(frame, labels, clustered_points)
-
-#             # Save visualization
-#             output_path = os.path.join(clustered_output_folder, f"clustered_{i:04d}.jpg")
-#             cv2.imwrite(output_path, clustered_frame)
-
-#             # Update progress bar
-#             pbar.update(1)
-
-#     print("Optical flow and object detection processing completed.")
-        
-
-# import os
-# import csv
-
-# def save_metrics_to_csv(folder_path, save_path, optical_flow_mag_data):
-#     # Ensure save_path exists
-#     os.makedirs(save_path, exist_ok=True)
-
-#     # Process the frames and get the metrics from the colour_processing function
-#     all_metrics = colour_processing.process_colour(folder_path)
-    
-#     # Ensure all_metrics is a dictionary and contains lists
-#     if not isinstance(all_metrics, dict):
-#         raise TypeError(f"Expected all_metrics to be a dict, got {type(all_metrics)}: {all_metrics}")
-    
-#     for key, values in all_metrics.items():
-#         if not isinstance(values, list):
-#             raise TypeError(f"Expected {key} values to be a list, got {type(values)}: {values}")
-
-#     # Get brightness values
-#     brightness_data = brightness_processing.get_brightness_list(folder_path)
-#     if not isinstance(brightness_data, dict):
-#         raise TypeError(f"Expected brightness_data to be a dict, got {type(brightness_data)}: {brightness_data}")
-
-#     # Get the list of frame filenames in sorted order
-#     frame_files = sorted(
-#         [filename for filename in os.listdir(folder_path) 
-#          if os.path.isfile(os.path.join(folder_path, filename)) and filename.lower().endswith(('png', 'jpg', 'jpeg', 'bmp'))]
-#     )
-
-#     frame_columns = [f'frame_{i+1}' for i in range(len(frame_files))]  # frame_1, frame_2, ..., frame_n
-#     header = ['frame'] + frame_columns  # No 'average' here, as averages are computed separately
-
-#     # Helper function to write a single metric to CSV
-#     def write_metric_to_csv(metric_name, metric_values):
-#         file_path = os.path.join(save_path, f"{metric_name}.csv")
-
-#         with open(file_path, 'w', newline='') as f:
-#             writer = csv.writer(f)
-#             writer.writerow(header)  # Write header
-#             writer.writerow([metric_name] + metric_values)  # Write metric values
-
-#     # Extract chroma and colorfulness from all_metrics
-#     chroma_values = all_metrics.get('average_chroma', [])
-#     colourfulness_values = all_metrics.get('colorfulness', [])
-
-#     # Write chroma and colorfulness separately
-#     write_metric_to_csv("chroma", chroma_values)
-#     write_metric_to_csv("HS_colourfulness", colourfulness_values)
-
-#     # Handle brightness (extract per-frame values, ignoring the average if present)
-#     brightness_values = list(brightness_data.values())  # Extract only per-frame values
-#     write_metric_to_csv("brightness", brightness_values)
-
-#     # Ensure optical flow data is a dictionary
-#     if not isinstance(optical_flow_mag_data, dict):
-#         raise TypeError(f"Expected optical_flow_mag_data to be a dict, got {type(optical_flow_mag_data)}: {optical_flow_mag_data}")
-
-#     optical_flow_values = [optical_flow_mag_data[f] for f in frame_files if f in optical_flow_mag_data]  # Extract per-frame values
-#     write_metric_to_csv("optical_flow_magnitude", optical_flow_values)
-
-#     print(f"Metrics saved in {save_path}")
-
-
-    
-# def save_pacing_to_csv(input_path, save_path):
-    
-#     print("Running shot detection")
-    
-#     num_cuts, cuts_per_min, frames_per_cut, inter_cut_time = shot_detection.get_pacing_data(input_path, save_path)
-    
-#     # Define the CSV file path
-#     csv_file_path = f"{save_path}/pacing.csv"
-    
-#     # Write data to CSV
-#     with open(csv_file_path, mode='w', newline='') as file:
-#         writer = csv.writer(file)
-#         # Write header
-#         writer.writerow(['num_cuts', 'cuts_per_min', 'frames_per_cut', 'inter_cut_time'])
-#         # Write data row
-#         writer.writerow([num_cuts, cuts_per_min, frames_per_cut, inter_cut_time])
-
-#     print(f"Pacing data saved to {csv_file_path}")
-    
-
+import frame_stream
+import brightness_engine
+import frame_container
+import frame_export
+import parallel_metrics
+import flow_store
+import flow_engines
+import flow_processing
+import motion_clustering
+import shot_streaming
+import shot_cache
+import metrics_store
+import tile_stats
+import stage_scheduler
+from stage_cache import Stage, StageRef, StageCache
+
+# Auxiliary function defninitions (May be factored out eventually)
+def save_change_heatmaps(change_heatmaps, output_folder_name):
+    """
+    Saves each heatmap in the change_heatmaps list as an image file in a specified folder.
+
+    Args:
+        change_heatmaps (iterable of ndarray): Heatmaps (each as an ndarray), e.g. a generator.
+        output_folder_name (str): Name of the output folder. Defaults to 'brightness_heatmaps'.
+    """
+    writer = brightness_engine.HeatmapImageWriter(output_folder_name)
+    for heatmap in tqdm(change_heatmaps, desc="Saving heatmaps"):
+        writer.write(heatmap)
+    writer.close()
+
+
+def save_brightness_diff_heatmaps(input_folder, output_path, fps=None):
+    """
+    Computes the brightness change heatmaps of a frame folder and saves them to output_path,
+    a folder of images or a video file. Heatmaps are written as they are computed, one pair of
+    frames at a time (see brightness_engine.save_brightness_change_heatmaps).
+    """
+    brightness_engine.save_brightness_change_heatmaps(input_folder, output_path, fps=fps)
+
+
+def save_colour_metrics_to_csv(folder_path, save_path, workers=1):
+    # Process the frames and get the metrics from the colour_processing function.
+    # wisper only reads image files, packed frame containers go through parallel_metrics,
+    # as do image folders split across worker processes
+    if frame_container.is_packed(folder_path) or workers > 1:
+        all_metrics = parallel_metrics.process_frames(folder_path, workers)
+    else:
+        all_metrics = colour_processing.process_colour(folder_path)
+
+    # Ensure all_metrics is a dictionary and contains lists
+    if not isinstance(all_metrics, dict):
+        raise TypeError(f"Expected all_metrics to be a dict, got {type(all_metrics)}: {all_metrics}")
+
+    for key, values in all_metrics.items():
+        if not isinstance(values, list):
+            raise TypeError(f"Expected {key} values to be a list, got {type(values)}: {values}")
+
+    # Write chroma and colorfulness separately
+    num_frames = len(frame_stream.list_frame_files(folder_path))
+    chroma_values = all_metrics.get('average_chroma', [])
+    colourfulness_values = all_metrics.get('colorfulness', [])
+    metrics_store.write_metric_to_csv(save_path, "chroma", chroma_values, num_frames)
+    metrics_store.write_metric_to_csv(save_path, "HS_colourfulness", colourfulness_values, num_frames)
+    return {"chroma": chroma_values, "HS_colourfulness": colourfulness_values}
+
+
+def save_brightness_to_csv(folder_path, save_path, workers=1):
+    # Get brightness values (a list per frame; older versions returned a dict keyed by frame)
+    if frame_container.is_packed(folder_path) or workers > 1:
+        brightness_data = parallel_metrics.get_brightness_list(folder_path, workers)
+    else:
+        brightness_data = brightness_processing.get_brightness_list(folder_path)
+    if not isinstance(brightness_data, (dict, list)):
+        raise TypeError(f"Expected brightness_data to be a list or dict, got {type(brightness_data)}: {brightness_data}")
+
+    # Handle brightness (extract per-frame values, ignoring the average if present)
+    brightness_values = list(brightness_data.values()) if isinstance(brightness_data, dict) else list(brightness_data)
+    metrics_store.write_metric_to_csv(save_path, "brightness", brightness_values, len(frame_stream.list_frame_files(folder_path)))
+    return {"brightness": brightness_values}
+
+
+def save_flow_magnitude_to_csv(folder_path, save_path, optical_flow_mag_data):
+    # Ensure optical flow data is a dictionary
+    if not isinstance(optical_flow_mag_data, dict):
+        raise TypeError(f"Expected optical_flow_mag_data to be a dict, got {type(optical_flow_mag_data)}: {optical_flow_mag_data}")
+
+    frame_files = frame_stream.list_frame_files(folder_path)
+    optical_flow_values = [optical_flow_mag_data[f] for f in frame_files if f in optical_flow_mag_data]  # Extract per-frame values
+    metrics_store.write_metric_to_csv(save_path, "optical_flow_magnitude", optical_flow_values, len(frame_files))
+    return {"optical_flow_magnitude": optical_flow_values}
+
+
+def save_metrics_to_csv(folder_path, save_path, optical_flow_mag_data):
+    metrics = save_colour_metrics_to_csv(folder_path, save_path)
+    metrics.update(save_brightness_to_csv(folder_path, save_path))
+    metrics.update(save_flow_magnitude_to_csv(folder_path, save_path, optical_flow_mag_data))
+    metrics_store.save_metrics(save_path, metrics, len(frame_stream.list_frame_files(folder_path)))
+    print(f"Metrics saved in {save_path}")
+
+
+def save_metrics_file(save_path, scenes_csv_path, *metric_results, stride=1):
+    """
+    Collects the per-frame metrics returned by the metric stages, plus shot boundaries from
+    predicted_scenes.csv, into the columnar metrics.npz (see metrics_store).
+
+    With stride > 1 the metrics are of every stride-th source frame (see --export-stride), while
+    predicted_scenes.csv is always in source frames, so the boundaries are mapped to kept frames.
+    """
+    metrics = {}
+    for result in metric_results:
+        metrics.update(result)
+    num_frames = metrics.get("num_frames") or max(len(values) for name, values in metrics.items() if name != "num_frames")
+    if os.path.exists(scenes_csv_path):
+        scenes = metrics_store.read_scenes_csv(scenes_csv_path)
+        metrics["shot_boundary"] = metrics_store.scenes_to_boundaries(scenes, num_frames, stride)
+    metrics_store.save_metrics(save_path, metrics, num_frames, stride=stride)
+
+
+def save_stream_metrics(video_filepath, save_path, flow_store_path=None, flow_store_dtype="float32",
+                        flow_store_downsample=1, flow_scale=1.0, flow_engine="farneback",
+                        detect_shots=False, shot_prefilter=False, tile_stats_path=None,
+                        tile_stats_grid=tile_stats.DEFAULT_GRID):
+    """
+    Single decode pass: every metric stage sees each frame straight from the decoder.
+    """
+    flow_writer = None
+    if flow_store_path:
+        flow_writer = flow_store.FlowStoreWriter(flow_store_path, dtype=flow_store_dtype,
+                                                 downsample=flow_store_downsample)
+    stages = frame_stream.default_stages(flow_store=flow_writer, flow_scale=flow_scale, flow_engine=flow_engine)
+    if tile_stats_path:
+        stages.append(tile_stats.TileStatsStage(tile_stats_path, tile_stats_grid))
+    if detect_shots:
+        stages.append(shot_streaming.ShotDetectionStage(shot_cache.get_model(), prefilter=shot_prefilter))
+    stream_results = frame_stream.process_video_stream(video_filepath, stages=stages)
+    frame_stream.save_stream_metrics_to_csv(stream_results, save_path)
+    if detect_shots and not shot_prefilter:
+        # Only full-model predictions go into the cache shared with pacing
+        shot_cache.store_predictions(video_filepath, stream_results["shot_probability"])
+    return stream_results
+
+
+def export_decode_options(args):
+    """
+    Parallel decoding options of the export stage. Left out when serial, so that the cached
+    export of an unchanged video stays valid: the frames are the same either way.
+    """
+    if args.export_decode_workers > 1:
+        return {"decode_workers": args.export_decode_workers}
+    return {}
+
+
+def frame_worker_options(args):
+    """
+    Process pool size of the per-frame metric and optical flow stages in export mode (see
+    parallel_metrics and flow_processing.iter_flow). Left out when serial, so that cached
+    results stay valid: the values are the same either way.
+    """
+    if args.frame_workers > 1:
+        return {"workers": args.frame_workers}
+    return {}
+
+
+def build_stages(args, video_filepath, folder_path, folder_name):
+    """
+    The pipeline for one video, in dependency order. Each stage lists the files it writes,
+    so the stage cache can tell when its outputs have gone missing.
+    """
+    base_dir = folder_path + "/" + folder_name
+    raw_save_dir = base_dir + "_raw"
+    stages = []
+
+    tile_stats_path = base_dir + "_tile_stats" if args.tile_stats else None
+
+    if args.stream:
+        flow_store_path = base_dir + "_flow_store" if args.flow_store else None
+        # Tile statistics are computed on the same decode pass; left out of the options when off,
+        # so that cached results from before they existed stay valid
+        tile_options = dict(tile_stats_path=tile_stats_path, tile_stats_grid=args.tile_stats) if args.tile_stats else {}
+        stages.append(Stage(
+            "stream_metrics", save_stream_metrics,
+            args=(video_filepath, folder_path),
+            kwargs=dict(flow_store_path=flow_store_path, flow_store_dtype=args.flow_store or "float32",
+                        flow_store_downsample=args.flow_store_downsample, flow_scale=args.flow_scale,
+                        flow_engine=args.flow_engine, detect_shots=args.detect_shots,
+                        shot_prefilter=args.shot_prefilter, **tile_options),
+            outputs=([os.path.join(folder_path, "brightness.csv")] + ([flow_store_path] if flow_store_path else [])
+                     + ([tile_stats_path] if tile_stats_path else [])),
+            version=2,
+        ))
+        metric_refs = [StageRef("stream_metrics")]
+    else:
+        # Export the video as individual frames (or a packed container of them, see frame_export),
+        # save to folder called "video_name_raw" inside folder_name
+        stages.append(Stage("export_frames", frame_export.export_frames,
+                            args=(video_filepath, raw_save_dir),
+                            kwargs=dict(stride=args.export_stride, scale=args.export_scale,
+                                        encoding=args.export_encoding, container=args.export_container,
+                                        quality=args.export_quality, **export_decode_options(args)),
+                            outputs=[raw_save_dir], version=2))
+
+        # Process optical flow, save to folder called "video_name_optical_flow" inside folder_name.
+        # Dense flow fields go to a flow store, so the cached result only holds its path. Sparse
+        # engines only give magnitudes, so there is no store and motion clustering gets no flow.
+        flow_save_dir = base_dir + "_optical_flow"
+        flow_store_path = base_dir + "_flow_store" if flow_engines.get_flow_engine(args.flow_engine).dense else None
+        flow_options = dict(store_path=flow_store_path) if flow_store_path else {}
+        stages.append(Stage("optical_flow", flow_processing.process_optical_flow,
+                            args=(raw_save_dir, flow_save_dir),
+                            kwargs=dict(engine=args.flow_engine, scale=args.flow_scale, **flow_options,
+                                        **frame_worker_options(args)),
+                            outputs=[flow_save_dir] + ([flow_store_path] if flow_store_path else []),
+                            deps=["export_frames"]))
+
+        # Optical flow object clustering
+        stages.append(Stage("motion_clustering", motion_clustering.run_optical_flow_object_detection,
+                            args=(raw_save_dir, base_dir + "_optical_flow_clustering", StageRef("optical_flow", 1)),
+                            outputs=[base_dir + "_optical_flow_clustering"], deps=["export_frames"]))
+
+        # Numeric metrics, one csv file each. Colour and brightness only need the frames,
+        # so they run alongside optical flow
+        stages.append(Stage("colour_metrics", save_colour_metrics_to_csv, args=(raw_save_dir, folder_path),
+                            kwargs=frame_worker_options(args),
+                            outputs=[os.path.join(folder_path, "chroma.csv"),
+                                     os.path.join(folder_path, "HS_colourfulness.csv")],
+                            deps=["export_frames"], version=2))
+        stages.append(Stage("brightness", save_brightness_to_csv, args=(raw_save_dir, folder_path),
+                            kwargs=frame_worker_options(args),
+                            outputs=[os.path.join(folder_path, "brightness.csv")], deps=["export_frames"], version=2))
+        stages.append(Stage("flow_magnitude", save_flow_magnitude_to_csv,
+                            args=(raw_save_dir, folder_path, StageRef("optical_flow", 0)),
+                            outputs=[os.path.join(folder_path, "optical_flow_magnitude.csv")],
+                            deps=["export_frames"], version=2))
+        metric_refs = [StageRef("colour_metrics"), StageRef("brightness"), StageRef("flow_magnitude")]
+
+        # Per-tile brightness and colour statistics for region queries (see tile_stats)
+        if args.tile_stats:
+            stages.append(Stage("tile_stats", tile_stats.save_tile_stats, args=(raw_save_dir, tile_stats_path),
+                                kwargs=dict(grid=args.tile_stats), outputs=[tile_stats_path], deps=["export_frames"]))
+
+        # Process brightness difference frames, save to folder called "video_name_brightness_diff" inside folder_name,
+        # or to one video "video_name_brightness_diff.avi"
+        if args.brightness_diff_video:
+            heatmap_path = base_dir + "_brightness_diff.avi"
+            fps = (frame_stream.get_video_fps(video_filepath) or brightness_engine.HEATMAP_FPS) / args.export_stride
+            heatmap_options = dict(fps=fps)
+        else:
+            heatmap_path = base_dir + "_brightness_diff"
+            heatmap_options = {}
+        stages.append(Stage("brightness_diff", save_brightness_diff_heatmaps, args=(raw_save_dir, heatmap_path),
+                            kwargs=heatmap_options, outputs=[heatmap_path], deps=["export_frames"], version=2))
+
+    # Shot detection reuses predictions cached by the stream pass when it ran TransNetV2
+    stages.append(Stage("pacing", shot_cache.save_pacing_to_csv, args=(video_filepath, folder_path),
+                        outputs=[os.path.join(folder_path, "pacing.csv"),
+                                 os.path.join(folder_path, "predicted_scenes.csv")],
+                        deps=["stream_metrics"] if args.stream and args.detect_shots else []))
+
+    # Both scene stages only read predicted_scenes.csv
+    csv_path = f"{folder_path}/predicted_scenes.csv"
+    csv_output_path = f"{folder_path}/all_cuts.csv"
+    stages.append(Stage("scene_classification", scene_classifier.analyze_and_save_cuts, args=(csv_path, csv_output_path),
+                        outputs=[csv_output_path], deps=["pacing"]))
+
+    csv_output_path = f"{folder_path}/scene_lengths.csv"
+    stages.append(Stage("scene_lengths", scene_length_dist.get_scene_length_dist, args=(csv_path, csv_output_path),
+                        outputs=[csv_output_path], deps=["pacing"]))
+
+    # All per-frame metrics and shot boundaries in one columnar file; the CSVs above stay for compatibility
+    # Left out when 1, so that cached metrics files of unstrided runs stay valid
+    stride_options = dict(stride=args.export_stride) if not args.stream and args.export_stride > 1 else {}
+    stages.append(Stage("metrics_file", save_metrics_file, args=[folder_path, csv_path] + metric_refs,
+                        kwargs=stride_options,
+                        outputs=[os.path.join(folder_path, metrics_store.METRICS_FILENAME)], deps=["pacing"]))
+    return stages
+
+
+def add_pipeline_arguments(parser):
+    """
+    Adds the options that configure the per-video pipeline, shared by run.py and batch.py.
+    """
+    parser.add_argument("--stream", action="store_true",
+                        help="Decode the video once and compute all metrics in a single pass, without exporting frames")
+    parser.add_argument("--flow-store", choices=flow_store.STORE_DTYPES, default=None,
+                        help="With --stream, keep dense optical flow fields in a memory-mapped store of this dtype")
+    parser.add_argument("--flow-store-downsample", type=int, default=1,
+                        help="Spatial downsample factor for the flow store")
+    parser.add_argument("--detect-shots", action="store_true",
+                        help="With --stream, also run TransNetV2 shot detection on the same decode pass")
+    parser.add_argument("--shot-prefilter", action="store_true",
+                        help="With --detect-shots, skip TransNetV2 on static spans found by a cheap histogram/pixel pre-pass")
+    parser.add_argument("--flow-engine", choices=list(flow_engines.FLOW_ENGINES), default="farneback",
+                        help="Optical flow engine")
+    parser.add_argument("--flow-scale", type=float, default=1.0,
+                        help="Compute optical flow at this fraction of the source resolution (e.g. 0.25)")
+    frame_export.add_export_arguments(parser)
+    parser.add_argument("--frame-workers", type=int, default=1,
+                        help="Without --stream, worker processes for the colour, brightness and optical flow stages")
+    parser.add_argument("--brightness-diff-video", action="store_true",
+                        help="Encode the brightness change heatmaps as one video instead of an image per frame")
+    parser.add_argument("--tile-stats", nargs="?", type=tile_stats.parse_grid, const=tile_stats.DEFAULT_GRID,
+                        default=None, metavar="ROWSxCOLS",
+                        help="Also store per-tile brightness and colour statistics for region queries (default grid 8x8)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Rerun every stage, even if its cached outputs are up to date")
+    parser.add_argument("--stages", default=None,
+                        help="Comma-separated stages to build (their dependencies are included), e.g. pacing,scene_lengths")
+
+
+def video_folder(video_filepath):
+    """The processed_videos/<name> folder of a video, relative to the working directory."""
+    folder_name = os.path.splitext(os.path.basename(video_filepath))[0]  # Removes the file extension
+    return os.path.join(os.getcwd() + "/processed_videos", folder_name)
+
+
+def process_video(video_filepath, args, workers=1, update_index=True):
+    """
+    Runs the pipeline for one video into processed_videos/<name>.
+
+    Parameters:
+        video_filepath (str): Path to the video file.
+        args (Namespace): Options added by add_pipeline_arguments.
+        workers (int): Maximum number of stages running at once.
+        update_index (bool): Refresh the video's row of the corpus index used for clustering
+            (processed_videos/corpus_index.csv) when any stage ran.
+
+    Returns:
+        dict: Stage name -> 'ran', 'cached', 'failed' or 'skipped', as from run_stage_graph.
+    """
+    # Create the main folder of the video, set base folder names
+    folder_path = video_folder(video_filepath)
+    folder_name = os.path.basename(folder_path)
+    os.makedirs(folder_path, exist_ok=True)
+
+    stages = build_stages(args, video_filepath, folder_path, folder_name)
+    targets = [name.strip() for name in args.stages.split(",") if name.strip()] if args.stages else None
+    stages = stage_scheduler.select_stages(stages, targets)
+
+    # Stage results are cached in processed_videos/<name>/.stage_cache, keyed by video content,
+    # stage parameters and library versions: a rerun only recomputes what changed
+    versions = {"wisper": getattr(wisper, "__version__", None), "opencv": cv2.__version__, "numpy": np.__version__}
+    cache = StageCache(folder_path, video_filepath, versions=versions, enabled=not args.no_cache)
+    status = stage_scheduler.run_stage_graph(stages, cache, workers=workers)
+
+    if update_index and "ran" in status.values():
+        import corpus_index  # pandas is only needed here, keep fully cached reruns fast
+        corpus_index.update_index(os.path.dirname(folder_path), [folder_path])
+    return status
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Process a video into per-frame visual metrics.")
+    parser.add_argument("video_filepath", help="Path to the video file")
+    add_pipeline_arguments(parser)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Maximum number of stages running at once, each in its own process")
+    args = parser.parse_args()
+
+    video_filepath = args.video_filepath
+
+    if not os.path.exists(video_filepath):
+        print(f"Error: File '{video_filepath}' not found.")
+        sys.exit(1)
+
+    try:
+        status = process_video(video_filepath, args, workers=args.workers)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    failed = [name for name, result in status.items() if result in ("failed", "skipped")]
+    if failed:
+        print(f"Stages not completed: {', '.join(failed)}")
+        sys.exit(1)
 
 
 # Start of program proper
-
-if len(sys.argv) != 2:
-    print("Usage: python script.py <video_filepath>")
-    sys.exit(1)
-
-video_filepath = sys.argv[1]
-
-if not os.path.exists(video_filepath):
-    print(f"Error: File '{video_filepath}' not found.")
-    sys.exit(1)
-    
-# Save the video name, set base folder name
-video_name = os.path.basename(video_filepath)
-folder_name = os.path.splitext(video_name)[0]  # Removes the file extension
-
-# Create the main folder of the video, set base folder names
-root_folder = os.getcwd() + "/processed_videos"
-folder_path = os.path.join(root_folder, folder_name)
-os.makedirs(folder_path, exist_ok=True)
-
-
-# # Export the video as individual frames, save to folder called "video_name_raw" inside folder_name
-base_dir = folder_path + "/" + folder_name
-raw_save_dir = base_dir + "_raw"
-# pre_processing.export_as_frames(video_filepath, raw_save_dir)
-
-# # Process optical flow, save to folder called "video_name_optical_flow" inside folder_name
-# print("Processing optical flow")
-# save_dir = base_dir + "_optical_flow"
-# optical_flow_mag_data, optical_flow_movement = optical_flow.process_optical_flow(raw_save_dir, save_dir)
-
-
-save_dir = folder_path
-# save_pacing_to_csv(video_filepath, save_dir)
-
-# # Optical flow DBSCAN
-# save_dir = base_dir + "_optical_flow_clustering"
-# run_optical_flow_object_detection(raw_save_dir, save_dir, optical_flow_movement)
-
-# #Process all numeric metrics and save them to a csv file metrics.csv AND optical flow
-# save_dir = folder_path
-# optical_flow_output_folder = base_dir + "_optical_flow"
-# save_metrics_to_csv(raw_save_dir, save_dir, optical_flow_mag_data)
-
-# # Process brightness difference frames, save to folder called "video_name_brightness_diff" inside folder_name
-# save_dir = base_dir + "_brightness_diff"
-# change_heatmaps = brightness_processing.calculate_pixel_brightness_change_heatmaps(raw_save_dir)
-# save_change_heatmaps(change_heatmaps, save_dir)
-
-
-# csv_path = f"{folder_path}/predicted_scenes.csv"  # Replace with your actual file path
-# csv_output_path = f"{folder_path}/all_cuts.csv"  # Replace with your actual file pathall_cuts.csv"
-
-# scene_classifier.analyze_and_save_cuts(csv_path, csv_output_path)
-
-csv_path = f"{folder_path}/predicted_scenes.csv"  # Replace with your actual file path
-csv_output_path = f"{folder_path}/scene_lengths.csv"  # Replace with your actual file pathall_cuts.csv"
-
-scene_length_dist.get_scene_length_dist(csv_path, csv_output_path)
-
-
-
-
-
-
-
-
-
-
-
-
-
+if __name__ == "__main__":
+    main()
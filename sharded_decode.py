@@ -0,0 +1,286 @@
+import sys
+import time
+import zlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+import numpy as np
+
+from frame_stream import iter_video_frames, get_video_frame_count
+from parallel_metrics import resolve_workers, split_into_chunks
+
+MIN_SEGMENT_FRAMES = 32  # Shorter segments are not worth a process and a seek
+
+
+def frame_digest(frame):
+    """Checksum of a frame's pixels, for telling decoded frames apart."""
+    return zlib.crc32(np.ascontiguousarray(frame))
+
+
+def plan_segments(num_frames, num_segments, stride=1, min_frames=MIN_SEGMENT_FRAMES):
+    """
+    Splits frames 0..num_frames of a video into contiguous (start, stop) segments.
+
+    Starts are multiples of stride, so each segment keeps the frames a serial decode with the
+    same stride would. The last segment has stop None and runs to the end of the video, as
+    container frame counts can be approximate.
+    """
+    kept = -(-num_frames // stride)
+    num_segments = max(1, min(num_segments, kept // min_frames))
+    chunks = split_into_chunks(range(kept), num_segments)
+    if not chunks:
+        return [(0, None)]
+    segments = [(chunk.start * stride, chunk.stop * stride) for chunk in chunks]
+    segments[-1] = (segments[-1][0], None)
+    return segments
+
+
+class VideoSegment:
+    """
+    Iterator over frames start..stop of a video (stop None: to the end), decoded after a
+    single seek. OpenCV seeks to the keyframe before the target and decodes forward from it.
+
+    Yields every stride-th frame of the video, plus `overlap` kept frames of the next segment
+    for metrics over consecutive frames. Frame start - 1 is decoded first and its checksum kept
+    in seam_digest; the checksum of frame stop - 1 ends up in last_digest. Matching the two
+    across a seam shows that the seek landed on the right frame.
+
+    Parameters:
+        video_filepath (str): Path to the video file.
+        start, stop (int): Video frame range of the segment.
+        stride (int): Keep every stride-th frame of the video.
+        overlap (int): Kept frames of the following segment to yield as well.
+        exact (bool): Reach start by grabbing every frame from the beginning instead of seeking.
+    """
+
+    def __init__(self, video_filepath, start, stop, stride=1, overlap=0, exact=False):
+        self.video_filepath = video_filepath
+        self.start = start
+        self.stop = stop
+        self.stride = stride
+        self.overlap = overlap
+        self.exact = exact
+        self.seam_digest = None
+        self.last_digest = None
+        self.frames_read = 0  # Video frames of start..stop decoded or grabbed
+        self._frames = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._frames is None:
+            self._frames = self._decode()
+        return next(self._frames)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_frames"] = None  # Segments go to the worker before decoding starts and come back after it ends
+        return state
+
+    def _seek(self, cap, frame_index):
+        if self.exact:
+            for _ in range(frame_index):
+                if not cap.grab():
+                    return False
+            return True
+        return cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+
+    def _decode(self):
+        cap = cv2.VideoCapture(self.video_filepath)
+        if not cap.isOpened():
+            raise ValueError(f"Could not open video '{self.video_filepath}'")
+        try:
+            if self.start > 0:
+                if not self._seek(cap, self.start - 1):
+                    return
+                ret, frame = cap.read()
+                if not ret:
+                    return
+                self.seam_digest = frame_digest(frame)
+
+            index = self.start
+            extra = self.overlap
+            while True:
+                past_stop = self.stop is not None and index >= self.stop
+                if past_stop and extra == 0:
+                    break
+                keep = index % self.stride == 0
+                if keep or index == (self.stop or 0) - 1:
+                    ret, frame = cap.read()
+                else:
+                    ret, frame = cap.grab(), None  # Skipped frames are grabbed but not decoded
+                if not ret:
+                    break
+                if not past_stop:
+                    self.frames_read += 1
+                    if index == (self.stop or 0) - 1:
+                        self.last_digest = frame_digest(frame)
+                if keep:
+                    if past_stop:
+                        extra -= 1
+                    yield frame
+                index += 1
+        finally:
+            cap.release()
+
+
+def _run_segment(func, segment):
+    results = func(segment)
+    for _ in segment:  # The seam check needs the whole segment, even if func stopped early
+        pass
+    return results, segment
+
+
+def _seam_ok(previous, segment):
+    if previous.frames_read < previous.stop - previous.start:
+        return segment.frames_read == 0  # The video ended inside the previous segment
+    return segment.seam_digest is not None and segment.seam_digest == previous.last_digest
+
+
+def _exact(segment):
+    return VideoSegment(segment.video_filepath, segment.start, segment.stop, segment.stride,
+                        segment.overlap, exact=True)
+
+
+def verify_seams(func, outcomes):
+    """
+    Checks each seam of the (results, segment) pairs from the workers and decodes a segment
+    again without seeking when its seek was not frame-accurate.
+
+    A mismatch can also come from a bad seek in the previous segment that only showed at its
+    end (a seek error hides behind identical frames). So when the re-decoded segment still does
+    not match, the previous one is decoded again too.
+
+    Returns:
+        tuple: The corrected outcomes, and the starts of the segments that were re-decoded.
+    """
+    outcomes = list(outcomes)
+    redecoded = []
+    for i in range(1, len(outcomes)):
+        previous, segment = outcomes[i - 1][1], outcomes[i][1]
+        if _seam_ok(previous, segment):
+            continue
+        print(f"Seek to frame {segment.start} was not frame-accurate, decoding that segment again without seeking")
+        outcomes[i] = _run_segment(func, _exact(segment))
+        redecoded.append(segment.start)
+        if not _seam_ok(previous, outcomes[i][1]) and not previous.exact:
+            outcomes[i - 1] = _run_segment(func, _exact(previous))
+            redecoded.append(previous.start)
+    return outcomes, sorted(redecoded)
+
+
+def map_segments(func, segments, workers=1):
+    """Runs func on each VideoSegment, in a process pool when there is more than one."""
+    if workers == 1 or len(segments) == 1:
+        return [_run_segment(func, segment) for segment in segments]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_run_segment, [func] * len(segments), segments))  # map() keeps order
+
+
+def video_segments(video_filepath, num_segments, stride=1, overlap=0):
+    """The VideoSegments of plan_segments for a video."""
+    num_frames = get_video_frame_count(video_filepath)
+    return [VideoSegment(video_filepath, start, stop, stride, overlap)
+            for start, stop in plan_segments(num_frames, num_segments, stride)]
+
+
+def map_video_segments(func, video_filepath, workers=None, overlap=0, stride=1):
+    """
+    Decodes a video in time segments, one process each, and runs func over each segment's
+    frames where they are decoded. Like parallel_metrics.map_frame_chunks, but for a video file:
+    the chunk functions of parallel_metrics work unchanged.
+
+    Every seam is checked against the frame before it (see verify_seams), so the results are
+    those of a serial decode, with no frame duplicated or dropped at a segment boundary.
+
+    Args:
+        func (callable): Top-level function taking a VideoSegment, an iterator of frames in
+            order, and returning a list of results.
+        video_filepath (str): Path to the video file.
+        workers (int): Number of worker processes and segments. None uses every CPU.
+        overlap (int): Frames shared between neighbouring segments (see split_into_chunks).
+        stride (int): Keep every stride-th frame.
+
+    Returns:
+        list: The concatenated results of every segment, in frame order.
+    """
+    workers = resolve_workers(workers)
+    segments = video_segments(video_filepath, workers, stride, overlap)
+    outcomes, _ = verify_seams(func, map_segments(func, segments, workers))
+    return [result for results, _ in outcomes for result in results]
+
+
+def _digest_chunk(frames):
+    return [frame_digest(frame) for frame in frames]
+
+
+def verify_sharded_decode(video_filepath, workers=None, stride=1):
+    """
+    Decodes a video serially and in segments and compares every frame.
+
+    Returns:
+        dict: Frame counts of both decodes, the starts of the segments whose seek was not
+        frame-accurate, and the frames of the sharded decode (after seam correction) that
+        differ from the serial one.
+    """
+    workers = resolve_workers(workers)
+    serial = [frame_digest(frame) for frame in iter_video_frames(video_filepath, stride=stride)]
+    segments = video_segments(video_filepath, workers, stride)
+    outcomes, redecoded = verify_seams(_digest_chunk, map_segments(_digest_chunk, segments, workers))
+    sharded = [digest for results, _ in outcomes for digest in results]
+    mismatched = [i for i, (a, b) in enumerate(zip(serial, sharded)) if a != b]
+    return {
+        "serial_frames": len(serial),
+        "sharded_frames": len(sharded),
+        "segments": [(segment.start, segment.stop) for segment in segments],
+        "inaccurate_seeks": redecoded,
+        "mismatched_frames": mismatched,
+    }
+
+
+def _count_chunk(frames):
+    return [sum(1 for _ in frames)]
+
+
+def benchmark(video_filepath, workers=None, stride=1):
+    """Decode time of a serial pass and of a sharded pass over a video."""
+    workers = resolve_workers(workers)
+    start = time.perf_counter()
+    serial = sum(1 for _ in iter_video_frames(video_filepath, stride=stride))
+    serial_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    sharded = sum(map_video_segments(_count_chunk, video_filepath, workers, stride=stride))
+    sharded_time = time.perf_counter() - start
+
+    print(f"Serial:  {serial} frames in {serial_time:.2f}s ({serial / serial_time:.0f} frames/s)")
+    print(f"Sharded: {sharded} frames in {sharded_time:.2f}s ({sharded / sharded_time:.0f} frames/s, "
+          f"{workers} workers)")
+    return {"serial": serial_time, "sharded": sharded_time}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check or benchmark segment-parallel video decoding.")
+    parser.add_argument("command", choices=["verify", "benchmark"])
+    parser.add_argument("video_filepath")
+    parser.add_argument("--workers", type=int, default=None, help="Segments decoded in parallel (default: one per CPU)")
+    parser.add_argument("--stride", type=int, default=1, help="Keep every n-th frame")
+    args = parser.parse_args(argv)
+
+    if args.command == "benchmark":
+        benchmark(args.video_filepath, args.workers, args.stride)
+        return
+
+    report = verify_sharded_decode(args.video_filepath, args.workers, args.stride)
+    print(f"Segments: {report['segments']}")
+    print(f"Frames: {report['serial_frames']} serial, {report['sharded_frames']} sharded")
+    print(f"Inaccurate seeks (re-decoded): {report['inaccurate_seeks'] or 'none'}")
+    if report["mismatched_frames"] or report["serial_frames"] != report["sharded_frames"]:
+        print(f"Mismatched frames: {report['mismatched_frames']}")
+        sys.exit(1)
+    print("Sharded decode matches the serial decode")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
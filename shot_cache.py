@@ -0,0 +1,164 @@
+import os
+import csv
+import cv2
+import numpy as np
+
+import frame_stream
+import shot_streaming
+from stage_cache import fast_video_hash
+
+DEFAULT_CACHE_DIR = os.path.join("processed_videos", ".shot_cache")
+
+_model = None
+_scene_memo = {}
+
+
+def get_model():
+    """
+    Returns the TransNetV2 model, loading it on first use. One model is shared per process.
+    """
+    global _model
+    if _model is None:
+        _model = shot_streaming.load_transnet_model()
+    return _model
+
+
+def predictions_to_scenes(predictions, threshold=0.5):
+    """
+    Converts single-frame predictions to (start, end) scenes, as TransNetV2.predictions_to_scenes
+    does, without needing the model to be loaded.
+    """
+    predictions = (np.asarray(predictions) > threshold).astype(np.uint8)
+    if len(predictions) == 0:
+        return np.empty((0, 2), dtype=np.int32)
+
+    scenes = []
+    t, t_prev, start = -1, 0, 0
+    for i, t in enumerate(predictions):
+        if t_prev == 1 and t == 0:
+            start = i
+        if t_prev == 0 and t == 1 and i != 0:
+            scenes.append([start, i])
+        t_prev = t
+    if t == 0:
+        scenes.append([start, i])
+
+    # All frames are transitions
+    if len(scenes) == 0:
+        return np.array([[0, len(predictions) - 1]], dtype=np.int32)
+    return np.array(scenes, dtype=np.int32)
+
+
+def _cache_path(video_path, cache_dir):
+    # Keyed by the same sampled hash as the stage cache, so both agree on whether the video changed
+    return os.path.join(cache_dir or DEFAULT_CACHE_DIR, f"{fast_video_hash(video_path)}.npz")
+
+
+def store_predictions(video_path, single_frame_predictions, cache_dir=None):
+    """
+    Stores single-frame predictions for a video, e.g. ones computed by a streaming stage.
+    """
+    path = _cache_path(video_path, cache_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    np.savez(path, single_frame_predictions=np.asarray(single_frame_predictions, dtype=np.float32))
+
+
+def get_single_frame_predictions(video_path, cache_dir=None):
+    """
+    Returns TransNetV2's single-frame predictions for a video, running the model only on a cache miss.
+
+    Parameters:
+        video_path (str): Path to the input video file.
+        cache_dir (str): Cache directory. Defaults to processed_videos/.shot_cache.
+
+    Returns:
+        ndarray: One shot-boundary probability per frame.
+    """
+    path = _cache_path(video_path, cache_dir)
+    if os.path.exists(path):
+        with np.load(path) as cached:
+            return cached["single_frame_predictions"]
+
+    single_frame_predictions, _ = shot_streaming.predict_frames_streaming(
+        get_model(), frame_stream.iter_video_frames(video_path)
+    )
+    single_frame_predictions = np.asarray(single_frame_predictions, dtype=np.float32)
+    store_predictions(video_path, single_frame_predictions, cache_dir)
+    return single_frame_predictions
+
+
+def shot_prediction(video_path, threshold=0.5, cache_dir=None):
+    """
+    Predicts the shot boundaries (cuts) in a video, reusing cached predictions.
+
+    Scenes are memoised per (video hash, threshold), and any threshold can be
+    re-derived from the cached predictions without running the model again.
+
+    Parameters:
+        video_path (str): Path to the input video file.
+        threshold (float): Shot boundary probability threshold.
+        cache_dir (str): Cache directory. Defaults to processed_videos/.shot_cache.
+
+    Returns:
+        ndarray: (start_frame, end_frame) rows, one per predicted shot.
+    """
+    key = (fast_video_hash(video_path), threshold)
+    if key not in _scene_memo:
+        _scene_memo[key] = predictions_to_scenes(get_single_frame_predictions(video_path, cache_dir), threshold)
+    return _scene_memo[key]
+
+
+def get_number_of_cuts(video_path, threshold=0.5, cache_dir=None):
+    """
+    Computes the number of cuts (shot transitions) in a video.
+
+    Returns:
+        int: The total number of cuts detected in the video.
+    """
+    return len(shot_prediction(video_path, threshold, cache_dir))
+
+
+def get_pacing_data(video_path, save_path, threshold=0.5, cache_dir=None):
+    """
+    Computes pacing statistics from the cached shot predictions and saves the predicted
+    scenes to predicted_scenes.csv in save_path.
+
+    Returns:
+        tuple: (num_cuts, cuts_per_min, frames_per_cut, inter_cut_time), where inter_cut_time is in seconds.
+    """
+    scenes = shot_prediction(video_path, threshold, cache_dir)
+
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+    cap.release()
+    num_frames = len(get_single_frame_predictions(video_path, cache_dir))
+    duration = num_frames / fps
+
+    os.makedirs(save_path, exist_ok=True)
+    with open(os.path.join(save_path, "predicted_scenes.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["start_frame", "end_frame"])
+        writer.writerows(scenes.tolist())
+
+    num_cuts = len(scenes)
+    cuts_per_min = num_cuts / (duration / 60) if duration > 0 else 0.0
+    frames_per_cut = num_frames / num_cuts if num_cuts > 0 else 0.0
+    inter_cut_time = duration / num_cuts if num_cuts > 0 else 0.0
+    return num_cuts, cuts_per_min, frames_per_cut, inter_cut_time
+
+
+def save_pacing_to_csv(input_path, save_path, threshold=0.5, cache_dir=None):
+    """
+    Writes pacing.csv (num_cuts, cuts_per_min, frames_per_cut, inter_cut_time) for a video.
+    """
+    print("Running shot detection")
+
+    num_cuts, cuts_per_min, frames_per_cut, inter_cut_time = get_pacing_data(input_path, save_path, threshold, cache_dir)
+
+    csv_file_path = f"{save_path}/pacing.csv"
+    with open(csv_file_path, mode='w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['num_cuts', 'cuts_per_min', 'frames_per_cut', 'inter_cut_time'])
+        writer.writerow([num_cuts, cuts_per_min, frames_per_cut, inter_cut_time])
+
+    print(f"Pacing data saved to {csv_file_path}")
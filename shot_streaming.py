@@ -0,0 +1,358 @@
+from collections import deque
+import cv2
+import numpy as np
+
+import frame_stream
+
+# TransNetV2 input geometry: 100-frame windows of 48x27 RGB frames, of which the middle
+# 50 predictions are kept and the first/last 25 frames are context.
+TRANSNET_WIDTH = 48
+TRANSNET_HEIGHT = 27
+WINDOW_SIZE = 100
+WINDOW_STEP = 50
+CONTEXT = 25
+
+# Pre-filter defaults: frames whose change score stays below PREFILTER_THRESHOLD, both
+# against the previous frame and against the frame PREFILTER_LAG frames back, cannot be cuts.
+PREFILTER_THRESHOLD = 0.05
+PREFILTER_LAG = 10
+HISTOGRAM_BINS = 16
+
+
+def to_transnet_frame(frame):
+    """
+    Converts a BGR frame from OpenCV to the 27x48 RGB uint8 input TransNetV2 expects.
+    """
+    small = cv2.resize(frame, (TRANSNET_WIDTH, TRANSNET_HEIGHT), interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(small, cv2.COLOR_BGR2RGB)
+
+
+class StreamingShotPredictor:
+    """
+    Runs TransNetV2 over frames as they arrive, with the same windowing as
+    TransNetV2.predict_frames but holding at most one 100-frame window in memory.
+
+    The first window is padded with 25 copies of the first frame and the end of the
+    video with copies of the last frame, exactly as predict_frames pads the full tensor.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.buffer = np.empty((WINDOW_SIZE, TRANSNET_HEIGHT, TRANSNET_WIDTH, 3), dtype=np.uint8)
+        self.buffered = 0
+        self.num_frames = 0
+        self.last_frame = None
+        self.single_frame_predictions = []
+        self.all_frame_predictions = []
+
+    def _push(self, small_frame):
+        self.buffer[self.buffered] = small_frame
+        self.buffered += 1
+        if self.buffered == WINDOW_SIZE:
+            single, many = self.model.predict_raw(self.buffer[np.newaxis])
+            self.single_frame_predictions.append(np.asarray(single)[0, CONTEXT:CONTEXT + WINDOW_STEP, 0])
+            self.all_frame_predictions.append(np.asarray(many)[0, CONTEXT:CONTEXT + WINDOW_STEP, 0])
+            # Keep the last 50 frames as the start of the next window
+            self.buffer[:WINDOW_SIZE - WINDOW_STEP] = self.buffer[WINDOW_STEP:]
+            self.buffered = WINDOW_SIZE - WINDOW_STEP
+
+    def update(self, frame):
+        """
+        Adds one BGR frame.
+        """
+        self.update_small(to_transnet_frame(frame))
+
+    def update_small(self, small_frame):
+        """
+        Adds one frame that has already been converted with to_transnet_frame.
+        """
+        if self.num_frames == 0:
+            for _ in range(CONTEXT):
+                self._push(small_frame)
+        self._push(small_frame)
+        self.last_frame = small_frame
+        self.num_frames += 1
+
+    def finish(self):
+        """
+        Pads the end of the video, runs the remaining windows and returns the predictions.
+
+        Returns:
+            tuple: (single_frame_predictions, all_frame_predictions), one value per frame.
+        """
+        if self.num_frames == 0:
+            return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.float32)
+
+        remainder = self.num_frames % WINDOW_STEP
+        padding = CONTEXT + WINDOW_STEP - (remainder if remainder != 0 else WINDOW_STEP)
+        for _ in range(padding):
+            self._push(self.last_frame)
+
+        single = np.concatenate(self.single_frame_predictions)[:self.num_frames]
+        many = np.concatenate(self.all_frame_predictions)[:self.num_frames]
+        return single, many
+
+
+def frame_change_score(previous, current, bins=HISTOGRAM_BINS):
+    """
+    Cheap change score between two to_transnet_frame frames, in [0, 1]: the larger of the
+    per-channel histogram distance and the mean absolute pixel difference / 255.
+
+    The histogram distance is the earth mover's distance between the channel histograms in
+    units of the full intensity range, so noise that moves pixels across a bin edge barely
+    counts. It catches cuts between shots with different colours, the pixel term cuts between
+    shots with similar colour distributions (and hence similar brightness).
+    """
+    num_pixels = previous.shape[0] * previous.shape[1]
+    histogram_distance = 0.0
+    for channel in range(3):
+        h1 = cv2.calcHist([previous], [channel], None, [bins], [0, 256])
+        h2 = cv2.calcHist([current], [channel], None, [bins], [0, 256])
+        distance = float(np.abs(np.cumsum(h1 - h2)).sum()) / (num_pixels * bins)
+        histogram_distance = max(histogram_distance, distance)
+    pixel_difference = float(cv2.absdiff(previous, current).mean()) / 255.0
+    return max(histogram_distance, pixel_difference)
+
+
+class PrefilteredShotPredictor:
+    """
+    StreamingShotPredictor that only runs TransNetV2 on candidate regions.
+
+    A frame is a candidate when its frame_change_score against the previous frame, or against
+    the frame `lag` frames back (for gradual transitions), exceeds `threshold`. Each candidate
+    is padded with `padding` frames on both sides, overlapping regions are merged, and every
+    region is run through its own StreamingShotPredictor. Frames outside all regions are static,
+    cannot contain a cut and get a prediction of 0.
+
+    Frames are released to the model `padding` frames late, so memory stays bounded by one
+    window plus `padding` small frames.
+    """
+
+    def __init__(self, model, threshold=PREFILTER_THRESHOLD, padding=CONTEXT, lag=PREFILTER_LAG):
+        if padding < 0 or lag < 1:
+            raise ValueError("padding must be >= 0 and lag >= 1")
+        self.model = model
+        self.threshold = threshold
+        self.padding = padding
+        self.history = deque(maxlen=lag + 1)
+        self.pending = deque()
+        self.last_candidate = None
+        self.predictor = None
+        self.region_start = 0
+        self.regions = []
+        self.num_frames = 0
+        self.skipped_frames = 0
+
+    @property
+    def skipped_fraction(self):
+        """Fraction of the frames seen so far that were not sent to the model."""
+        return self.skipped_frames / self.num_frames if self.num_frames else 0.0
+
+    def update(self, frame):
+        """
+        Adds one BGR frame.
+        """
+        small_frame = to_transnet_frame(frame)
+        if self.history:
+            score = frame_change_score(self.history[-1], small_frame)
+            if len(self.history) == self.history.maxlen:
+                score = max(score, frame_change_score(self.history[0], small_frame))
+            if score > self.threshold:
+                self.last_candidate = self.num_frames
+        self.history.append(small_frame)
+
+        self.pending.append((self.num_frames, small_frame))
+        self.num_frames += 1
+        if len(self.pending) > self.padding:
+            self._release(*self.pending.popleft())
+
+    def _release(self, index, small_frame):
+        # Every candidate up to index + padding has been seen by now
+        if self.last_candidate is not None and self.last_candidate >= index - self.padding:
+            if self.predictor is None:
+                self.predictor = StreamingShotPredictor(self.model)
+                self.region_start = index
+            self.predictor.update_small(small_frame)
+        else:
+            self._close_region()
+            self.skipped_frames += 1
+
+    def _close_region(self):
+        if self.predictor is not None:
+            self.regions.append((self.region_start, *self.predictor.finish()))
+            self.predictor = None
+
+    def finish(self):
+        """
+        Runs the remaining candidate region and returns the predictions.
+
+        Returns:
+            tuple: (single_frame_predictions, all_frame_predictions), one value per frame,
+            0 for skipped frames.
+        """
+        while self.pending:
+            self._release(*self.pending.popleft())
+        self._close_region()
+
+        single = np.zeros(self.num_frames, dtype=np.float32)
+        many = np.zeros(self.num_frames, dtype=np.float32)
+        for start, region_single, region_many in self.regions:
+            single[start:start + len(region_single)] = region_single
+            many[start:start + len(region_many)] = region_many
+        return single, many
+
+
+class ShotDetectionStage:
+    """
+    Stream stage that runs TransNetV2 on the shared single-pass decoder (see frame_stream).
+    """
+
+    def __init__(self, model, prefilter=False, **prefilter_options):
+        if prefilter:
+            self.predictor = PrefilteredShotPredictor(model, **prefilter_options)
+        else:
+            self.predictor = StreamingShotPredictor(model)
+
+    def update(self, frame):
+        self.predictor.update(frame)
+
+    def result(self):
+        single, _ = self.predictor.finish()
+        if isinstance(self.predictor, PrefilteredShotPredictor):
+            print(f"Shot pre-filter skipped {self.predictor.skipped_fraction:.1%} of frames")
+        return {"shot_probability": single.tolist()}
+
+
+def predict_frames_streaming(model, frames):
+    """
+    Single-frame and all-frame TransNetV2 predictions for an iterable of BGR frames.
+
+    Parameters:
+        model: A TransNetV2 instance (anything with predict_raw).
+        frames (iterable of ndarray): BGR frames, e.g. frame_stream.iter_video_frames(video_path).
+
+    Returns:
+        tuple: (single_frame_predictions, all_frame_predictions) as float arrays.
+    """
+    predictor = StreamingShotPredictor(model)
+    for frame in frames:
+        predictor.update(frame)
+    return predictor.finish()
+
+
+def predict_frames_prefiltered(model, frames, **options):
+    """
+    Like predict_frames_streaming, but skips TransNetV2 on static spans (see PrefilteredShotPredictor).
+
+    Parameters:
+        model: A TransNetV2 instance (anything with predict_raw).
+        frames (iterable of ndarray): BGR frames.
+        **options: threshold, padding and lag for PrefilteredShotPredictor.
+
+    Returns:
+        tuple: (single_frame_predictions, all_frame_predictions, skipped_fraction).
+    """
+    predictor = PrefilteredShotPredictor(model, **options)
+    for frame in frames:
+        predictor.update(frame)
+    single, many = predictor.finish()
+    return single, many, predictor.skipped_fraction
+
+
+def make_synthetic_cut_clip(num_shots=6, shot_length=120, size=(192, 108), dissolve_length=12, seed=0):
+    """
+    Synthetic clip of static, slightly noisy shots joined by hard cuts, with the last
+    transition a dissolve. Consecutive shots alternate between random textures and flat
+    colours of similar brightness, so brightness alone cannot find every cut.
+
+    Returns:
+        tuple: (frames, cut_frames) where cut_frames are the first frames of each new shot.
+    """
+    rng = np.random.default_rng(seed)
+    width, height = size
+    shots = []
+    for i in range(num_shots):
+        if i % 2 == 0:
+            base = cv2.resize(rng.integers(0, 256, (height // 8, width // 8, 3), dtype=np.uint8), size,
+                              interpolation=cv2.INTER_LINEAR)
+        else:
+            base = np.full((height, width, 3), rng.integers(60, 200, 3), dtype=np.uint8)
+        shots.append(base)
+
+    frames, cut_frames = [], []
+    for i, base in enumerate(shots):
+        if i > 0:
+            cut_frames.append(len(frames))
+        for t in range(shot_length):
+            if i == num_shots - 1 and i > 0 and t < dissolve_length:
+                alpha = (t + 1) / (dissolve_length + 1)
+                base_frame = cv2.addWeighted(shots[i - 1], 1 - alpha, base, alpha, 0)
+            else:
+                base_frame = base
+            noise = rng.integers(-3, 4, base.shape)
+            frames.append(np.clip(base_frame.astype(np.int16) + noise, 0, 255).astype(np.uint8))
+    return np.stack(frames), cut_frames
+
+
+def prefilter_recall_report(model, clips=None, threshold=0.5, **options):
+    """
+    Compares the cuts found with the pre-filter against full TransNetV2 inference.
+
+    Parameters:
+        model: A TransNetV2 instance.
+        clips (list of ndarray): BGR clips. Defaults to synthetic cut clips.
+        threshold (float): Shot boundary probability threshold.
+        **options: Passed to PrefilteredShotPredictor.
+
+    Returns:
+        list of dict: One row per clip with cut_frames (frames above threshold with full
+        inference), cut_frames_found, recall and skipped_fraction.
+    """
+    if clips is None:
+        clips = [make_synthetic_cut_clip(seed=seed)[0] for seed in range(3)]
+
+    rows = []
+    for clip in clips:
+        full, _ = predict_frames_streaming(model, clip)
+        filtered, _, skipped_fraction = predict_frames_prefiltered(model, clip, **options)
+        cuts = np.flatnonzero(full > threshold)
+        cuts_found = np.flatnonzero(filtered[cuts] > threshold)
+        rows.append({
+            'cut_frames': len(cuts),
+            'cut_frames_found': len(cuts_found),
+            'recall': len(cuts_found) / len(cuts) if len(cuts) else 1.0,
+            'skipped_fraction': skipped_fraction,
+        })
+    return rows
+
+
+def load_transnet_model():
+    """
+    Loads TransNetV2. Imported here so that TensorFlow is only loaded when shots are detected.
+    """
+    from transnetv2 import TransNetV2
+    return TransNetV2()
+
+
+def shot_prediction_streaming(video_path, model=None, threshold=0.5, prefilter=False):
+    """
+    Predicts the shot boundaries of a video with peak memory independent of its length.
+
+    Parameters:
+        video_path (str): Path to the input video file.
+        model: A TransNetV2 instance. Loaded on demand if None.
+        threshold (float): Shot boundary probability threshold.
+        prefilter (bool): Skip the model on static spans (see PrefilteredShotPredictor).
+
+    Returns:
+        ndarray: (start_frame, end_frame) rows, one per predicted shot.
+    """
+    if model is None:
+        model = load_transnet_model()
+    frames = frame_stream.iter_video_frames(video_path)
+    if prefilter:
+        single_frame_predictions, _, skipped_fraction = predict_frames_prefiltered(model, frames)
+        print(f"Shot pre-filter skipped {skipped_fraction:.1%} of frames")
+    else:
+        single_frame_predictions, _ = predict_frames_streaming(model, frames)
+    return model.predictions_to_scenes(single_frame_predictions, threshold=threshold)
@@ -0,0 +1,256 @@
+import os
+import json
+import time
+import pickle
+import hashlib
+
+CACHE_DIR_NAME = ".stage_cache"
+MANIFEST_NAME = "manifest.json"
+
+
+def fast_video_hash(video_path, num_samples=16, sample_size=1 << 16):
+    """
+    Content hash of a video that reads at most num_samples * sample_size bytes.
+
+    Hashes the file size, modification time and num_samples evenly spaced blocks, including
+    the first and last, so it is O(1) in the video length. Any re-encode, trim or append
+    changes the sampled blocks or the size. An in-place edit that keeps the size and falls
+    between the samples is only caught by the modification time, so touching or copying a
+    video without preserving its mtime also changes the hash.
+
+    Parameters:
+        video_path (str): Path to the video file.
+        num_samples (int): Number of blocks to sample.
+        sample_size (int): Bytes per block.
+
+    Returns:
+        str: Hex SHA-256 digest.
+    """
+    stat = os.stat(video_path)
+    size = stat.st_size
+    digest = hashlib.sha256(f"{size}:{stat.st_mtime_ns}".encode())
+    with open(video_path, "rb") as f:
+        if size <= num_samples * sample_size:
+            digest.update(f.read())
+        else:
+            last_offset = size - sample_size
+            for i in range(num_samples):
+                f.seek(last_offset * i // (num_samples - 1))
+                digest.update(f.read(sample_size))
+    return digest.hexdigest()
+
+
+def normalise_path_arg(value):
+    """
+    The real path of a string argument that names a path (it contains a separator or exists),
+    so that 'video.mp4', './video.mp4' and '/abs/video.mp4' give the same cache key. Other
+    values are returned unchanged.
+    """
+    if isinstance(value, str) and (os.sep in value or os.path.exists(value)):
+        return os.path.realpath(value)
+    return value
+
+
+class StageRef:
+    """
+    Placeholder for the result of another stage, passed as an argument to a Stage.
+
+    Resolved to the upstream result only when the stage actually runs, so skipped
+    stages never load their inputs. With index set, selects one item of a tuple result.
+    """
+
+    def __init__(self, stage, index=None):
+        self.stage = stage
+        self.index = index
+
+    def __repr__(self):
+        return f"StageRef({self.stage!r}, {self.index!r})"
+
+
+class Stage:
+    """
+    One cacheable step of the pipeline: func(*args, **kwargs).
+
+    Parameters:
+        name (str): Unique stage name.
+        func (callable): Function to run.
+        args (tuple): Positional arguments; StageRef arguments are replaced by upstream results.
+        kwargs (dict): Keyword arguments; StageRef values are replaced likewise.
+        outputs (list of str): Files or folders the stage writes. The stage reruns if any is missing.
+        deps (list of str): Upstream stages, in addition to those referenced by StageRef arguments.
+        version (int): Bump when the stage's code changes in a way that invalidates old outputs.
+    """
+
+    def __init__(self, name, func, args=(), kwargs=None, outputs=(), deps=(), version=1):
+        self.name = name
+        self.func = func
+        self.args = tuple(args)
+        self.kwargs = dict(kwargs or {})
+        self.outputs = list(outputs)
+        self.version = version
+
+        refs = [value.stage for value in list(self.args) + list(self.kwargs.values()) if isinstance(value, StageRef)]
+        self.deps = list(dict.fromkeys(list(deps) + refs))
+
+    def params(self):
+        """JSON-friendly description of the stage's arguments, used in its cache key."""
+        return {"args": [normalise_path_arg(value) for value in self.args],
+                "kwargs": {name: normalise_path_arg(value) for name, value in self.kwargs.items()},
+                "func": getattr(self.func, "__qualname__", repr(self.func))}
+
+
+class StageCache:
+    """
+    Content-addressed cache of stage results for one video, stored in
+    <folder_path>/.stage_cache.
+
+    A stage's key hashes the video content hash, its name, arguments and version, the
+    library versions and the keys of its upstream stages. A stage is skipped when its
+    key matches the manifest and its outputs still exist, so changing a parameter
+    reruns that stage and everything downstream of it, and nothing else.
+    """
+
+    def __init__(self, folder_path, video_path, versions=None, enabled=True):
+        self.cache_dir = os.path.join(folder_path, CACHE_DIR_NAME)
+        self.manifest_path = os.path.join(self.cache_dir, MANIFEST_NAME)
+        self.video_hash = fast_video_hash(video_path)
+        self.versions = dict(versions or {})
+        self.enabled = enabled
+        self.keys = {}
+        self.results = {}
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.manifest = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                self.manifest = json.load(f)
+
+    def stage_key(self, stage):
+        """Cache key of a stage. Upstream stages must have been keyed (run or skipped) first."""
+        missing = [dep for dep in stage.deps if dep not in self.keys]
+        if missing:
+            raise ValueError(f"Stage '{stage.name}' depends on {missing}, which have not been run")
+
+        description = {
+            "video": self.video_hash,
+            "stage": stage.name,
+            "version": stage.version,
+            "params": stage.params(),
+            "versions": self.versions,
+            "deps": {dep: self.keys[dep] for dep in stage.deps},
+        }
+        encoded = json.dumps(description, sort_keys=True, default=repr)
+        return hashlib.sha256(encoded.encode()).hexdigest()
+
+    def _result_path(self, name):
+        return result_path(self.cache_dir, name)
+
+    def is_fresh(self, stage, key=None):
+        """True if the stage's cached outputs are up to date."""
+        entry = self.manifest.get(stage.name)
+        if not self.enabled or entry is None:
+            return False
+        if entry["key"] != (key or self.stage_key(stage)):
+            return False
+        return all(os.path.exists(path) for path in stage.outputs + [self._result_path(stage.name)])
+
+    def load_result(self, name):
+        """Returns a stage's result from this run, or loads it from the cache."""
+        if name not in self.results:
+            self.results[name] = load_stage_result(self.cache_dir, name)
+        return self.results[name]
+
+    def _save_manifest(self):
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def begin(self, stage):
+        """
+        Keys a stage and checks whether it needs to run.
+
+        Returns:
+            str: The stage's key if it must run, or None if its cached result is fresh.
+        """
+        key = self.stage_key(stage)
+        self.keys[stage.name] = key
+        if self.is_fresh(stage, key):
+            return None
+
+        # Forget the old entry first, so a failed run is never mistaken for a finished one
+        self.results.pop(stage.name, None)
+        if self.manifest.pop(stage.name, None) is not None:
+            self._save_manifest()
+        return key
+
+    def finish(self, stage, key, elapsed):
+        """Records a stage whose result has been written by execute_stage."""
+        self.manifest[stage.name] = {"key": key, "outputs": stage.outputs, "seconds": elapsed, "finished": time.time()}
+        self._save_manifest()
+
+    def run(self, stage):
+        """
+        Runs a stage unless its cached result is fresh.
+
+        Returns:
+            bool: True if the stage ran, False if it was skipped.
+        """
+        key = self.begin(stage)
+        if key is None:
+            print(f"Skipping {stage.name} (cached)")
+            return False
+        elapsed = execute_stage(stage, self.cache_dir, self.results)
+        self.finish(stage, key, elapsed)
+        return True
+
+
+def result_path(cache_dir, name):
+    return os.path.join(cache_dir, f"{name}.pkl")
+
+
+def load_stage_result(cache_dir, name):
+    """Loads a stage result written by execute_stage."""
+    with open(result_path(cache_dir, name), "rb") as f:
+        return pickle.load(f)
+
+
+def execute_stage(stage, cache_dir, results=None):
+    """
+    Runs a stage and pickles its result into cache_dir. StageRef arguments are read from
+    `results` when present there and from cache_dir otherwise, so this also works in a
+    worker process that only shares the cache directory.
+
+    Returns:
+        float: Seconds the stage took.
+    """
+    results = {} if results is None else results
+
+    def resolve(value):
+        if not isinstance(value, StageRef):
+            return value
+        if value.stage not in results:
+            results[value.stage] = load_stage_result(cache_dir, value.stage)
+        result = results[value.stage]
+        return result if value.index is None else result[value.index]
+
+    args = [resolve(value) for value in stage.args]
+    kwargs = {name: resolve(value) for name, value in stage.kwargs.items()}
+    start = time.time()
+    result = stage.func(*args, **kwargs)
+    elapsed = time.time() - start
+
+    results[stage.name] = result
+    with open(result_path(cache_dir, stage.name), "wb") as f:
+        pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return elapsed
+
+
+def run_stages(stages, cache):
+    """
+    Runs stages in order through a StageCache, skipping those that are up to date.
+
+    Returns:
+        list of str: Names of the stages that ran.
+    """
+    return [stage.name for stage in stages if cache.run(stage)]
@@ -0,0 +1,122 @@
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from parallel_metrics import resolve_workers
+from stage_cache import execute_stage
+
+STAGE_STATUSES = ("ran", "cached", "failed", "skipped")
+
+
+def select_stages(stages, targets=None):
+    """
+    Returns the stages needed to build `targets`, with all their dependencies, in declaration order.
+
+    Parameters:
+        stages (list of Stage): The whole pipeline.
+        targets (list of str): Stage names to build. None or empty selects every stage.
+    """
+    by_name = {}
+    for stage in stages:
+        if stage.name in by_name:
+            raise ValueError(f"Duplicate stage '{stage.name}'")
+        by_name[stage.name] = stage
+    for stage in stages:
+        unknown = [dep for dep in stage.deps if dep not in by_name]
+        if unknown:
+            raise ValueError(f"Stage '{stage.name}' depends on unknown stages {unknown}")
+
+    if not targets:
+        return list(stages)
+    unknown = [name for name in targets if name not in by_name]
+    if unknown:
+        raise ValueError(f"Unknown stages {unknown}, expected some of {list(by_name)}")
+
+    needed = set()
+    pending = list(targets)
+    while pending:
+        name = pending.pop()
+        if name not in needed:
+            needed.add(name)
+            pending.extend(by_name[name].deps)
+    return [stage for stage in stages if stage.name in needed]
+
+
+def run_stage_graph(stages, cache, workers=1, targets=None):
+    """
+    Runs stages as a dependency graph through a StageCache.
+
+    A stage starts as soon as all of its dependencies have run or been found in the cache,
+    on a process pool of `workers` processes, so independent branches run concurrently. When a
+    stage fails, only the stages downstream of it are skipped; every other branch runs to the end.
+
+    Parameters:
+        stages (list of Stage): The pipeline. Stage functions and arguments must be picklable.
+        cache (StageCache): Cache of the video being processed.
+        workers (int): Maximum number of stages running at once. 1 runs stages in this process;
+            None uses one process per CPU.
+        targets (list of str): Stages to build; their dependencies are pulled in. None builds all.
+
+    Returns:
+        dict: Stage name -> 'ran', 'cached', 'failed' or 'skipped' (an upstream stage failed).
+    """
+    stages = select_stages(stages, targets)
+    workers = resolve_workers(workers)
+    remaining = {stage.name: stage for stage in stages}
+    status = {}
+    running = {}
+
+    def record_failure(stage, exc):
+        status[stage.name] = "failed"
+        print(f"Stage {stage.name} failed: {exc!r}")
+
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        while remaining or running:
+            # Start every stage whose dependencies have settled, up to the concurrency limit
+            progressed = True
+            while progressed:
+                progressed = False
+                for name, stage in list(remaining.items()):
+                    dep_status = [status.get(dep) for dep in stage.deps]
+                    if any(s in ("failed", "skipped") for s in dep_status):
+                        del remaining[name]
+                        status[name] = "skipped"
+                        print(f"Skipping {name} (an upstream stage failed)")
+                        progressed = True
+                        continue
+                    if not all(s in ("ran", "cached") for s in dep_status):
+                        continue
+                    if len(running) >= workers:
+                        break
+
+                    del remaining[name]
+                    progressed = True
+                    key = cache.begin(stage)
+                    if key is None:
+                        status[name] = "cached"
+                        print(f"Skipping {name} (cached)")
+                    elif executor is None:
+                        try:
+                            cache.finish(stage, key, execute_stage(stage, cache.cache_dir, cache.results))
+                            status[name] = "ran"
+                        except Exception as exc:
+                            record_failure(stage, exc)
+                    else:
+                        running[executor.submit(execute_stage, stage, cache.cache_dir)] = (stage, key)
+
+            if not running:
+                if remaining:
+                    raise ValueError(f"Dependency cycle among stages {list(remaining)}")
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, key = running.pop(future)
+                try:
+                    cache.finish(stage, key, future.result())
+                    status[stage.name] = "ran"
+                except Exception as exc:
+                    record_failure(stage, exc)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return status
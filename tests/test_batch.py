@@ -0,0 +1,130 @@
+import os
+import json
+import unittest
+import cv2
+from argparse import Namespace
+from tempfile import TemporaryDirectory
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from batch import *
+import corpus_index
+
+
+def thread_limits():
+    """The threads OpenCV and every loaded BLAS/OpenMP library would use in this process."""
+    from threadpoolctl import threadpool_info
+    return sorted({cv2.getNumThreads()} | {info["num_threads"] for info in threadpool_info()})
+
+
+def fake_process(video_path, args):
+    """Stands in for process_video_job: 'processes' a video of 10 frames, fails on names with 'bad'."""
+    if "bad" in os.path.basename(video_path):
+        raise RuntimeError("corrupt video")
+    with open(video_path + ".log", "a") as f:
+        f.write(f"{thread_limits()}\n")
+    return {"frames": 10, "seconds": 0.01, "incomplete_stages": []}
+
+
+def fake_process_with_folder(video_path, args):
+    """Like fake_process, and writes a processed folder next to the video."""
+    result = fake_process(video_path, args)
+    folder = os.path.join(os.path.dirname(video_path), "processed_videos", os.path.splitext(os.path.basename(video_path))[0])
+    os.makedirs(folder, exist_ok=True)
+    with open(os.path.join(folder, "pacing.csv"), "w") as f:
+        f.write("total_cuts,cuts_per_min\n3,9.0\n")
+    result["folder_path"] = folder
+    return result
+
+
+def fake_incomplete(video_path, args):
+    return {"frames": 10, "seconds": 0.01, "incomplete_stages": ["pacing"]}
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.folder = self.tmp.name
+        self.manifest_path = os.path.join(self.folder, "manifest.json")
+        self.videos = []
+        for name in ["a.mp4", "b.MOV", "bad.mp4"]:
+            path = os.path.join(self.folder, name)
+            with open(path, "wb") as f:
+                f.write(b"video")
+            self.videos.append(path)
+        with open(os.path.join(self.folder, "notes.txt"), "w") as f:
+            f.write("not a video")
+        self.args = Namespace()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def runs(self, video):
+        path = video + ".log"
+        if not os.path.exists(path):
+            return 0
+        with open(path) as f:
+            return len(f.readlines())
+
+    def test_find_videos(self):
+        self.assertEqual(find_videos(self.folder), sorted(self.videos))
+        list_path = os.path.join(self.folder, "videos.txt")
+        with open(list_path, "w") as f:
+            f.write("# corpus\na.mp4\n\n" + self.videos[1] + "\n")
+        self.assertEqual(find_videos(list_path), self.videos[:2])
+
+    def test_manifest_records_status_and_throughput(self):
+        report = run_batch(self.videos, self.args, self.manifest_path, workers=1, process_func=fake_process)
+        self.assertEqual(report["videos"], 2)
+        self.assertEqual(report["frames"], 20)
+        self.assertEqual(report["failed"], 1)
+        self.assertGreater(report["videos_per_hour"], 0)
+        self.assertGreater(report["frames_per_second"], 0)
+
+        with open(self.manifest_path) as f:
+            entries = json.load(f)
+        self.assertEqual(entries[self.videos[0]]["status"], "done")
+        self.assertEqual(entries[self.videos[2]]["status"], "failed")
+        self.assertIn("corrupt video", entries[self.videos[2]]["error"])
+
+    def test_resume_skips_finished_videos(self):
+        run_batch(self.videos[:1], self.args, self.manifest_path, workers=1, process_func=fake_process)
+        # Simulate a crash while b was running
+        manifest = BatchManifest(self.manifest_path)
+        manifest.update(self.videos[1], status="running")
+
+        report = run_batch(self.videos, self.args, self.manifest_path, workers=1, process_func=fake_process)
+        self.assertEqual(report["videos"], 1)
+        self.assertEqual([self.runs(video) for video in self.videos[:2]], [1, 1])
+
+        # Failed videos are only retried on request; changed videos are rerun
+        report = run_batch(self.videos, self.args, self.manifest_path, workers=1, process_func=fake_process)
+        self.assertEqual((report["videos"], report["failed"]), (0, 0))
+        with open(self.videos[0], "ab") as f:
+            f.write(b"more")
+        report = run_batch(self.videos, self.args, self.manifest_path, workers=1, retry_failed=True,
+                           process_func=fake_process)
+        self.assertEqual((report["videos"], report["failed"]), (1, 1))
+
+    def test_worker_pool_and_thread_budget(self):
+        report = run_batch(self.videos, self.args, self.manifest_path, workers=2, threads_per_worker=3,
+                           process_func=fake_process)
+        self.assertEqual((report["videos"], report["failed"]), (2, 1))
+        with open(self.videos[0] + ".log") as f:
+            self.assertEqual(f.read().strip(), "[3]")
+
+    def test_incomplete_stages_fail_the_video(self):
+        report = run_batch(self.videos[:1], self.args, self.manifest_path, workers=1, process_func=fake_incomplete)
+        self.assertEqual(report["failed"], 1)
+        self.assertIn("pacing", BatchManifest(self.manifest_path).entries[self.videos[0]]["error"])
+
+    def test_finished_videos_update_corpus_index(self):
+        run_batch(self.videos, self.args, self.manifest_path, workers=2, process_func=fake_process_with_folder)
+        index = corpus_index.read_index(os.path.join(self.folder, "processed_videos"))
+        self.assertEqual(index["video_label"].tolist(), ["a", "b"])
+        self.assertEqual(index["cuts_per_min"].tolist(), [9.0, 9.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
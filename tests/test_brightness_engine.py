@@ -0,0 +1,132 @@
+import os
+import unittest
+import numpy as np
+import cv2
+from tempfile import TemporaryDirectory
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from wisper import brightness_processing
+from brightness_engine import *
+
+
+class TestBrightnessEngine(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.frames = rng.integers(0, 256, (12, 20, 30, 3), dtype=np.uint8)
+        self.expected_means = [brightness_processing.calculate_frame_brightness(f) for f in self.frames]
+
+    def test_frame_brightness_means_array(self):
+        means = frame_brightness_means(self.frames, chunk_size=5)
+        np.testing.assert_allclose(means, self.expected_means, rtol=1e-12)
+
+    def test_frame_brightness_means_memmap(self):
+        with TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "frames.dat")
+            stack = np.memmap(path, dtype=np.uint8, mode="w+", shape=self.frames.shape)
+            stack[:] = self.frames
+            stack.flush()
+            readonly = np.memmap(path, dtype=np.uint8, mode="r", shape=self.frames.shape)
+            means = frame_brightness_means(readonly, chunk_size=4)
+            del stack, readonly
+        np.testing.assert_allclose(means, self.expected_means, rtol=1e-12)
+
+    def test_frame_brightness_means_folder_and_iterable(self):
+        with TemporaryDirectory() as tmp:
+            for i, frame in enumerate(self.frames):
+                cv2.imwrite(os.path.join(tmp, f"frame_{i:04d}.png"), frame)
+            np.testing.assert_allclose(frame_brightness_means(tmp), self.expected_means, rtol=1e-12)
+        np.testing.assert_allclose(frame_brightness_means(iter(self.frames)), self.expected_means, rtol=1e-12)
+
+    def test_frame_brightness_means_bad_shape(self):
+        with self.assertRaises(ValueError):
+            frame_brightness_means(np.zeros((4, 10, 10), dtype=np.uint8))
+
+    def test_sliding_window_stats_match_direct(self):
+        values = np.array(self.expected_means)
+        means, variances = sliding_window_stats(values, 4)
+        self.assertEqual(len(means), len(values) - 3)
+        for i in range(len(means)):
+            window = values[i:i + 4]
+            self.assertAlmostEqual(means[i], window.mean(), places=9)
+            self.assertAlmostEqual(variances[i], window.var(), places=6)
+
+    def test_sliding_window_stats_too_few_values(self):
+        means, variances = sliding_window_stats([1.0], 2)
+        self.assertEqual(len(means), 0)
+        self.assertEqual(len(variances), 0)
+
+    def test_get_sliding_window_brightness_list(self):
+        frames = np.ones((5, 10, 10, 3), dtype=np.uint8) * 150
+        sliding_window_list = get_sliding_window_brightness_list(frames, window_size=2)
+        self.assertEqual(len(sliding_window_list), 4)
+        for brightness in sliding_window_list:
+            self.assertAlmostEqual(brightness, 150, places=6)
+        self.assertEqual(get_sliding_window_brightness_list(frames[:1], window_size=2), [])
+
+
+
+class TestBrightnessChangeHeatmaps(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        rng = np.random.default_rng(1)
+        self.frames = rng.integers(0, 256, (6, 24, 32, 3), dtype=np.uint8)
+        gray = [cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) for frame in self.frames]
+        self.expected = [cv2.absdiff(gray[i], gray[i + 1]) for i in range(len(gray) - 1)]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_heatmaps_reuse_one_buffer(self):
+        heatmaps = []
+        buffers = set()
+        for heatmap in iter_brightness_change_heatmaps(self.frames):
+            heatmaps.append(heatmap.copy())
+            buffers.add(id(heatmap))
+        self.assertEqual(len(buffers), 1)
+        self.assertEqual(len(heatmaps), 5)
+        for heatmap, expected in zip(heatmaps, self.expected):
+            np.testing.assert_array_equal(heatmap, expected)
+        self.assertEqual(list(iter_brightness_change_heatmaps(self.frames[:1])), [])
+
+    def test_image_sequence(self):
+        folder = os.path.join(self.tmp.name, "heatmaps")
+        os.makedirs(folder)
+        open(os.path.join(folder, "heatmap_0099.jpg"), "w").close()  # From an earlier, longer run
+        self.assertEqual(save_brightness_change_heatmaps(self.frames, folder), 5)
+        self.assertEqual(sorted(os.listdir(folder)), [f"heatmap_{i:04d}.jpg" for i in range(1, 6)])
+        saved = cv2.imread(os.path.join(folder, "heatmap_0002.jpg"), cv2.IMREAD_GRAYSCALE)
+        self.assertLess(np.abs(saved.astype(int) - self.expected[1]).mean(), 8)
+
+    def test_video_output(self):
+        path = os.path.join(self.tmp.name, "heatmaps.avi")
+        self.assertEqual(save_brightness_change_heatmaps(self.frames, path, fps=10), 5)
+        cap = cv2.VideoCapture(path)
+        self.assertEqual(int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), 5)
+        ret, frame = cap.read()
+        cap.release()
+        self.assertTrue(ret)
+        self.assertEqual(frame.shape, (24, 32, 3))
+        with self.assertRaises(ValueError):
+            HeatmapVideoWriter(os.path.join(self.tmp.name, "heatmaps.xyz"))
+
+    def test_sources(self):
+        video = os.path.join(self.tmp.name, "clip.avi")
+        writer = cv2.VideoWriter(video, cv2.VideoWriter_fourcc(*"MJPG"), 25, (32, 24))
+        for frame in self.frames:
+            writer.write(frame)
+        writer.release()
+        folder = os.path.join(self.tmp.name, "frames")
+        os.makedirs(folder)
+        for i, frame in enumerate(self.frames):
+            cv2.imwrite(os.path.join(folder, f"frame_{i:04d}.png"), frame)
+
+        from_folder = [h.copy() for h in iter_brightness_change_heatmaps(folder)]
+        np.testing.assert_array_equal(from_folder, self.expected)
+        self.assertEqual(len(list(iter_brightness_change_heatmaps(video))), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
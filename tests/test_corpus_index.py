@@ -0,0 +1,92 @@
+import os
+import time
+import unittest
+import numpy as np
+from tempfile import TemporaryDirectory
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import metrics_store
+from corpus_index import *
+
+
+def make_video_folder(root, name, brightness, cuts_per_min=12.0, scene_lengths=(1.0, 3.0, 5.0, 1.5)):
+    folder = os.path.join(root, name)
+    os.makedirs(folder, exist_ok=True)
+    metrics_store.save_metrics(folder, {
+        "brightness": np.full(100, brightness),
+        "HS_colourfulness": np.full(100, 0.5),
+        "optical_flow_magnitude": np.append(np.full(98, 2.0), np.nan),
+    })
+    with open(os.path.join(folder, "pacing.csv"), "w") as f:
+        f.write(f"total_cuts,cuts_per_min\n4,{cuts_per_min}\n")
+    with open(os.path.join(folder, "scene_lengths.csv"), "w") as f:
+        f.write("Scene Length (seconds)\n" + "\n".join(str(length) for length in scene_lengths) + "\n")
+    return folder
+
+
+class TestCorpusIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.root = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_summarize_video(self):
+        row = summarize_video(make_video_folder(self.root, "video_1", 100.0))
+        self.assertEqual(row["video_label"], "video_1")
+        self.assertEqual(row["num_frames"], 100)
+        self.assertAlmostEqual(row["brightness_mean"], 100.0)
+        self.assertAlmostEqual(row["optical_flow_mean"], 2.0)  # Non-finite flow is ignored
+        self.assertAlmostEqual(row["cuts_per_min"], 12.0)
+        self.assertAlmostEqual(row["short_cut_percent"], 50.0)
+
+    def test_missing_metrics_are_nan(self):
+        folder = os.path.join(self.root, "partial")
+        os.makedirs(folder)
+        with open(os.path.join(folder, "pacing.csv"), "w") as f:
+            f.write("total_cuts,cuts_per_min\n4,6.0\n")
+        row = summarize_video(folder)
+        self.assertTrue(np.isnan(row["brightness_mean"]))
+        self.assertTrue(np.isnan(row["short_cut_percent"]))
+        self.assertEqual(row["cuts_per_min"], 6.0)
+
+    def test_update_index_replaces_rows(self):
+        folder = make_video_folder(self.root, "video_2", 10.0)
+        make_video_folder(self.root, "video_10", 20.0)
+        update_index(self.root, [folder, os.path.join(self.root, "video_10")])
+        make_video_folder(self.root, "video_2", 30.0)
+        update_index(self.root, [folder])
+
+        index = read_index(self.root)
+        self.assertEqual(index["video_label"].tolist(), ["video_2", "video_10"])  # Natural order
+        self.assertEqual(index["brightness_mean"].tolist(), [30.0, 20.0])
+
+    def test_refresh_only_resummarises_changed_folders(self):
+        for i in range(3):
+            make_video_folder(self.root, f"video_{i}", float(i))
+        os.makedirs(os.path.join(self.root, "not_processed"))
+        index = load_index(self.root)
+        self.assertEqual(index["video_label"].tolist(), ["video_0", "video_1", "video_2"])
+
+        # Edit the index by hand: rows of unchanged folders must be kept as they are
+        index.loc[index["video_label"] == "video_0", "brightness_mean"] = -1.0
+        write_index(self.root, index)
+        time.sleep(0.01)
+        make_video_folder(self.root, "video_1", 50.0)
+        emptied = os.path.join(self.root, "video_2")
+        for filename in os.listdir(emptied):
+            os.remove(os.path.join(emptied, filename))
+
+        index = refresh_index(self.root)
+        self.assertEqual(index["video_label"].tolist(), ["video_0", "video_1"])
+        self.assertEqual(index["brightness_mean"].tolist(), [-1.0, 50.0])
+
+        index = refresh_index(self.root, rebuild=True)
+        self.assertEqual(index["brightness_mean"].tolist(), [0.0, 50.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import os
+import unittest
+import numpy as np
+import cv2
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flow_engines import *
+from flow_processing import average_flow_magnitudes, benchmark_flow_engines, make_moving_rectangle_clip
+
+
+class TestFlowEngines(unittest.TestCase):
+
+    def setUp(self):
+        # A textured square shifted 3 pixels to the right
+        rng = np.random.default_rng(2)
+        texture = cv2.GaussianBlur(rng.integers(0, 256, (30, 30), dtype=np.uint8), (3, 3), 0)
+        self.gray1 = np.zeros((80, 100), dtype=np.uint8)
+        self.gray2 = np.zeros((80, 100), dtype=np.uint8)
+        self.gray1[25:55, 30:60] = texture
+        self.gray2[25:55, 33:63] = texture
+
+    def test_farneback_matches_original_call(self):
+        flow = FarnebackEngine().compute(self.gray1, self.gray2)
+        expected = cv2.calcOpticalFlowFarneback(self.gray1, self.gray2, None, 0.5, 3, 15, 3, 5, 1.2, 0)
+        np.testing.assert_array_equal(flow, expected)
+
+    def test_dense_engines_return_fields(self):
+        for name in ['farneback', 'dis_ultrafast', 'dis_fast', 'dis_medium']:
+            engine = get_flow_engine(name)
+            self.assertTrue(engine.dense)
+            flow = engine.compute(self.gray1, self.gray2)
+            self.assertEqual(flow.shape, (80, 100, 2))
+            self.assertGreater(mean_flow_magnitude(flow), 0)
+
+    def test_sparse_lk_tracks_displacement(self):
+        engine = get_flow_engine('lk')
+        self.assertFalse(engine.dense)
+        vectors = engine.compute(self.gray1, self.gray2)
+        self.assertEqual(vectors.shape[1], 2)
+        self.assertGreater(len(vectors), 0)
+        self.assertAlmostEqual(float(np.median(vectors[:, 0])), 3.0, delta=0.5)
+
+    def test_sparse_lk_without_corners(self):
+        blank = np.zeros((40, 40), dtype=np.uint8)
+        vectors = SparseLKEngine().compute(blank, blank)
+        self.assertEqual(vectors.shape, (0, 2))
+        self.assertEqual(mean_flow_magnitude(vectors), 0.0)
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            get_flow_engine('horn_schunck')
+        with self.assertRaises(ValueError):
+            DISEngine('slow')
+
+    def test_engine_instance_passes_through(self):
+        engine = DISEngine('ultrafast')
+        self.assertIs(get_flow_engine(engine), engine)
+
+    def test_engines_in_flow_processing(self):
+        frames = make_moving_rectangle_clip(num_frames=6, size=(80, 60))
+        for name in FLOW_ENGINES:
+            self.assertEqual(len(average_flow_magnitudes(frames, engine=name)), 5)
+
+    def test_benchmark_flow_engines(self):
+        clips = {'rectangle': make_moving_rectangle_clip(num_frames=6, size=(80, 60))}
+        rows = benchmark_flow_engines(['farneback', 'lk'], clips)
+        self.assertEqual([row['engine'] for row in rows], ['farneback', 'lk'])
+        self.assertTrue(all(row['fps'] > 0 for row in rows))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+import os
+import unittest
+import numpy as np
+import cv2
+from tempfile import TemporaryDirectory
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flow_processing import *
+import flow_processing
+
+
+class TestAdaptiveOpticalFlow(unittest.TestCase):
+
+    def setUp(self):
+        self.frames = make_synthetic_clip(num_frames=9, size=(160, 90))
+
+    def test_baseline_matches_direct_farneback(self):
+        magnitudes = average_flow_magnitudes(self.frames)
+        self.assertEqual(len(magnitudes), 8)
+
+        gray1 = cv2.cvtColor(self.frames[0], cv2.COLOR_BGR2GRAY)
+        gray2 = cv2.cvtColor(self.frames[1], cv2.COLOR_BGR2GRAY)
+        flow = cv2.calcOpticalFlowFarneback(gray1, gray2, None, 0.5, 3, 15, 3, 5, 1.2, 0)
+        magnitude, _ = cv2.cartToPolar(flow[..., 0], flow[..., 1])
+        self.assertEqual(magnitudes[0], float(np.mean(magnitude)))
+
+    def test_stride_covers_every_frame(self):
+        pairs = [(start, end) for start, end, _ in iter_flow(self.frames, stride=3)]
+        self.assertEqual(pairs, [(0, 3), (3, 6), (6, 8)])
+        self.assertEqual(len(average_flow_magnitudes(self.frames, stride=3)), 8)
+
+    def test_scale_rescales_to_source_pixels(self):
+        _, _, flow = next(iter_flow(self.frames, scale=0.5))
+        self.assertEqual(flow.shape, (45, 80, 2))
+        baseline = np.array(average_flow_magnitudes(self.frames))
+        reduced = np.array(average_flow_magnitudes(self.frames, scale=0.5))
+        self.assertLess(np.mean(np.abs(reduced - baseline)), 0.5 * np.mean(baseline) + 0.1)
+
+    def test_invalid_parameters(self):
+        with self.assertRaises(ValueError):
+            next(iter_flow(self.frames, scale=0))
+        with self.assertRaises(ValueError):
+            next(iter_flow(self.frames, stride=0))
+
+    def test_process_optical_flow_strided(self):
+        with TemporaryDirectory() as input_dir, TemporaryDirectory() as output_dir:
+            for i, frame in enumerate(self.frames[:5]):
+                cv2.imwrite(os.path.join(input_dir, f"frame_{i + 1:04d}.png"), frame)
+
+            avg_magnitude_dict, motion_data_dict = process_optical_flow(input_dir, output_dir, scale=0.5, stride=2)
+            self.assertEqual(sorted(avg_magnitude_dict), [f"frame_{i:04d}.png" for i in range(2, 6)])
+            self.assertEqual(sorted(motion_data_dict), ["frame_2", "frame_4"])
+            self.assertEqual(avg_magnitude_dict["frame_0002.png"], avg_magnitude_dict["frame_0003.png"])
+
+    def test_fewer_than_two_frames(self):
+        for frames in (self.frames[:0], self.frames[:1]):
+            self.assertEqual(flow_pair_indices(len(frames)), [])
+            self.assertEqual(list(iter_flow(frames)), [])
+            self.assertEqual(list(iter_flow(frames, workers=2)), [])
+            self.assertEqual(average_flow_magnitudes(frames), [])
+
+    def test_parallel_iter_flow_matches_serial(self):
+        serial = list(iter_flow(self.frames, stride=2))
+        parallel = list(iter_flow(self.frames, stride=2, workers=2))
+        self.assertEqual([(s, e) for s, e, _ in serial], [(s, e) for s, e, _ in parallel])
+        for (_, _, a), (_, _, b) in zip(serial, parallel):
+            np.testing.assert_array_equal(a, b)
+
+    def test_parallel_iter_flow_with_many_chunks(self):
+        # More chunks than the 2 * workers kept in flight, so later chunks are submitted as earlier ones merge
+        original = flow_processing.MAX_CHUNK_PAIRS
+        flow_processing.MAX_CHUNK_PAIRS = 1
+        try:
+            parallel = list(iter_flow(self.frames, workers=2))
+        finally:
+            flow_processing.MAX_CHUNK_PAIRS = original
+        serial = list(iter_flow(self.frames))
+        self.assertEqual([(s, e) for s, e, _ in serial], [(s, e) for s, e, _ in parallel])
+        for (_, _, a), (_, _, b) in zip(serial, parallel):
+            np.testing.assert_array_equal(a, b)
+
+    def test_process_optical_flow_parallel_matches_serial(self):
+        with TemporaryDirectory() as input_dir, TemporaryDirectory() as serial_dir, \
+                TemporaryDirectory() as parallel_dir:
+            for i, frame in enumerate(self.frames):
+                cv2.imwrite(os.path.join(input_dir, f"frame_{i + 1:04d}.png"), frame)
+
+            serial_avg, serial_motion = process_optical_flow(input_dir, serial_dir)
+            parallel_avg, parallel_motion = process_optical_flow(input_dir, parallel_dir, workers=3)
+
+            self.assertEqual(serial_avg, parallel_avg)
+            self.assertEqual(list(serial_motion), list(parallel_motion))
+            for key in serial_motion:
+                np.testing.assert_array_equal(serial_motion[key], parallel_motion[key])
+            self.assertEqual(sorted(os.listdir(serial_dir)), sorted(os.listdir(parallel_dir)))
+
+    def test_process_optical_flow_without_visualisations(self):
+        with TemporaryDirectory() as input_dir, TemporaryDirectory() as output_dir:
+            for i, frame in enumerate(self.frames[:3]):
+                cv2.imwrite(os.path.join(input_dir, f"frame_{i + 1:04d}.png"), frame)
+            avg_magnitude_dict, _ = process_optical_flow(input_dir, output_dir, save_visualisations=False)
+            self.assertEqual(len(avg_magnitude_dict), 2)
+            self.assertEqual(os.listdir(output_dir), [])
+
+    def test_flow_accuracy_report(self):
+        rows = flow_accuracy_report([{'scale': 0.5}], frames=self.frames)
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]['mean_abs_error'], 0.0)
+        self.assertGreater(rows[1]['fps'], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import os
+import pickle
+import unittest
+import numpy as np
+import cv2
+from tempfile import TemporaryDirectory
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flow_store import FlowStoreWriter, FlowStore
+from flow_processing import process_optical_flow
+
+
+class TestFlowStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.store_path = os.path.join(self.tmp.name, "flow_store")
+        rng = np.random.default_rng(5)
+        self.flows = [rng.normal(0, 3, (16, 20, 2)).astype(np.float32) for _ in range(7)]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_store(self, **kwargs):
+        with FlowStoreWriter(self.store_path, chunk_frames=3, **kwargs) as writer:
+            for i, flow in enumerate(self.flows):
+                writer.append(f"frame_{i + 1}", flow)
+        return FlowStore(self.store_path, max_open_chunks=2)
+
+    def test_float32_round_trip(self):
+        store = self.write_store()
+        self.assertEqual(len(store), 7)
+        self.assertEqual(list(store), [f"frame_{i + 1}" for i in range(7)])
+        for i, flow in enumerate(self.flows):
+            np.testing.assert_array_equal(store[f"frame_{i + 1}"], flow)
+        self.assertLessEqual(len(store.open_chunks), 2)
+
+    def test_float16_and_int8_are_close(self):
+        store = self.write_store(dtype="float16")
+        np.testing.assert_allclose(store["frame_3"], self.flows[2], atol=1e-2)
+
+        store = self.write_store(dtype="int8", max_abs=32.0)
+        np.testing.assert_allclose(store["frame_3"], self.flows[2], atol=32.0 / 127)
+
+    def test_last_chunk_has_its_real_length(self):
+        store = self.write_store()
+        shapes = [np.load(os.path.join(self.store_path, f"chunk_{i:05d}.npy"), mmap_mode="r").shape[0]
+                  for i in range(3)]
+        self.assertEqual(shapes, [3, 3, 1])
+        np.testing.assert_array_equal(store["frame_7"], self.flows[6])
+
+    def test_int8_clipping_is_counted(self):
+        self.flows[0][0, 0] = [40.0, -50.0]
+        store = self.write_store(dtype="int8", max_abs=32.0)
+        self.assertEqual(store.clipped_values, 2)
+        np.testing.assert_allclose(store["frame_1"][0, 0], [32.0, -32.0])
+        self.assertEqual(self.write_store(dtype="float16").clipped_values, 0)
+
+    def test_downsample(self):
+        store = self.write_store(downsample=2)
+        flow = store["frame_1"]
+        self.assertEqual(flow.shape, (8, 10, 2))
+        self.assertEqual(flow.dtype, np.float32)
+
+    def test_dict_like_access(self):
+        store = self.write_store()
+        self.assertIn("frame_2", store)
+        self.assertIsNone(store.get("frame_99"))
+        self.assertEqual(len(list(store.values())), 7)
+
+    def test_pickles_by_path(self):
+        store = self.write_store()
+        store["frame_1"]
+        data = pickle.dumps(store)
+        self.assertLess(len(data), 1000)
+        np.testing.assert_array_equal(pickle.loads(data)["frame_7"], self.flows[6])
+
+    def test_invalid_options(self):
+        with self.assertRaises(ValueError):
+            FlowStoreWriter(self.store_path, dtype="uint8")
+        with self.assertRaises(ValueError):
+            FlowStoreWriter(self.store_path, downsample=0)
+
+    def test_process_optical_flow_with_store(self):
+        input_dir = os.path.join(self.tmp.name, "frames")
+        output_dir = os.path.join(self.tmp.name, "flow")
+        os.makedirs(input_dir)
+        for i in range(3):
+            frame = np.zeros((50, 50, 3), dtype=np.uint8)
+            cv2.rectangle(frame, (10 + 3 * i, 10), (20 + 3 * i, 20), (255, 255, 255), -1)
+            cv2.imwrite(os.path.join(input_dir, f"frame_{i + 1:04d}.png"), frame)
+
+        avg_in_memory, motion_in_memory = process_optical_flow(input_dir, output_dir)
+        avg_stored, motion_stored = process_optical_flow(input_dir, output_dir, store_path=self.store_path)
+
+        self.assertEqual(avg_in_memory, avg_stored)
+        self.assertIsInstance(motion_stored, FlowStore)
+        self.assertEqual(set(motion_stored), set(motion_in_memory))
+        for key, flow in motion_in_memory.items():
+            np.testing.assert_array_equal(motion_stored[key], flow)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import os
+import time
+import unittest
+import numpy as np
+from PIL import Image
+from tempfile import TemporaryDirectory
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from frame_cache import *
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            return False
+        time.sleep(0.005)
+    return True
+
+
+class TestFrameCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.paths = []
+        rng = np.random.default_rng(0)
+        for i in range(40):
+            path = os.path.join(self.tmp.name, f"frame_{i:04d}.png")
+            Image.fromarray(rng.integers(0, 256, (60, 80, 3), dtype=np.uint8)).save(path)
+            self.paths.append(path)
+        self.loads = []
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def loader(self, path, display_size):
+        self.loads.append(self.paths.index(path))
+        return load_display_image(path, display_size)
+
+    def test_display_size_and_no_degradation(self):
+        cache = FrameCache(self.paths, prefetch=0, display_size=(20, 20), loader=self.loader)
+        self.assertEqual(cache.get(3).size, (20, 15))
+        self.assertIs(cache.get(3), cache.get(3))
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+
+        # Growing the display decodes from the source again instead of enlarging the thumbnail
+        cache.set_display_size((40, 40))
+        with Image.open(self.paths[3]) as source:
+            expected = source.resize((40, 30), Image.Resampling.LANCZOS)
+        self.assertEqual(np.asarray(cache.get(3)).tolist(), np.asarray(expected).tolist())
+        self.assertEqual(self.loads, [3, 3])
+
+    def test_memory_cap(self):
+        frame_size = 20 * 15 * 3
+        cache = FrameCache(self.paths, max_bytes=5 * frame_size, prefetch=0, display_size=(20, 20))
+        for i in range(len(self.paths)):
+            cache.get(i)
+            cache.seek(i)
+        self.assertLessEqual(cache.cached_bytes, 5 * frame_size)
+        self.assertEqual(cache.cached_indices(), [35, 36, 37, 38, 39])
+
+    def test_prefetch_follows_direction(self):
+        cache = FrameCache(self.paths, prefetch=5, display_size=(20, 20), loader=self.loader)
+        cache.get(10)
+        cache.seek(10, 1)
+        self.assertTrue(wait_for(lambda: set(range(11, 16)) <= set(cache.cached_indices())))
+
+        cache.seek(30, -1)
+        self.assertTrue(wait_for(lambda: set(range(25, 30)) <= set(cache.cached_indices())))
+        cache.close()
+        self.assertEqual(cache.prefetched, 10)
+        self.assertFalse(set(range(16, 25)) & set(self.loads))
+
+        hits = cache.hits
+        for i in range(29, 24, -1):
+            cache.get(i)
+        self.assertEqual(cache.hits, hits)  # close() dropped the frames
+
+    def test_evicts_behind_playhead_first(self):
+        frame_size = 20 * 15 * 3
+        cache = FrameCache(self.paths, max_bytes=8 * frame_size, prefetch=3, display_size=(20, 20))
+        for i in range(5):
+            cache.get(i)
+        cache.seek(4, 1)
+        self.assertTrue(wait_for(lambda: set(range(5, 8)) <= set(cache.cached_indices())))
+        # The cache is full; frames behind the playhead go first, least recently used among them
+        cache.get(20)
+        cache.get(21)
+        cached = cache.cached_indices()
+        cache.close()
+        self.assertEqual(sorted(cached), [2, 3, 4, 5, 6, 7, 20, 21])
+
+    def test_wraps_around_at_the_end(self):
+        cache = FrameCache(self.paths, prefetch=3, display_size=(20, 20))
+        cache.seek(38, 1)
+        self.assertTrue(wait_for(lambda: {39, 0, 1} <= set(cache.cached_indices())))
+        cache.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
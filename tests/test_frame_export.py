@@ -0,0 +1,107 @@
+import os
+import pickle
+import unittest
+import numpy as np
+import cv2
+from tempfile import TemporaryDirectory
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from frame_export import *
+from frame_container import PackedFrames, open_container, read_meta, is_packed
+from frame_stream import FrameFolder, list_frame_files, iter_folder_frames, iter_video_frames
+import parallel_metrics
+import brightness_engine
+
+
+def write_test_video(path, num_frames=12, size=(64, 48)):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 25, size)
+    for i in range(num_frames):
+        frame = np.full((size[1], size[0], 3), 10 + 18 * i, dtype=np.uint8)
+        cv2.rectangle(frame, (2 * i, 4), (2 * i + 12, 20), (0, 0, 255), -1)
+        writer.write(frame)
+    writer.release()
+
+
+class TestFrameExport(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.video = os.path.join(self.tmp.name, "clip.avi")
+        write_test_video(self.video)
+        self.frames = list(iter_video_frames(self.video))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def export(self, name, **kwargs):
+        return export_frames(self.video, os.path.join(self.tmp.name, name), workers=2, **kwargs)
+
+    def test_round_trip(self):
+        for container, encoding in [("files", "jpeg"), ("files", "png"), ("chunked", "raw"),
+                                    ("archive", "jpeg"), ("archive", "png"), ("archive", "raw")]:
+            with self.subTest(container=container, encoding=encoding):
+                folder = self.export(f"{container}_{encoding}", container=container, encoding=encoding,
+                                     chunk_frames=5)
+                frames = FrameFolder(folder)
+                self.assertEqual(len(frames), len(self.frames))
+                self.assertEqual(len(list_frame_files(folder)), len(self.frames))
+                for original, frame in zip(self.frames, iter_folder_frames(folder)):
+                    if encoding == "jpeg":
+                        self.assertLess(np.abs(frame.astype(int) - original).mean(), 3)
+                    else:
+                        np.testing.assert_array_equal(frame, original)
+                np.testing.assert_array_equal(frames[7], list(iter_folder_frames(folder))[7])
+                self.assertEqual(is_packed(folder), container != "files")
+
+    def test_stride_and_scale(self):
+        folder = self.export("small", stride=3, scale=0.5, container="chunked")
+        packed = PackedFrames(folder)
+        self.assertEqual(len(packed), 4)
+        self.assertEqual(packed[0].shape, (24, 32, 3))
+        expected = cv2.resize(self.frames[3], (32, 24), interpolation=cv2.INTER_AREA)
+        np.testing.assert_array_equal(packed[1], expected)
+        meta = read_meta(folder)
+        self.assertEqual((meta["stride"], meta["scale"], meta["num_frames"]), (3, 0.5, 4))
+
+    def test_invalid_options(self):
+        with self.assertRaises(ValueError):
+            self.export("bad", container="chunked", encoding="jpeg")
+        with self.assertRaises(ValueError):
+            self.export("bad", container="files", encoding="raw")
+        with self.assertRaises(ValueError):
+            self.export("bad", container="zip")
+
+    def test_reexport_replaces_previous_frames(self):
+        folder = self.export("raw", container="archive")
+        self.export("raw", container="files", stride=2)
+        self.assertIsNone(open_container(folder))
+        self.assertEqual(len(list_frame_files(folder)), 6)
+        self.export("raw", container="chunked")
+        self.assertEqual(sorted(os.listdir(folder)), ["chunk_00000.npy", "frames.json"])
+
+    def test_packed_frames_pickle_and_slices(self):
+        folder = self.export("archive", container="archive", encoding="png")
+        packed = pickle.loads(pickle.dumps(PackedFrames(folder)))
+        np.testing.assert_array_equal(packed[-1], self.frames[-1])
+        part = pickle.loads(pickle.dumps(FrameFolder(folder)[4:6]))
+        self.assertEqual(len(part), 2)
+        np.testing.assert_array_equal(part[0], self.frames[4])
+        with self.assertRaises(IndexError):
+            packed[len(self.frames)]
+
+    def test_metrics_match_across_containers(self):
+        files = self.export("files", container="files", encoding="png")
+        chunked = self.export("chunked", container="chunked")
+        archive = self.export("archive", container="archive", encoding="png")
+        expected = parallel_metrics.get_brightness_list(files)
+        for folder in (chunked, archive):
+            np.testing.assert_allclose(parallel_metrics.get_brightness_list(folder), expected)
+            np.testing.assert_allclose(parallel_metrics.get_brightness_diff_list(folder),
+                                       parallel_metrics.get_brightness_diff_list(files))
+            np.testing.assert_allclose(brightness_engine.frame_brightness_means(folder),
+                                       brightness_engine.frame_brightness_means(files))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import csv
+import unittest
+import numpy as np
+import cv2
+from tempfile import TemporaryDirectory
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from wisper import brightness_processing
+from frame_stream import *
+
+
+def write_test_video(path, num_frames=6, size=(64, 48)):
+    """Writes a short MJPG video of a bright square moving across a dark background."""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 25, size)
+    for i in range(num_frames):
+        frame = np.full((size[1], size[0], 3), 20 + 10 * i, dtype=np.uint8)
+        cv2.rectangle(frame, (5 + 4 * i, 10), (20 + 4 * i, 25), (255, 255, 255), -1)
+        writer.write(frame)
+    writer.release()
+
+
+class TestFrameStream(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.video_path = os.path.join(self.tmp.name, "clip.avi")
+        write_test_video(self.video_path)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_iter_video_frames(self):
+        frames = list(iter_video_frames(self.video_path))
+        self.assertEqual(len(frames), 6)
+        self.assertEqual(frames[0].shape, (48, 64, 3))
+
+    def test_iter_video_frames_stride(self):
+        frames = list(iter_video_frames(self.video_path, stride=4))
+        self.assertEqual(len(frames), 2)
+
+    def test_iter_video_frames_missing_file(self):
+        with self.assertRaises(ValueError):
+            next(iter_video_frames(os.path.join(self.tmp.name, "missing.avi")))
+
+    def test_stream_matches_per_frame_functions(self):
+        frames = list(iter_video_frames(self.video_path))
+        results = process_video_stream(self.video_path)
+
+        self.assertEqual(results["num_frames"], 6)
+        expected = [brightness_processing.calculate_frame_brightness(f) for f in frames]
+        self.assertEqual(results["brightness"], expected)
+        self.assertEqual(len(results["chroma"]), 6)
+        self.assertEqual(len(results["HS_colourfulness"]), 6)
+        self.assertEqual(len(results["optical_flow_magnitude"]), 5)
+        self.assertGreater(max(results["optical_flow_magnitude"]), 0)
+
+    def test_save_stream_metrics_to_csv(self):
+        results = {"num_frames": 2, "brightness": [1.0, 2.0]}
+        save_stream_metrics_to_csv(results, self.tmp.name)
+
+        with open(os.path.join(self.tmp.name, "brightness.csv"), newline='') as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(rows[0], ["frame", "frame_1", "frame_2"])
+        self.assertEqual(rows[1], ["brightness", "1.0", "2.0"])
+
+    def test_save_stream_metrics_to_csv_skips_unknown_keys(self):
+        results = {"num_frames": 2, "brightness": [1.0, 2.0], "debug_state": [0, 0]}
+        save_path = os.path.join(self.tmp.name, "metrics")
+        save_stream_metrics_to_csv(results, save_path)
+        self.assertEqual(os.listdir(save_path), ["brightness.csv"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import os
+import unittest
+import numpy as np
+import cv2
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from wisper import brightness_processing, colour_processing
+from fused_metrics import FusedFrameMetrics, FusedMetricsStage, benchmark_fused_metrics
+
+
+class TestFusedFrameMetrics(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self.random_image = rng.integers(0, 256, (60, 80, 3), dtype=np.uint8)
+        self.gray_image = np.ones((60, 80, 3), dtype=np.uint8) * 127
+        self.colour_image = np.zeros((60, 80, 3), dtype=np.uint8)
+        self.colour_image[:, :, 0] = 255  # Pure blue in BGR
+        self.kernel = FusedFrameMetrics()
+
+    def assert_matches_separate_functions(self, image):
+        fused = self.kernel(image)
+        metrics = colour_processing.compute_metrics(image)
+        self.assertAlmostEqual(fused['brightness'], brightness_processing.calculate_frame_brightness(image), places=3)
+        self.assertAlmostEqual(fused['average_chroma'], metrics['average_chroma'], places=3)
+        self.assertAlmostEqual(fused['average_hue'], metrics['average_hue'], places=1)
+        self.assertAlmostEqual(fused['colorfulness'], colour_processing.compute_colourfulness(image), places=3)
+
+    def test_matches_random_image(self):
+        self.assert_matches_separate_functions(self.random_image)
+
+    def test_matches_gray_image(self):
+        self.assert_matches_separate_functions(self.gray_image)
+        self.assertAlmostEqual(self.kernel(self.gray_image)['colorfulness'], 0, places=3)
+
+    def test_matches_colour_image(self):
+        self.assert_matches_separate_functions(self.colour_image)
+
+    def test_reuses_buffers_and_reallocates_on_resize(self):
+        self.kernel(self.random_image)
+        lab_buffer = self.kernel.lab
+        self.kernel(self.gray_image)
+        self.assertIs(self.kernel.lab, lab_buffer)
+
+        small = cv2.resize(self.random_image, (40, 30))
+        self.assert_matches_separate_functions(small)
+        self.assertIsNot(self.kernel.lab, lab_buffer)
+
+    def test_stage_output(self):
+        stage = FusedMetricsStage()
+        for image in [self.random_image, self.gray_image]:
+            stage.update(image)
+        result = stage.result()
+        self.assertEqual(set(result), {"brightness", "chroma", "HS_colourfulness"})
+        self.assertEqual(len(result["brightness"]), 2)
+
+    def test_benchmark(self):
+        timings = benchmark_fused_metrics((36, 64, 3), num_frames=2)
+        self.assertGreater(timings['separate'], 0)
+        self.assertGreater(timings['fused'], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import os
+import unittest
+import numpy as np
+import pandas as pd
+from sklearn.metrics import adjusted_rand_score
+from tempfile import TemporaryDirectory
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'clustering')))
+
+import corpus_index
+from incremental_clustering import *
+from test_corpus_index import make_video_folder
+
+
+def write_index(root, features, start=0):
+    rows = [dict(zip(FEATURE_COLUMNS, row), video_label=f"video_{start + i}", num_frames=100, source_mtime_ns=1)
+            for i, row in enumerate(features)]
+    index = corpus_index.read_index(root)
+    new_rows = pd.DataFrame(rows, columns=corpus_index.INDEX_COLUMNS)
+    corpus_index.write_index(root, new_rows if index.empty else pd.concat([index, new_rows]))
+
+
+class TestIncrementalClustering(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.root = self.tmp.name
+        self.output_path = os.path.join(self.root, CLUSTERS_FILENAME)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_methods_recover_synthetic_clusters(self):
+        features, truth = synthetic_features(3000, n_clusters=3)
+        for method in METHODS:
+            fitted = fit_clusters(features, 3, method, batch_size=500)
+            labels = assign_clusters(fitted, features)
+            self.assertEqual(sorted(set(labels)), [1, 2, 3])
+            self.assertGreater(adjusted_rand_score(truth, labels), 0.9, method)
+
+    def test_benchmark_compares_with_ward(self):
+        results = benchmark(sizes=(500,), n_clusters=3)
+        self.assertEqual([row["method"] for row in results], ["ward"] + list(METHODS))
+        for row in results:
+            self.assertGreater(row["ari_vs_ward"], 0.9)
+
+    def test_fit_then_assign_new_videos(self):
+        features, _ = synthetic_features(200, n_clusters=2)
+        features[0, 0] = np.nan  # Incomplete videos are left out
+        write_index(self.root, features[:150])
+        table = fit_corpus(self.root, n_clusters=2, output_path=self.output_path)
+        self.assertEqual(len(table), 149)
+        self.assertEqual(list(table.columns), ["video_label", "cluster", "avg_brightness", "avg_colourfulness",
+                                               "norm_optical_flow", "norm_cuts_per_min", "norm_short_cut_percent"])
+        self.assertAlmostEqual(table["norm_cuts_per_min"].max(), 1.0)
+
+        fitted = load_model(os.path.join(self.root, MODEL_FILENAME))
+        write_index(self.root, features[150:], start=150)
+        added = assign_new_videos(self.root, output_path=self.output_path)
+        self.assertEqual(added["video_label"].tolist(), [f"video_{i}" for i in range(150, 200)])
+        np.testing.assert_array_equal(added["cluster"], assign_clusters(fitted, features[150:]))
+
+        table = pd.read_csv(self.output_path)
+        self.assertEqual(len(table), 199)
+        self.assertEqual(len(assign_new_videos(self.root, output_path=self.output_path)), 0)
+
+    def test_refresh_picks_up_unindexed_folders(self):
+        for i, brightness in enumerate((10.0, 200.0)):
+            make_video_folder(self.root, f"video_{i}", brightness, cuts_per_min=5.0 + 20 * i)
+        fit_corpus(self.root, n_clusters=2, output_path=self.output_path)
+        # Processed outside run.py/batch.py, so the index does not know about them yet
+        for i, brightness in enumerate((20.0, 190.0), start=2):
+            make_video_folder(self.root, f"video_{i}", brightness, cuts_per_min=5.0 + 20 * (i - 2))
+        self.assertEqual(len(assign_new_videos(self.root, output_path=self.output_path)), 0)
+        added = assign_new_videos(self.root, output_path=self.output_path, refresh=True)
+        self.assertEqual(added["video_label"].tolist(), ["video_2", "video_3"])
+
+
+if __name__ == "__main__":
+    unittest.main()
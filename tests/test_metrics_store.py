@@ -0,0 +1,111 @@
+import os
+import csv
+import unittest
+import numpy as np
+from tempfile import TemporaryDirectory
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from metrics_store import *
+
+
+def write_legacy_csv(folder, metric_name, values, num_frames):
+    """The one-row-wide layout of run.py's save_metrics_to_csv."""
+    with open(os.path.join(folder, f"{metric_name}.csv"), 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['frame'] + [f'frame_{i+1}' for i in range(num_frames)])
+        writer.writerow([metric_name] + list(values))
+
+
+class TestMetricsStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.folder = self.tmp.name
+        rng = np.random.default_rng(0)
+        self.metrics = {
+            "brightness": rng.uniform(0, 255, 500),
+            "HS_colourfulness": rng.uniform(0, 1, 500),
+            "optical_flow_magnitude": rng.uniform(0, 5, 499),
+        }
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip_and_mmap(self):
+        path = save_metrics(self.folder, self.metrics, num_frames=500)
+        metrics = load_metrics(path)
+        self.assertEqual(metrics["num_frames"], 500)
+        for name, values in self.metrics.items():
+            self.assertIsInstance(metrics[name], np.memmap)
+            np.testing.assert_array_equal(metrics[name], values)
+        self.assertEqual(sorted(metric_names(path)), sorted(self.metrics))
+
+        # Still a plain .npz
+        with np.load(path) as data:
+            np.testing.assert_array_equal(data["brightness"], self.metrics["brightness"])
+
+    def test_selective_loading(self):
+        save_metrics(self.folder, self.metrics)
+        metrics = load_metrics(self.folder, columns=["brightness", "missing"])
+        self.assertEqual(sorted(metrics), ["brightness", "num_frames"])
+        self.assertEqual(metrics["num_frames"], 500)
+        unmapped = load_metrics(self.folder, columns=["brightness"], mmap=False)
+        self.assertNotIsInstance(unmapped["brightness"], np.memmap)
+
+    def test_csv_export_matches_legacy_layout(self):
+        legacy = os.path.join(self.folder, "legacy")
+        exported = os.path.join(self.folder, "exported")
+        os.makedirs(legacy)
+        for name, values in self.metrics.items():
+            write_legacy_csv(legacy, name, values.tolist(), 500)
+
+        save_metrics(self.folder, self.metrics, num_frames=500)
+        export_metrics_csv(self.folder, exported)
+        for name in self.metrics:
+            with open(os.path.join(legacy, f"{name}.csv")) as a, open(os.path.join(exported, f"{name}.csv")) as b:
+                self.assertEqual(a.read(), b.read())
+
+    def test_read_flat_csv(self):
+        write_legacy_csv(self.folder, "brightness", self.metrics["brightness"].tolist(), 500)
+        name, values, num_frames = read_flat_csv(os.path.join(self.folder, "brightness.csv"))
+        self.assertEqual((name, num_frames), ("brightness", 500))
+        np.testing.assert_array_equal(values, self.metrics["brightness"])
+
+    def test_scene_boundaries(self):
+        boundaries = scenes_to_boundaries([[0, 9], [10, 24], [25, 29]], 30)
+        self.assertEqual(np.flatnonzero(boundaries).tolist(), [10, 25])
+        self.assertEqual(boundaries.dtype, np.int8)
+
+    def test_strided_scene_boundaries(self):
+        # 100 source frames kept every 2nd: cuts map to the first kept frame at or after them
+        boundaries = scenes_to_boundaries([[0, 59], [60, 90], [91, 99]], 50, stride=2)
+        self.assertEqual(np.flatnonzero(boundaries).tolist(), [30, 46])
+        path = save_metrics(self.folder, {"shot_boundary": boundaries}, stride=2)
+        metrics = load_metrics(path)
+        self.assertEqual((metrics["num_frames"], metrics["stride"]), (50, 2))
+        self.assertEqual(metric_names(path), ["shot_boundary"])
+        self.assertNotIn("stride", load_metrics(save_metrics(self.folder, self.metrics)))
+
+    def test_convert_processed_videos(self):
+        video_folder = os.path.join(self.folder, "processed_videos", "video_1")
+        os.makedirs(video_folder)
+        os.makedirs(os.path.join(self.folder, "processed_videos", "empty"))
+        for name, values in self.metrics.items():
+            write_legacy_csv(video_folder, name, values.tolist(), 500)
+        with open(os.path.join(video_folder, "predicted_scenes.csv"), "w") as f:
+            f.write("start_frame,end_frame\n0,199\n200,499\n")
+
+        written = convert_processed_videos(os.path.join(self.folder, "processed_videos"))
+        self.assertEqual(written, [os.path.join(video_folder, METRICS_FILENAME)])
+        metrics = load_metrics(video_folder)
+        self.assertEqual(metrics["num_frames"], 500)
+        np.testing.assert_array_equal(metrics["optical_flow_magnitude"], self.metrics["optical_flow_magnitude"])
+        self.assertEqual(np.flatnonzero(metrics["shot_boundary"]).tolist(), [200])
+
+        # Existing files are kept unless asked to overwrite
+        self.assertEqual(convert_processed_videos(os.path.join(self.folder, "processed_videos")), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import os
+import unittest
+import numpy as np
+import cv2
+from tempfile import TemporaryDirectory
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from motion_clustering import *
+from flow_store import FlowStoreWriter, FlowStore
+
+
+def make_fields(blocks, shape=(60, 80)):
+    """Builds magnitude/angle fields with uniform motion inside each (x0, y0, x1, y1, magnitude, angle) block."""
+    magnitude = np.zeros(shape, dtype=np.float32)
+    angle = np.zeros(shape, dtype=np.float32)
+    for x0, y0, x1, y1, mag, ang in blocks:
+        magnitude[y0:y1, x0:x1] = mag
+        angle[y0:y1, x0:x1] = ang
+    return magnitude, angle
+
+
+class TestMotionClustering(unittest.TestCase):
+
+    def test_two_separate_objects(self):
+        magnitude, angle = make_fields([(5, 5, 15, 15, 2.0, 0.0), (50, 30, 65, 45, 3.0, 1.0)])
+        labels, points = detect_objects_fast(magnitude, angle, min_magnitude=0.5)
+        self.assertEqual(points.shape, (100 + 225, 4))
+        self.assertEqual(len(set(labels)), 2)
+        self.assertNotIn(-1, labels)
+
+    def test_touching_objects_split_by_direction(self):
+        magnitude, angle = make_fields([(10, 10, 20, 30, 2.0, 0.0), (20, 10, 30, 30, 2.0, np.pi)])
+        labels, _ = detect_objects_fast(magnitude, angle, min_magnitude=0.5)
+        self.assertEqual(len(set(labels)), 2)
+
+    def test_touching_similar_directions_merge(self):
+        magnitude, angle = make_fields([(10, 10, 20, 30, 2.0, 0.7), (20, 10, 30, 30, 2.0, 0.9)])
+        labels, _ = detect_objects_fast(magnitude, angle, min_magnitude=0.5)
+        self.assertEqual(len(set(labels)), 1)
+
+    def test_small_components_are_noise(self):
+        magnitude, angle = make_fields([(5, 5, 15, 15, 2.0, 0.0), (40, 40, 42, 42, 2.0, 0.0)])
+        labels, points = detect_objects_fast(magnitude, angle, min_magnitude=0.5, min_area=10)
+        noise = points[labels == -1]
+        self.assertEqual(len(noise), 4)
+        self.assertTrue(np.all(noise[:, 0] >= 40))
+
+    def test_grid_and_dbscan_methods(self):
+        magnitude, angle = make_fields([(4, 4, 20, 20, 2.0, 0.0), (48, 32, 72, 56, 3.0, 2.0)])
+        for method in ["grid", "dbscan"]:
+            labels, points = detect_objects_fast(magnitude, angle, min_magnitude=0.5, method=method, grid_size=4)
+            self.assertEqual(len(set(labels) - {-1}), 2)
+            self.assertEqual(points.shape[1], 4)
+            self.assertLess(len(points), 16 * 16 + 24 * 24)
+
+    def test_empty_input(self):
+        magnitude = np.zeros((10, 10), dtype=np.float32)
+        labels, clustered_points = detect_objects_fast(magnitude, magnitude)
+        self.assertEqual(len(labels), 0)
+        self.assertEqual(len(clustered_points), 0)
+
+    def test_unknown_method(self):
+        with self.assertRaises(ValueError):
+            detect_objects_fast(np.zeros((4, 4)), np.zeros((4, 4)), method="kmeans")
+
+    def test_motion_data_to_fields(self):
+        motion_data = np.array([[1, 2, 0.5, 1.0], [3, 0, 2.0, 3.0]])
+        magnitude_2d, angle_2d = motion_data_to_fields(motion_data)
+        self.assertEqual(magnitude_2d.shape, (3, 4))
+        self.assertEqual(magnitude_2d[2, 1], 0.5)
+        self.assertEqual(angle_2d[0, 3], 3.0)
+
+        flow = np.zeros((5, 6, 2), dtype=np.float32)
+        flow[..., 0] = 3
+        flow[..., 1] = 4
+        magnitude_2d, _ = motion_data_to_fields(flow)
+        np.testing.assert_allclose(magnitude_2d, 5.0, rtol=1e-5)
+
+    def test_run_optical_flow_object_detection_with_flow_store(self):
+        with TemporaryDirectory() as tmp:
+            input_dir = os.path.join(tmp, "frames")
+            output_dir = os.path.join(tmp, "clusters")
+            os.makedirs(input_dir)
+            for i in range(3):
+                cv2.imwrite(os.path.join(input_dir, f"frame_{i + 1:04d}.png"), np.zeros((40, 40, 3), dtype=np.uint8))
+
+            store_path = os.path.join(tmp, "store")
+            with FlowStoreWriter(store_path, downsample=2) as writer:
+                for i in range(1, 3):
+                    flow = np.zeros((40, 40, 2), dtype=np.float32)
+                    flow[10:30, 10:30, 0] = 2.0
+                    writer.append(f"frame_{i}", flow)
+            store = FlowStore(store_path)
+
+            run_optical_flow_object_detection(input_dir, output_dir, store, min_magnitude=0.5)
+            self.assertEqual(sorted(os.listdir(output_dir)), ["clustered_0001.jpg", "clustered_0002.jpg"])
+
+
+if __name__ == "__main__":
+    unittest.main()
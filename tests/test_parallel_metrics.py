@@ -0,0 +1,65 @@
+import os
+import unittest
+import numpy as np
+import cv2
+from tempfile import TemporaryDirectory
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from wisper import brightness_processing
+from parallel_metrics import *
+
+
+class TestParallelMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        rng = np.random.default_rng(3)
+        self.frames = [rng.integers(0, 256, (24, 32, 3), dtype=np.uint8) for _ in range(11)]
+        for i, frame in enumerate(self.frames):
+            cv2.imwrite(os.path.join(self.tmp.name, f"frame_{i:04d}.png"), frame)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_split_into_chunks(self):
+        items = list(range(10))
+        chunks = split_into_chunks(items, 3)
+        self.assertEqual([x for chunk in chunks for x in chunk], items)
+        self.assertEqual(len(chunks), 3)
+
+    def test_split_into_chunks_overlap(self):
+        chunks = split_into_chunks(list(range(10)), 4, overlap=1)
+        pairs = [(chunk[i], chunk[i + 1]) for chunk in chunks for i in range(len(chunk) - 1)]
+        self.assertEqual(pairs, [(i, i + 1) for i in range(9)])
+
+    def test_split_into_chunks_too_few_items(self):
+        self.assertEqual(split_into_chunks([1], 4, overlap=1), [])
+        self.assertEqual(len(split_into_chunks([1, 2], 4)), 2)
+
+    def test_get_brightness_list_parallel_matches_serial(self):
+        serial = get_brightness_list(self.tmp.name, workers=1)
+        parallel = get_brightness_list(self.tmp.name, workers=3)
+        self.assertEqual(serial, parallel)
+        expected = [brightness_processing.calculate_frame_brightness(f) for f in self.frames]
+        self.assertEqual(serial, expected)
+
+    def test_get_brightness_diff_list_parallel_matches_serial(self):
+        serial = get_brightness_diff_list(self.tmp.name, workers=1)
+        parallel = get_brightness_diff_list(self.tmp.name, workers=4)
+        self.assertEqual(len(serial), len(self.frames) - 1)
+        self.assertEqual(serial, parallel)
+
+    def test_process_frames_parallel_matches_serial(self):
+        serial = process_frames(self.tmp.name, workers=1)
+        parallel = process_frames(self.tmp.name, workers=2)
+        self.assertEqual(serial, parallel)
+        self.assertEqual(len(serial['average_chroma']), len(self.frames))
+
+    def test_invalid_workers(self):
+        with self.assertRaises(ValueError):
+            get_brightness_list(self.tmp.name, workers=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import os
+import unittest
+from tempfile import TemporaryDirectory
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from playback import *
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestPlaybackClock(unittest.TestCase):
+
+    def setUp(self):
+        self.time = FakeClock()
+        self.clock = PlaybackClock(10, fps=10, clock=self.time)
+
+    def test_real_time_with_dropped_frames(self):
+        self.assertIsNone(self.clock.tick())  # Not started
+        self.clock.start(3)
+        self.assertEqual(self.clock.tick(), 3)
+        self.assertIsNone(self.clock.tick())  # Same frame is not due twice
+        self.assertAlmostEqual(self.clock.seconds_until_next(), 0.1)
+
+        self.time.now += 0.1
+        self.assertEqual(self.clock.tick(), 4)
+        self.assertEqual(self.clock.dropped, 0)
+
+        # A slow render: 0.35s later the clock has moved on 3 frames, two of them dropped
+        self.time.now += 0.35
+        self.assertEqual(self.clock.tick(), 7)
+        self.assertEqual(self.clock.dropped, 2)
+        self.assertAlmostEqual(self.clock.seconds_until_next(), 0.05)
+
+    def test_loops_at_the_end(self):
+        self.clock.start(8)
+        frames = []
+        for _ in range(5):
+            frames.append(self.clock.tick())
+            self.time.now += 0.1
+        self.assertEqual(frames, [8, 9, 0, 1, 2])
+        self.assertEqual(self.clock.dropped, 0)
+
+    def test_seek_continues_after_the_frame_on_screen(self):
+        self.clock.start(0)
+        self.clock.tick()
+        self.clock.seek(5)
+        self.assertIsNone(self.clock.tick())
+        self.time.now += 0.1
+        self.assertEqual(self.clock.tick(), 6)
+
+    def test_render_counters(self):
+        self.clock.record_render(0.010)
+        self.clock.record_render(0.030)
+        self.assertAlmostEqual(self.clock.render_ms, 12.0)
+        self.assertAlmostEqual(self.clock.max_render_ms, 30.0)
+        self.assertEqual(self.clock.rendered, 2)
+        self.assertIn("dropped 0 of 2", self.clock.status_text())
+
+
+class TestPanelFolders(unittest.TestCase):
+
+    def test_panel_order(self):
+        from visualisation import panel_folders
+        with TemporaryDirectory() as folder:
+            for name, num_frames in [("clip_brightness_diff", 2), ("clip_flow_store", 0), ("clip_raw", 3),
+                                     ("clip_optical_flow_clustering", 2), ("clip_optical_flow", 2),
+                                     ("extra", 1)]:
+                os.makedirs(os.path.join(folder, name))
+                for i in range(num_frames):
+                    open(os.path.join(folder, name, f"frame_{i}.png"), "w").close()
+
+            panels = panel_folders(folder)
+            self.assertEqual([os.path.basename(path) for path, _ in panels],
+                             ["clip_raw", "clip_optical_flow", "clip_brightness_diff", "clip_optical_flow_clustering"])
+            self.assertEqual(len(panels[0][1]), 3)
+            self.assertEqual(len(panel_folders(folder, max_panels=6)), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import os
+import argparse
+import unittest
+import numpy as np
+from tempfile import TemporaryDirectory
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from run import *
+import metrics_store
+
+
+def pipeline_args(*argv):
+    parser = argparse.ArgumentParser()
+    add_pipeline_arguments(parser)
+    return parser.parse_args(list(argv))
+
+
+class TestBuildStages(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.folder = os.path.join(self.tmp.name, "clip")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def stages(self, *argv):
+        stages = build_stages(pipeline_args(*argv), "clip.avi", self.folder, "clip")
+        return {stage.name: stage for stage in stages}
+
+    def test_dense_flow_engine_uses_flow_store(self):
+        stage = self.stages()["optical_flow"]
+        store_path = self.folder + "/clip_flow_store"
+        self.assertEqual(stage.kwargs["store_path"], store_path)
+        self.assertIn(store_path, stage.outputs)
+
+    def test_sparse_flow_engine_has_no_flow_store(self):
+        stages = self.stages("--flow-engine", "lk")
+        stage = stages["optical_flow"]
+        self.assertNotIn("store_path", stage.kwargs)
+        self.assertEqual(stage.outputs, [self.folder + "/clip_optical_flow"])
+        self.assertIn("motion_clustering", stages)
+
+    def test_frame_workers_reach_metric_and_flow_stages(self):
+        stages = self.stages("--frame-workers", "3")
+        for name in ("colour_metrics", "brightness", "optical_flow"):
+            self.assertEqual(stages[name].kwargs["workers"], 3)
+        self.assertFalse(any("workers" in stage.kwargs for stage in self.stages().values()))
+
+    def test_export_stride_reaches_metrics_file(self):
+        self.assertEqual(self.stages("--export-stride", "2")["metrics_file"].kwargs, {"stride": 2})
+        self.assertEqual(self.stages()["metrics_file"].kwargs, {})
+
+
+class TestSaveMetricsFile(unittest.TestCase):
+
+    def test_strided_shot_boundaries(self):
+        with TemporaryDirectory() as folder:
+            scenes_path = os.path.join(folder, "predicted_scenes.csv")
+            with open(scenes_path, "w") as f:
+                f.write("start,end\n0,59\n60,99\n")  # Source video frames
+            save_metrics_file(folder, scenes_path, {"brightness": np.arange(50.0)}, stride=2)
+            metrics = metrics_store.load_metrics(folder)
+            self.assertEqual(np.flatnonzero(metrics["shot_boundary"]).tolist(), [30])
+            self.assertEqual((metrics["num_frames"], metrics["stride"]), (50, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
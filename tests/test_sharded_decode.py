@@ -0,0 +1,105 @@
+import os
+import unittest
+import numpy as np
+import cv2
+from tempfile import TemporaryDirectory
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sharded_decode import *
+from sharded_decode import _digest_chunk, _run_segment
+from frame_stream import iter_video_frames, iter_folder_frames
+import parallel_metrics
+import frame_export
+
+
+def write_test_video(path, num_frames=150, size=(64, 48), fourcc="MJPG"):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), 25, size)
+    rng = np.random.default_rng(1)
+    for i in range(num_frames):
+        frame = rng.integers(0, 256, (size[1], size[0], 3), dtype=np.uint8)
+        cv2.putText(frame, str(i), (4, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
+        writer.write(frame)
+    writer.release()
+
+
+class OffByOneSegment(VideoSegment):
+    """A segment whose seek lands one frame early, as some codecs do."""
+
+    def _seek(self, cap, frame_index):
+        if self.exact:
+            return super()._seek(cap, frame_index)
+        return cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index - 1)
+
+
+class TestPlanSegments(unittest.TestCase):
+
+    def test_segments_cover_the_video(self):
+        self.assertEqual(plan_segments(100, 4, min_frames=10), [(0, 25), (25, 50), (50, 75), (75, None)])
+        self.assertEqual(plan_segments(100, 4), [(0, 34), (34, 67), (67, None)])  # At least 32 frames each
+        self.assertEqual(plan_segments(0, 4), [(0, None)])
+
+    def test_starts_align_with_stride(self):
+        segments = plan_segments(100, 3, stride=3, min_frames=5)
+        self.assertTrue(all(start % 3 == 0 for start, _ in segments))
+        self.assertEqual(segments[0][0], 0)
+
+
+class TestShardedDecode(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.video = os.path.join(self.tmp.name, "clip.avi")
+        write_test_video(self.video)
+        self.serial = [frame_digest(frame) for frame in iter_video_frames(self.video)]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_matches_serial_decode(self):
+        for workers, stride in [(1, 1), (3, 1), (4, 2), (2, 3)]:
+            with self.subTest(workers=workers, stride=stride):
+                digests = map_video_segments(_digest_chunk, self.video, workers, stride=stride)
+                self.assertEqual(digests, self.serial[::stride])
+
+    def test_verify_report(self):
+        report = verify_sharded_decode(self.video, workers=4)
+        self.assertEqual(report["serial_frames"], 150)
+        self.assertEqual(report["sharded_frames"], 150)
+        self.assertEqual(len(report["segments"]), 4)
+        self.assertEqual(report["mismatched_frames"], [])
+        self.assertEqual(report["inaccurate_seeks"], [])
+
+    def test_overlap_keeps_pairs_across_seams(self):
+        serial = parallel_metrics.get_brightness_diff_list(self.video)
+        sharded = parallel_metrics.get_brightness_diff_list(self.video, workers=3)
+        self.assertEqual(len(sharded), 149)
+        np.testing.assert_allclose(sharded, serial)
+
+    def test_inaccurate_seek_is_redecoded(self):
+        segments = [OffByOneSegment(self.video, start, stop) for start, stop in plan_segments(150, 3)]
+        outcomes = [_run_segment(_digest_chunk, segment) for segment in segments]
+        shifted = [digest for results, _ in outcomes for digest in results]
+        self.assertNotEqual(shifted, self.serial)
+
+        outcomes, redecoded = verify_seams(_digest_chunk, outcomes)
+        self.assertEqual(redecoded, [50, 100])
+        self.assertEqual([digest for results, _ in outcomes for digest in results], self.serial)
+
+    def test_frame_count_past_the_end(self):
+        segments = [VideoSegment(self.video, 0, 150), VideoSegment(self.video, 150, None)]
+        outcomes, redecoded = verify_seams(_digest_chunk, [_run_segment(_digest_chunk, s) for s in segments])
+        self.assertEqual(redecoded, [])
+        self.assertEqual([d for results, _ in outcomes for d in results], self.serial)
+
+    def test_parallel_export(self):
+        save_dir = frame_export.export_frames(self.video, os.path.join(self.tmp.name, "frames"),
+                                              encoding="png", stride=2, decode_workers=2)
+        digests = [frame_digest(frame) for frame in iter_folder_frames(save_dir)]
+        self.assertEqual(digests, self.serial[::2])
+        with self.assertRaises(ValueError):
+            frame_export.export_frames(self.video, save_dir, container="archive", decode_workers=2)
+
+
+if __name__ == "__main__":
+    unittest.main()
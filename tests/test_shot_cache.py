@@ -0,0 +1,106 @@
+import os
+import csv
+import unittest
+import numpy as np
+from tempfile import TemporaryDirectory
+from unittest.mock import MagicMock, patch
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import shot_cache
+from shot_cache import *
+
+
+def fake_predict_raw(window):
+    """'Predicts' a cut wherever a frame is bright."""
+    brightness = window.mean(axis=(2, 3, 4)) / 255.0
+    return brightness[..., np.newaxis], (1 - brightness)[..., np.newaxis]
+
+
+def make_frames(num_frames, cut_every=40):
+    frames = np.full((num_frames, 54, 96, 3), 20, dtype=np.uint8)
+    frames[::cut_every] = 250
+    return frames
+
+
+class TestShotCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.cache_dir = os.path.join(self.tmp.name, "cache")
+        self.video_path = os.path.join(self.tmp.name, "video.mp4")
+        with open(self.video_path, "wb") as f:
+            f.write(b"not really a video")
+
+        self.model = MagicMock()
+        self.model.predict_raw.side_effect = fake_predict_raw
+        self.frames = make_frames(130)
+        shot_cache._model = None
+        shot_cache._scene_memo.clear()
+
+    def tearDown(self):
+        shot_cache._model = None
+        self.tmp.cleanup()
+
+    def patched(self):
+        load = patch("shot_cache.shot_streaming.load_transnet_model", return_value=self.model)
+        frames = patch("shot_cache.frame_stream.iter_video_frames", side_effect=lambda _: iter(self.frames))
+        return load, frames
+
+    def test_model_is_loaded_once(self):
+        with patch("shot_cache.shot_streaming.load_transnet_model", return_value=self.model) as load:
+            self.assertIs(get_model(), self.model)
+            self.assertIs(get_model(), self.model)
+        load.assert_called_once()
+
+    def test_predictions_to_scenes(self):
+        predictions = np.array([0.0, 0.1, 0.9, 0.2, 0.1, 0.8, 0.9, 0.0, 0.1])
+        np.testing.assert_array_equal(predictions_to_scenes(predictions), [[0, 2], [3, 5], [7, 8]])
+        np.testing.assert_array_equal(predictions_to_scenes(np.ones(4)), [[0, 3]])
+        self.assertEqual(predictions_to_scenes([]).shape, (0, 2))
+
+    def test_cache_hit_skips_inference(self):
+        load, frames = self.patched()
+        with load, frames as iter_frames:
+            first = get_single_frame_predictions(self.video_path, self.cache_dir)
+            calls = self.model.predict_raw.call_count
+            second = get_single_frame_predictions(self.video_path, self.cache_dir)
+            self.assertEqual(iter_frames.call_count, 1)
+        self.assertEqual(self.model.predict_raw.call_count, calls)
+        self.assertEqual(len(first), 130)
+        np.testing.assert_array_equal(first, second)
+        self.assertEqual(os.listdir(self.cache_dir), [f"{fast_video_hash(self.video_path)}.npz"])
+
+    def test_threshold_rederived_from_cache(self):
+        load, frames = self.patched()
+        with load, frames as iter_frames:
+            default = shot_prediction(self.video_path, 0.5, self.cache_dir)
+            strict = shot_prediction(self.video_path, 0.99, self.cache_dir)
+            self.assertEqual(iter_frames.call_count, 1)
+        self.assertEqual(len(default), 4)
+        self.assertLessEqual(len(strict), len(default))
+        self.assertEqual(get_number_of_cuts(self.video_path, 0.5, self.cache_dir), 4)
+
+    def test_stored_predictions_are_used(self):
+        store_predictions(self.video_path, [0.0, 0.0, 1.0, 0.0, 0.0], self.cache_dir)
+        with patch("shot_cache.shot_streaming.load_transnet_model") as load:
+            scenes = shot_prediction(self.video_path, cache_dir=self.cache_dir)
+        load.assert_not_called()
+        np.testing.assert_array_equal(scenes, [[0, 2], [3, 4]])
+
+    def test_save_pacing_to_csv(self):
+        store_predictions(self.video_path, [0.0, 0.0, 1.0, 0.0, 0.0], self.cache_dir)
+        save_path = os.path.join(self.tmp.name, "out")
+        save_pacing_to_csv(self.video_path, save_path, cache_dir=self.cache_dir)
+
+        with open(os.path.join(save_path, "pacing.csv")) as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(rows[0], ['num_cuts', 'cuts_per_min', 'frames_per_cut', 'inter_cut_time'])
+        self.assertEqual(int(rows[1][0]), 2)
+        self.assertAlmostEqual(float(rows[1][2]), 2.5)
+        with open(os.path.join(save_path, "predicted_scenes.csv")) as f:
+            self.assertEqual(list(csv.reader(f)), [["start_frame", "end_frame"], ["0", "2"], ["3", "4"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,179 @@
+import os
+import unittest
+import numpy as np
+from unittest.mock import MagicMock, patch
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from shot_streaming import *
+
+
+def fake_predict_raw(window):
+    """Stands in for TransNetV2.predict_raw: 'predicts' a cut wherever a frame is bright."""
+    assert window.shape == (1, 100, 27, 48, 3) and window.dtype == np.uint8
+    brightness = window.mean(axis=(2, 3, 4)) / 255.0
+    return brightness[..., np.newaxis], (1 - brightness)[..., np.newaxis]
+
+
+def reference_predict_frames(model, frames):
+    """The windowing of TransNetV2.predict_frames on a full in-memory tensor."""
+    no_padded_frames_start = 25
+    no_padded_frames_end = 25 + 50 - (len(frames) % 50 if len(frames) % 50 != 0 else 50)
+    padded_inputs = np.concatenate(
+        [frames[:1]] * no_padded_frames_start + [frames] + [frames[-1:]] * no_padded_frames_end, 0
+    )
+    predictions = []
+    ptr = 0
+    while ptr + 100 <= len(padded_inputs):
+        single, many = model.predict_raw(padded_inputs[ptr:ptr + 100][np.newaxis])
+        predictions.append((single[0, 25:75, 0], many[0, 25:75, 0]))
+        ptr += 50
+    single = np.concatenate([s for s, _ in predictions])
+    many = np.concatenate([m for _, m in predictions])
+    return single[:len(frames)], many[:len(frames)]
+
+
+def reference_predictions_to_scenes(predictions, threshold=0.5):
+    """TransNetV2.predictions_to_scenes."""
+    predictions = (predictions > threshold).astype(np.uint8)
+    scenes = []
+    t, t_prev, start = -1, 0, 0
+    for i, t in enumerate(predictions):
+        if t_prev == 1 and t == 0:
+            start = i
+        if t_prev == 0 and t == 1 and i != 0:
+            scenes.append([start, i])
+        t_prev = t
+    if t == 0:
+        scenes.append([start, i])
+    if len(scenes) == 0:
+        return np.array([[0, len(predictions) - 1]], dtype=np.int32)
+    return np.array(scenes, dtype=np.int32)
+
+
+def make_frames(num_frames, cut_every=37):
+    """BGR frames that are dark except for a bright frame at every cut."""
+    rng = np.random.default_rng(num_frames)
+    frames = rng.integers(0, 60, (num_frames, 54, 96, 3), dtype=np.uint8)
+    frames[::cut_every] = 250
+    return frames
+
+
+class TestShotStreaming(unittest.TestCase):
+
+    def setUp(self):
+        self.model = MagicMock()
+        self.model.predict_raw.side_effect = fake_predict_raw
+        self.model.predictions_to_scenes.side_effect = reference_predictions_to_scenes
+
+    def test_window_stitching_matches_full_video_path(self):
+        for num_frames in [1, 49, 50, 51, 100, 173, 250]:
+            frames = make_frames(num_frames)
+            small = np.stack([to_transnet_frame(f) for f in frames])
+            expected_single, expected_all = reference_predict_frames(self.model, small)
+
+            single, many = predict_frames_streaming(self.model, iter(frames))
+            self.assertEqual(len(single), num_frames)
+            np.testing.assert_array_equal(single, expected_single)
+            np.testing.assert_array_equal(many, expected_all)
+
+    def test_scenes_match_full_video_path(self):
+        frames = make_frames(260)
+        small = np.stack([to_transnet_frame(f) for f in frames])
+        expected = reference_predictions_to_scenes(reference_predict_frames(self.model, small)[0])
+
+        with patch("shot_streaming.frame_stream.iter_video_frames", return_value=iter(frames)):
+            scenes = shot_prediction_streaming("mock_video.mp4", model=self.model)
+        np.testing.assert_array_equal(scenes, expected)
+        self.assertGreater(len(scenes), 1)
+
+    def test_memory_is_one_window(self):
+        predictor = StreamingShotPredictor(self.model)
+        for frame in make_frames(500):
+            predictor.update(frame)
+            self.assertLess(predictor.buffered, 100)
+        self.assertEqual(predictor.buffer.shape[0], 100)
+
+    def test_empty_input(self):
+        single, many = predict_frames_streaming(self.model, iter([]))
+        self.assertEqual(len(single), 0)
+        self.model.predict_raw.assert_not_called()
+
+    def test_stage(self):
+        stage = ShotDetectionStage(self.model)
+        for frame in make_frames(60):
+            stage.update(frame)
+        self.assertEqual(len(stage.result()["shot_probability"]), 60)
+
+
+def fake_detector_raw(window):
+    """'Predicts' a cut wherever a frame differs from the frame 1 or 5 frames earlier in the window."""
+    frames = window[0].astype(np.float32)
+    score = np.zeros(len(frames), dtype=np.float32)
+    for k in (1, 5):
+        difference = np.abs(frames[k:] - frames[:-k]).mean(axis=(1, 2, 3)) / 255.0
+        score[k:] = np.maximum(score[k:], difference)
+    single = np.clip(score * 8, 0, 1)[np.newaxis, :, np.newaxis]
+    return single, single
+
+
+class TestShotPrefilter(unittest.TestCase):
+
+    def setUp(self):
+        self.model = MagicMock()
+        self.model.predict_raw.side_effect = fake_detector_raw
+
+    def test_no_cuts_lost_at_default_settings(self):
+        for seed in range(3):
+            frames, cut_frames = make_synthetic_cut_clip(seed=seed)
+            full, _ = predict_frames_streaming(self.model, iter(frames))
+            filtered, _, skipped_fraction = predict_frames_prefiltered(self.model, iter(frames))
+
+            # Every hard cut and the closing dissolve are found by the full model...
+            self.assertTrue(all(full[c] > 0.5 for c in cut_frames[:-1]))
+            self.assertTrue(np.any(full[cut_frames[-1]:cut_frames[-1] + 12] > 0.5))
+            # ...and by the pre-filtered one
+            np.testing.assert_array_equal(filtered > 0.5, full > 0.5)
+            self.assertGreater(skipped_fraction, 0.4)
+
+    def test_recall_report(self):
+        rows = prefilter_recall_report(self.model)
+        self.assertEqual(len(rows), 3)
+        for row in rows:
+            self.assertGreater(row['cut_frames'], 0)
+            self.assertEqual(row['recall'], 1.0)
+
+    def test_static_clip_skips_model(self):
+        frames, _ = make_synthetic_cut_clip(num_shots=1, shot_length=200)
+        single, _, skipped_fraction = predict_frames_prefiltered(self.model, iter(frames))
+        self.assertEqual(len(single), 200)
+        self.assertEqual(skipped_fraction, 1.0)
+        self.model.predict_raw.assert_not_called()
+
+    def test_candidate_regions_are_padded(self):
+        frames, cut_frames = make_synthetic_cut_clip(num_shots=2, shot_length=150, dissolve_length=0)
+        predictor = PrefilteredShotPredictor(self.model, padding=30)
+        for frame in frames:
+            predictor.update(frame)
+        predictor.finish()
+        self.assertEqual(len(predictor.regions), 1)
+        start, single, _ = predictor.regions[0]
+        self.assertEqual(start, cut_frames[0] - 30)
+        self.assertGreaterEqual(start + len(single), cut_frames[0] + 30 + 1)
+        self.assertEqual(predictor.skipped_frames, 300 - len(single))
+
+    def test_empty_input(self):
+        single, _, skipped_fraction = predict_frames_prefiltered(self.model, iter([]))
+        self.assertEqual(len(single), 0)
+        self.assertEqual(skipped_fraction, 0.0)
+
+    def test_stage(self):
+        stage = ShotDetectionStage(self.model, prefilter=True)
+        frames, _ = make_synthetic_cut_clip(num_shots=2, shot_length=60)
+        for frame in frames:
+            stage.update(frame)
+        self.assertEqual(len(stage.result()["shot_probability"]), 120)
+
+
+if __name__ == "__main__":
+    unittest.main()
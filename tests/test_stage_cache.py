@@ -0,0 +1,128 @@
+import os
+import time
+import unittest
+from tempfile import TemporaryDirectory
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from stage_cache import *
+
+
+class TestStageCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.folder = self.tmp.name
+        self.video_path = os.path.join(self.folder, "video.mp4")
+        with open(self.video_path, "wb") as f:
+            f.write(os.urandom(4 << 20))
+        self.calls = []
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_stage(self, name, value, deps=(), upstream=None):
+        """A stage that records its call, writes one file and returns value (+ upstream)."""
+        path = os.path.join(self.folder, f"{name}.txt")
+
+        def func(value, upstream=None):
+            self.calls.append(name)
+            with open(path, "w") as f:
+                f.write(str(value))
+            return value if upstream is None else value + upstream
+
+        kwargs = {"upstream": upstream} if upstream is not None else {}
+        return Stage(name, func, args=(value,), kwargs=kwargs, outputs=[path], deps=deps)
+
+    def pipeline(self, a=1, b=2, c=3):
+        return [
+            self.write_stage("a", a),
+            self.write_stage("b", b, upstream=StageRef("a")),
+            self.write_stage("c", c),
+        ]
+
+    def run_pipeline(self, **params):
+        return run_stages(self.pipeline(**params), StageCache(self.folder, self.video_path))
+
+    def test_fast_hash(self):
+        first = fast_video_hash(self.video_path)
+        self.assertEqual(first, fast_video_hash(self.video_path))
+        with open(self.video_path, "r+b") as f:
+            f.write(b"changed")
+        self.assertNotEqual(first, fast_video_hash(self.video_path))
+
+    def test_fast_hash_sees_same_size_edit_between_samples(self):
+        first = fast_video_hash(self.video_path)
+        stat = os.stat(self.video_path)
+        with open(self.video_path, "r+b") as f:
+            f.seek(100000)  # Between the first and second sampled blocks
+            f.write(b"changed")
+        os.utime(self.video_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+        self.assertNotEqual(first, fast_video_hash(self.video_path))
+
+    def test_path_spellings_share_a_key(self):
+        cwd = os.getcwd()
+        os.chdir(self.folder)
+        try:
+            params = [Stage("a", len, args=(path,)).params()
+                      for path in ("video.mp4", "./video.mp4", self.video_path)]
+        finally:
+            os.chdir(cwd)
+        self.assertEqual(params[0], params[1])
+        self.assertEqual(params[0], params[2])
+        self.assertEqual(Stage("a", len, args=("farneback",)).params()["args"], ["farneback"])
+
+    def test_rerun_skips_everything(self):
+        self.assertEqual(self.run_pipeline(), ["a", "b", "c"])
+        start = time.time()
+        self.assertEqual(self.run_pipeline(), [])
+        self.assertLess(time.time() - start, 1.0)
+        self.assertEqual(self.calls, ["a", "b", "c"])
+
+    def test_parameter_change_invalidates_downstream_only(self):
+        self.run_pipeline()
+        self.assertEqual(self.run_pipeline(a=10), ["a", "b"])
+        self.assertEqual(self.run_pipeline(a=10, c=4), ["c"])
+
+    def test_upstream_result_is_passed_and_loaded_from_cache(self):
+        self.run_pipeline()
+        cache = StageCache(self.folder, self.video_path)
+        run_stages(self.pipeline(b=5)[:2], cache)
+        self.assertEqual(cache.load_result("b"), 6)
+        self.assertEqual(self.calls, ["a", "b", "c", "b"])
+
+    def test_missing_output_reruns_stage(self):
+        self.run_pipeline()
+        os.remove(os.path.join(self.folder, "c.txt"))
+        self.assertEqual(self.run_pipeline(), ["c"])
+
+    def test_video_change_invalidates_everything(self):
+        self.run_pipeline()
+        with open(self.video_path, "ab") as f:
+            f.write(b"more")
+        self.assertEqual(self.run_pipeline(), ["a", "b", "c"])
+
+    def test_failed_stage_is_not_cached(self):
+        self.run_pipeline()
+
+        def fail(value):
+            raise RuntimeError("boom")
+
+        cache = StageCache(self.folder, self.video_path, versions={"lib": "2.0"})
+        with self.assertRaises(RuntimeError):
+            cache.run(Stage("a", fail, args=(1,), outputs=[]))
+        self.assertNotIn("a", StageCache(self.folder, self.video_path).manifest)
+
+    def test_disabled_cache_reruns(self):
+        self.run_pipeline()
+        cache = StageCache(self.folder, self.video_path, enabled=False)
+        self.assertEqual(run_stages(self.pipeline(), cache), ["a", "b", "c"])
+
+    def test_dependency_must_run_first(self):
+        cache = StageCache(self.folder, self.video_path)
+        with self.assertRaises(ValueError):
+            cache.run(self.pipeline()[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
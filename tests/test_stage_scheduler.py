@@ -0,0 +1,101 @@
+import os
+import time
+import json
+import unittest
+from tempfile import TemporaryDirectory
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from stage_cache import Stage, StageRef, StageCache
+from stage_scheduler import *
+
+
+def timed_stage(log_path, name, seconds, upstream=0):
+    """Sleeps, appends its (start, end) to log_path and returns upstream + 1."""
+    start = time.time()
+    time.sleep(seconds)
+    with open(log_path, "a") as f:
+        f.write(json.dumps([name, start, time.time()]) + "\n")
+    return upstream + 1
+
+
+def failing_stage():
+    raise RuntimeError("boom")
+
+
+class TestStageScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.folder = self.tmp.name
+        self.log_path = os.path.join(self.folder, "log.jsonl")
+        self.video_path = os.path.join(self.folder, "video.mp4")
+        with open(self.video_path, "wb") as f:
+            f.write(b"video")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def cache(self, enabled=True):
+        return StageCache(self.folder, self.video_path, enabled=enabled)
+
+    def stage(self, name, seconds=0.0, upstream=None, deps=()):
+        kwargs = {"upstream": StageRef(upstream)} if upstream else {}
+        return Stage(name, timed_stage, args=(self.log_path, name, seconds), kwargs=kwargs, deps=deps)
+
+    def intervals(self):
+        with open(self.log_path) as f:
+            return [json.loads(line) for line in f]
+
+    def test_select_stages_pulls_in_dependencies(self):
+        stages = [self.stage("a"), self.stage("b", upstream="a"), self.stage("c"), self.stage("d", deps=["b"])]
+        self.assertEqual([s.name for s in select_stages(stages, ["d"])], ["a", "b", "d"])
+        self.assertEqual([s.name for s in select_stages(stages)], ["a", "b", "c", "d"])
+        with self.assertRaises(ValueError):
+            select_stages(stages, ["missing"])
+        with self.assertRaises(ValueError):
+            select_stages(stages + [self.stage("a")])
+        with self.assertRaises(ValueError):
+            select_stages([self.stage("e", deps=["missing"])])
+
+    def test_independent_stages_run_concurrently(self):
+        stages = [self.stage("a", 0.5), self.stage("b", 0.5), self.stage("c", upstream="a")]
+        start = time.time()
+        status = run_stage_graph(stages, self.cache(), workers=2)
+        self.assertLess(time.time() - start, 0.95)
+        self.assertEqual(status, {"a": "ran", "b": "ran", "c": "ran"})
+        self.assertEqual(self.cache().load_result("c"), 2)
+
+    def test_concurrency_limit(self):
+        stages = [self.stage(name, 0.2) for name in "abcde"]
+        run_stage_graph(stages, self.cache(), workers=2)
+        intervals = self.intervals()
+        for _, start, _ in intervals:
+            running = sum(1 for _, s, e in intervals if s <= start < e)
+            self.assertLessEqual(running, 2)
+
+    def test_failure_only_skips_downstream(self):
+        for workers in (1, 2):
+            stages = [
+                Stage("broken", failing_stage),
+                self.stage("after_broken", deps=["broken"]),
+                self.stage("after_after", upstream="after_broken"),
+                self.stage("independent", 0.1),
+            ]
+            status = run_stage_graph(stages, self.cache(enabled=False), workers=workers)
+            self.assertEqual(status, {"broken": "failed", "after_broken": "skipped",
+                                      "after_after": "skipped", "independent": "ran"})
+
+    def test_rerun_is_cached(self):
+        stages = [self.stage("a"), self.stage("b", upstream="a")]
+        run_stage_graph(stages, self.cache(), workers=2)
+        self.assertEqual(run_stage_graph(stages, self.cache(), workers=2), {"a": "cached", "b": "cached"})
+
+    def test_dependency_cycle(self):
+        stages = [self.stage("a", deps=["b"]), self.stage("b", deps=["a"])]
+        with self.assertRaises(ValueError):
+            run_stage_graph(stages, self.cache())
+
+
+if __name__ == "__main__":
+    unittest.main()
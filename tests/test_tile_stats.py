@@ -0,0 +1,109 @@
+import os
+import pickle
+import argparse
+import unittest
+import numpy as np
+import cv2
+from tempfile import TemporaryDirectory
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from tile_stats import *
+from fused_metrics import FusedFrameMetrics
+from frame_stream import run_metric_stream
+
+
+def channel_planes(frame):
+    """Every channel of CHANNELS computed directly, as float64 (H, W) planes."""
+    lab = cv2.cvtColor(frame, cv2.COLOR_BGR2LAB).astype(np.float64)
+    a, b = lab[..., 1] - 128, lab[..., 2] - 128
+    blue, green, red = [c.astype(np.float64) for c in cv2.split(frame)]
+    return {
+        "luma": cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY).astype(np.float64),
+        "L": lab[..., 0], "a": a, "b": b,
+        "chroma": np.sqrt(a ** 2 + b ** 2),
+        "rg": np.abs(red - green),
+        "yb": np.abs(0.5 * (red + green) - blue),
+    }
+
+
+class TestTileStats(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "tile_stats")
+        rng = np.random.default_rng(2)
+        self.frames = rng.integers(0, 256, (5, 30, 40, 3), dtype=np.uint8)
+        with TileStatsWriter(self.path, grid=(3, 4)) as writer:
+            for frame in self.frames:
+                writer.append(frame)
+        self.store = TileStats(self.path)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_tile_aligned_regions_are_exact(self):
+        # 30 x 40 pixels in 3 x 4 tiles of 10 x 10: the top third and the right half are tile aligned
+        for region, rows, cols in [((0, 0, 1, 1), slice(0, 30), slice(0, 40)),
+                                   ((0, 0, 1 / 3, 1), slice(0, 10), slice(0, 40)),
+                                   ((1 / 3, 0.5, 1, 1), slice(10, 30), slice(20, 40))]:
+            for channel in CHANNELS:
+                with self.subTest(region=region, channel=channel):
+                    means, variances = self.store.region_stats(channel, region)
+                    planes = [channel_planes(frame)[channel][rows, cols] for frame in self.frames]
+                    np.testing.assert_allclose(means, [p.mean() for p in planes], rtol=1e-5, atol=1e-4)
+                    np.testing.assert_allclose(variances, [p.var() for p in planes], rtol=1e-4, atol=1e-3)
+
+    def test_whole_frame_matches_frame_metrics(self):
+        kernel = FusedFrameMetrics()
+        expected = [kernel(frame) for frame in self.frames]
+        np.testing.assert_allclose(self.store.region_brightness((0, 0, 1, 1)),
+                                   [m["brightness"] for m in expected], rtol=1e-6)
+        np.testing.assert_allclose(self.store.region_chroma((0, 0, 1, 1)),
+                                   [m["average_chroma"] for m in expected], rtol=1e-5)
+        np.testing.assert_allclose(self.store.region_colourfulness((0, 0, 1, 1)),
+                                   [m["colorfulness"] for m in expected], rtol=1e-4)
+
+    def test_region_inside_tiles(self):
+        # Each tile is uniform, so regions that cut through tiles are exact as well
+        frame = np.zeros((30, 40, 3), dtype=np.uint8)
+        frame[:10] = 200  # Top row of tiles bright
+        path = os.path.join(self.tmp.name, "uniform")
+        with TileStatsWriter(path, grid=(3, 4)) as writer:
+            writer.append(frame)
+        store = TileStats(path)
+        luma = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY).astype(np.float64)
+        mean, _ = store.region_stats("luma", (0, 0, 0.5, 1), frames=0)
+        self.assertAlmostEqual(float(mean), luma[:15].mean(), places=4)
+        mean, variance = store.region_stats("luma", (0.25, 0.1, 0.75, 0.6), frames=0)
+        self.assertAlmostEqual(float(mean), luma[0, 0] * 2.5 / 15, places=4)  # Rows 7.5 to 22.5
+        self.assertGreater(float(variance), 0)
+
+    def test_frame_selection_and_tiles(self):
+        means, _ = self.store.region_stats("luma", (0, 0, 1, 1), frames=slice(1, 3))
+        self.assertEqual(means.shape, (2,))
+        tile_means, tile_variances = self.store.tiles("luma", 4)
+        self.assertEqual(tile_means.shape, (3, 4))
+        luma = channel_planes(self.frames[4])["luma"]
+        self.assertAlmostEqual(float(tile_means[2, 3]), luma[20:, 30:].mean(), places=3)
+        with self.assertRaises(ValueError):
+            self.store.region_stats("luma", (0.5, 0, 0.5, 1))
+        with self.assertRaises(ValueError):
+            self.store.region_stats("hue", (0, 0, 1, 1))
+
+    def test_store_pickles_and_stage(self):
+        store = pickle.loads(pickle.dumps(self.store))
+        self.assertEqual(len(store), 5)
+        path = os.path.join(self.tmp.name, "stage")
+        results = run_metric_stream(iter(self.frames), [TileStatsStage(path, grid=(3, 4))])
+        self.assertEqual(results, {"num_frames": 5})
+        np.testing.assert_array_equal(TileStats(path).means, self.store.means)
+
+    def test_parse_grid(self):
+        self.assertEqual(parse_grid("4x6"), (4, 6))
+        with self.assertRaises(argparse.ArgumentTypeError):
+            parse_grid("0x4")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+import os
+import unittest
+import numpy as np
+import matplotlib
+matplotlib.use("Agg")
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from timeline_lod import *
+
+
+class TestPyramid(unittest.TestCase):
+
+    def test_min_max_levels(self):
+        values = np.arange(10, dtype=float)
+        values[5] = np.nan
+        levels = build_minmax_pyramid(values, factor=4)
+        self.assertEqual([len(mins) for mins, _ in levels], [10, 3, 1])
+        mins, maxs = levels[1]
+        np.testing.assert_array_equal(mins, [0, 4, 8])
+        np.testing.assert_array_equal(maxs, [3, 7, 9])  # NaN and padding ignored
+        self.assertEqual((levels[2][0][0], levels[2][1][0]), (0, 9))
+
+    def test_level_selection_and_point_budget(self):
+        levels = build_minmax_pyramid(np.random.default_rng(0).normal(size=150_000))
+        self.assertEqual(level_for_range(500, 1000, len(levels)), 0)
+        self.assertEqual(level_for_range(150_000, 1000, len(levels)), 3)  # 64 frames per bucket <= 150/px
+        for start, end in [(0, 149_999), (1000, 9000), (70_000, 70_500)]:
+            level = level_for_range(end - start, 1000, len(levels))
+            x, y = level_polyline(levels, level, start, end)
+            self.assertLessEqual(len(x), 2 * 4 * 1000 + 4)
+            self.assertLessEqual(x[0], start + 4 ** level)
+            self.assertGreaterEqual(x[-1], end - 4 ** level)
+
+    def test_envelope_keeps_extremes(self):
+        values = np.zeros(100_000)
+        values[54_321] = 7.0  # A single-frame spike must survive decimation
+        levels = build_minmax_pyramid(values)
+        x, y = level_polyline(levels, 5, 0, 99_999)
+        self.assertEqual(y.max(), 7.0)
+
+
+class TestMetricTimeline(unittest.TestCase):
+
+    def setUp(self):
+        self.figure = Figure(figsize=(6, 1.5), dpi=100)
+        self.canvas = FigureCanvasAgg(self.figure)
+        self.ax = self.figure.add_subplot(111)
+        self.scheduled = []
+        self.timeline = MetricTimeline(self.ax, self.canvas, schedule=self.scheduled.append)
+        self.draws = 0
+        self.canvas.mpl_connect("draw_event", self.count_draw)
+        self.values = np.sin(np.arange(150_000) / 500.0)
+
+    def count_draw(self, event):
+        self.draws += 1
+
+    def test_draws_decimated_series(self):
+        self.timeline.set_metric("brightness", self.values)
+        self.canvas.draw()
+        x, _ = self.timeline.line.get_data()
+        self.assertLess(len(x), 8 * self.timeline.pixel_width() + 4)
+        self.assertEqual(self.ax.get_xlim(), (0, 149_999))
+
+    def test_playhead_moves_without_full_redraw(self):
+        self.timeline.set_metric("brightness", self.values)
+        self.canvas.draw()
+        draws = self.draws
+        for frame in (10, 5000, 149_999, 200_000):
+            self.timeline.set_playhead(frame)
+        self.assertEqual(self.draws, draws)
+        self.assertEqual(list(self.timeline.marker.get_data()[0]), [149_999])
+
+    def test_progressive_zoom(self):
+        self.timeline.set_metric("brightness", self.values)
+        self.canvas.draw()
+        coarse = self.timeline.drawn_level
+        self.timeline.set_view(1000, 1400)
+        self.assertEqual(self.timeline.drawn_level, 1)  # Preview one level coarser than needed
+        self.assertEqual(len(self.scheduled), 1)
+        self.scheduled.pop()()
+        self.assertEqual(self.timeline.drawn_level, 0)
+        self.assertGreater(coarse, 0)
+        self.assertEqual(self.ax.get_xlim(), (1000, 1400))
+
+        # A detail pass for an outdated view is dropped
+        self.timeline.reset_view()
+        self.timeline.set_view(2000, 2400)
+        self.timeline.set_view(0, 149_999, progressive=False)
+        self.scheduled.pop()()
+        self.assertEqual(self.ax.get_xlim(), (0, 149_999))
+        self.assertGreater(self.timeline.drawn_level, 0)
+
+    def test_zoom_around_center(self):
+        self.timeline.set_metric("brightness", self.values)
+        self.timeline.set_view(0, 1000, progressive=False)
+        self.timeline.zoom(500, 2.0)
+        self.assertEqual(self.timeline.view, (250, 750))
+        self.timeline.zoom(0, 0.001)
+        self.assertEqual(self.timeline.view, (0, 149_999))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,363 @@
+import os
+import sys
+import csv
+import json
+import argparse
+import cv2
+import numpy as np
+from tqdm import tqdm
+
+# Luminance as in brightness_processing, 8-bit CIELab (a and b centred on 0), the opponent channels
+# |R - G| and |(R + G) / 2 - B| of Hasler & Süsstrunk colourfulness, and Lab chroma
+CHANNELS = ("luma", "L", "a", "b", "rg", "chroma", "yb")
+DEFAULT_GRID = (8, 8)
+MEANS_FILENAME = "means.f32"
+VARIANCES_FILENAME = "variances.f32"
+
+
+def tile_edges(length, num_tiles):
+    """Pixel boundaries of num_tiles near-equal tiles along an axis of length pixels."""
+    if length < num_tiles:
+        raise ValueError(f"Cannot split {length} pixels into {num_tiles} tiles")
+    return np.linspace(0, length, num_tiles + 1).round().astype(np.int64)
+
+
+class FrameTileStats:
+    """
+    Per-tile mean and variance of every channel in CHANNELS over a grid of tiles.
+
+    cv2.integral2 gives the sum and sum-of-squares integral images of each channel plane, and
+    tile sums are read off them at the tile corners. Scratch buffers are allocated on the first
+    frame and reused for every following frame of the same size, as in fused_metrics.
+
+    Parameters:
+        grid (tuple): (rows, cols) of tiles.
+    """
+
+    def __init__(self, grid=DEFAULT_GRID):
+        self.grid = tuple(grid)
+        self.shape = None
+
+    def _allocate(self, shape):
+        h, w = shape[:2]
+        self.shape = shape
+        self.row_edges = tile_edges(h, self.grid[0])
+        self.col_edges = tile_edges(w, self.grid[1])
+        self.counts = np.outer(np.diff(self.row_edges), np.diff(self.col_edges)).astype(np.float64)[..., np.newaxis]
+        # Integer sums of uint8 planes are exact and faster, as long as they fit in 32 bits
+        self.integer_depth = cv2.CV_32S if h * w * 255 < 2 ** 31 else cv2.CV_64F
+
+        self.gray = np.empty((h, w), dtype=np.uint8)
+        self.lab = np.empty((h, w, 3), dtype=np.uint8)
+        self.lab_planes = [np.empty((h, w), dtype=np.uint8) for _ in range(3)]
+        self.bgr_planes = [np.empty((h, w), dtype=np.uint8) for _ in range(3)]
+        self.rg = np.empty((h, w), dtype=np.uint8)
+
+        self.a = np.empty((h, w), dtype=np.float32)
+        self.b = np.empty((h, w), dtype=np.float32)
+        self.chroma = np.empty((h, w), dtype=np.float32)
+        self.blue = np.empty((h, w), dtype=np.float32)
+        self.yb = np.empty((h, w), dtype=np.float32)
+        self.sums = np.empty((self.grid[0], self.grid[1], len(CHANNELS)), dtype=np.float64)
+        self.squares = np.empty_like(self.sums)
+
+    def _tile_sums(self, plane, k):
+        depth = self.integer_depth if plane.dtype == np.uint8 else cv2.CV_64F
+        # One plane at a time: OpenCV's integral of interleaved multi-channel images is much slower
+        total, squares = cv2.integral2(plane, sdepth=depth, sqdepth=cv2.CV_64F)
+        rows, cols = self.row_edges[:, np.newaxis], self.col_edges[np.newaxis, :]
+        for table, out in ((total, self.sums), (squares, self.squares)):
+            corners = table[rows, cols].astype(np.float64)
+            out[..., k] = corners[1:, 1:] - corners[:-1, 1:] - corners[1:, :-1] + corners[:-1, :-1]
+
+    def __call__(self, frame):
+        """
+        Args:
+            frame (ndarray): The frame in BGR format (uint8).
+
+        Returns:
+            tuple: (means, variances), float32 arrays of shape (rows, cols, len(CHANNELS)).
+        """
+        if frame.shape != self.shape:
+            self._allocate(frame.shape)
+
+        cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self.gray)
+        cv2.cvtColor(frame, cv2.COLOR_BGR2LAB, dst=self.lab)
+        lightness, a, b = cv2.split(self.lab, self.lab_planes)
+        blue, green, red = cv2.split(frame, self.bgr_planes)
+        cv2.absdiff(red, green, dst=self.rg)
+
+        np.subtract(a, 128.0, out=self.a)
+        np.subtract(b, 128.0, out=self.b)
+        cv2.magnitude(self.a, self.b, magnitude=self.chroma)
+        cv2.addWeighted(red, 0.5, green, 0.5, 0.0, dst=self.yb, dtype=cv2.CV_32F)
+        np.copyto(self.blue, blue)
+        cv2.absdiff(self.yb, self.blue, dst=self.yb)
+
+        for k, plane in enumerate((self.gray, lightness, a, b, self.rg, self.chroma, self.yb)):
+            self._tile_sums(plane, k)
+        means = self.sums / self.counts
+        variances = np.maximum(self.squares / self.counts - means ** 2, 0.0)
+        means[..., CHANNELS.index("a")] -= 128.0
+        means[..., CHANNELS.index("b")] -= 128.0
+        return means.astype(np.float32), variances.astype(np.float32)
+
+
+class TileStatsWriter:
+    """
+    Appends the tile statistics of each frame to a store: two flat float32 files of
+    (rows, cols, len(CHANNELS)) grids per frame, plus meta.json, written by close().
+
+    Args:
+        path (str): Directory of the store. Created if it does not exist.
+        grid (tuple): (rows, cols) of tiles.
+    """
+
+    def __init__(self, path, grid=DEFAULT_GRID):
+        self.path = path
+        self.kernel = FrameTileStats(grid)
+        self.num_frames = 0
+        os.makedirs(path, exist_ok=True)
+        meta_path = os.path.join(path, "meta.json")
+        if os.path.exists(meta_path):
+            os.remove(meta_path)  # The store is incomplete until close()
+        self.means_file = open(os.path.join(path, MEANS_FILENAME), "wb")
+        self.variances_file = open(os.path.join(path, VARIANCES_FILENAME), "wb")
+
+    def append(self, frame):
+        means, variances = self.kernel(frame)
+        self.means_file.write(means.tobytes())
+        self.variances_file.write(variances.tobytes())
+        self.num_frames += 1
+
+    def close(self):
+        """
+        Closes the data files and writes the index. Returns a TileStats reader.
+        """
+        self.means_file.close()
+        self.variances_file.close()
+        kernel = self.kernel
+        meta = {
+            "channels": list(CHANNELS),
+            "grid": list(kernel.grid),
+            "num_frames": self.num_frames,
+            "frame_shape": list(kernel.shape[:2]) if kernel.shape else None,
+            "row_edges": kernel.row_edges.tolist() if kernel.shape else None,
+            "col_edges": kernel.col_edges.tolist() if kernel.shape else None,
+        }
+        with open(os.path.join(self.path, "meta.json"), "w") as f:
+            json.dump(meta, f)
+        return TileStats(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class TileStats:
+    """
+    Read-only view of a store written by TileStatsWriter, answering region queries.
+
+    A region is (top, left, bottom, right) in fractions of the frame, e.g. (0, 0, 1/3, 1) for
+    the top third. Queries look up summed-area tables of the tile grid at the region corners, so
+    their cost per frame does not depend on the region size or the frame resolution. Regions
+    on tile boundaries are exact; inside a tile, pixels are taken as spread evenly over it.
+
+    The tables of a channel are built on its first query and kept: 16 * (rows + 1) * (cols + 1)
+    bytes per frame.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        self.channels = tuple(meta["channels"])
+        self.grid = tuple(meta["grid"])
+        self.num_frames = meta["num_frames"]
+        self.frame_shape = tuple(meta["frame_shape"]) if meta["frame_shape"] else None
+        shape = (self.num_frames,) + self.grid + (len(self.channels),)
+        if self.num_frames:
+            self.means = np.memmap(os.path.join(path, MEANS_FILENAME), dtype=np.float32, mode="r", shape=shape)
+            self.variances = np.memmap(os.path.join(path, VARIANCES_FILENAME), dtype=np.float32, mode="r", shape=shape)
+            self.row_edges = np.asarray(meta["row_edges"], dtype=np.float64)
+            self.col_edges = np.asarray(meta["col_edges"], dtype=np.float64)
+            counts = np.outer(np.diff(self.row_edges), np.diff(self.col_edges))
+            self.count_table = _summed_area_table(counts)
+        else:
+            self.means = self.variances = np.empty(shape, dtype=np.float32)
+        self._tables = {}
+
+    def __len__(self):
+        return self.num_frames
+
+    def __reduce__(self):
+        # Pickle by path: the arrays stay on disk and are re-mapped on load
+        return (TileStats, (self.path,))
+
+    def _channel_index(self, channel):
+        if channel not in self.channels:
+            raise ValueError(f"Unknown channel '{channel}', expected one of {self.channels}")
+        return self.channels.index(channel)
+
+    def tiles(self, channel, frame):
+        """The (rows, cols) grids of tile means and variances of one channel in one frame."""
+        k = self._channel_index(channel)
+        return np.array(self.means[frame, ..., k]), np.array(self.variances[frame, ..., k])
+
+    def _channel_tables(self, channel):
+        if channel not in self._tables:
+            k = self._channel_index(channel)
+            counts = np.outer(np.diff(self.row_edges), np.diff(self.col_edges))
+            means = self.means[..., k].astype(np.float64)
+            sums = means * counts
+            squares = (self.variances[..., k] + means ** 2) * counts
+            self._tables[channel] = (_summed_area_table(sums), _summed_area_table(squares))
+        return self._tables[channel]
+
+    def _corners(self, region):
+        top, left, bottom, right = region
+        if not (0 <= top < bottom <= 1 and 0 <= left < right <= 1):
+            raise ValueError(f"Region must be (top, left, bottom, right) fractions with top < bottom "
+                             f"and left < right, got {region}")
+        tile_rows = np.arange(len(self.row_edges))
+        tile_cols = np.arange(len(self.col_edges))
+        y0, y1 = np.interp([top * self.row_edges[-1], bottom * self.row_edges[-1]], self.row_edges, tile_rows)
+        x0, x1 = np.interp([left * self.col_edges[-1], right * self.col_edges[-1]], self.col_edges, tile_cols)
+        return y0, x0, y1, x1
+
+    def region_stats(self, channel, region, frames=None):
+        """
+        Mean and variance of a channel over a region.
+
+        Args:
+            channel (str): One of CHANNELS.
+            region (tuple): (top, left, bottom, right) in fractions of the frame.
+            frames: Frame index, slice or index array. None for every frame.
+
+        Returns:
+            tuple: (means, variances), float64 arrays over the frames (scalars for one frame).
+        """
+        if self.num_frames == 0:
+            return np.empty(0), np.empty(0)
+        sum_table, square_table = self._channel_tables(channel)
+        if frames is not None:
+            sum_table, square_table = sum_table[frames], square_table[frames]
+        corners = self._corners(region)
+        count = _rectangle_sum(self.count_table, *corners)
+        means = _rectangle_sum(sum_table, *corners) / count
+        variances = np.maximum(_rectangle_sum(square_table, *corners) / count - means ** 2, 0.0)
+        return means, variances
+
+    def region_brightness(self, region, frames=None):
+        """Average brightness of a region, as brightness_processing computes it for whole frames."""
+        return self.region_stats("luma", region, frames)[0]
+
+    def region_chroma(self, region, frames=None):
+        """Average CIELab chroma of a region."""
+        return self.region_stats("chroma", region, frames)[0]
+
+    def region_colourfulness(self, region, frames=None):
+        """Hasler & Süsstrunk colourfulness of a region, from the means and variances of rg and yb."""
+        rg_mean, rg_var = self.region_stats("rg", region, frames)
+        yb_mean, yb_var = self.region_stats("yb", region, frames)
+        return np.sqrt(rg_var + yb_var) + 0.3 * np.sqrt(rg_mean ** 2 + yb_mean ** 2)
+
+
+def _summed_area_table(values):
+    """Summed-area table of (..., rows, cols) values, with a leading row and column of zeros."""
+    table = np.zeros(values.shape[:-2] + (values.shape[-2] + 1, values.shape[-1] + 1), dtype=np.float64)
+    table[..., 1:, 1:] = np.cumsum(np.cumsum(values, axis=-2), axis=-1)
+    return table
+
+
+def _table_at(table, y, x):
+    # Bilinear lookup: exact for a table of values spread evenly over each tile
+    rows, cols = table.shape[-2] - 1, table.shape[-1] - 1
+    iy, ix = min(int(y), rows - 1), min(int(x), cols - 1)
+    fy, fx = y - iy, x - ix
+    return ((1 - fy) * (1 - fx) * table[..., iy, ix] + (1 - fy) * fx * table[..., iy, ix + 1]
+            + fy * (1 - fx) * table[..., iy + 1, ix] + fy * fx * table[..., iy + 1, ix + 1])
+
+
+def _rectangle_sum(table, y0, x0, y1, x1):
+    return _table_at(table, y1, x1) - _table_at(table, y0, x1) - _table_at(table, y1, x0) + _table_at(table, y0, x0)
+
+
+class TileStatsStage:
+    """
+    Stream stage that writes the tile statistics of every frame to a store (see TileStatsWriter).
+    Adds no per-frame metric to the results.
+    """
+
+    def __init__(self, path, grid=DEFAULT_GRID):
+        self.writer = TileStatsWriter(path, grid)
+
+    def update(self, frame):
+        self.writer.append(frame)
+
+    def result(self):
+        self.writer.close()
+        return {}
+
+
+def save_tile_stats(source, path, grid=DEFAULT_GRID):
+    """
+    Writes the tile statistics of every frame of source to a store.
+
+    Args:
+        source: Video file, frame folder or iterable of BGR frames (see brightness_engine.iter_source_frames).
+        path (str): Directory of the store.
+        grid (tuple): (rows, cols) of tiles.
+
+    Returns:
+        str: The store path.
+    """
+    from brightness_engine import iter_source_frames
+
+    with TileStatsWriter(path, grid) as writer:
+        for frame in tqdm(iter_source_frames(source), desc="Computing tile statistics", unit="frame"):
+            writer.append(frame)
+    return path
+
+
+def parse_grid(text):
+    """Parses a grid given as ROWSxCOLS, e.g. 8x8."""
+    try:
+        rows, cols = (int(part) for part in text.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected a grid like 8x8, got '{text}'")
+    if rows < 1 or cols < 1:
+        raise argparse.ArgumentTypeError(f"Grid must have at least one row and column, got '{text}'")
+    return rows, cols
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query per-frame region statistics from a tile statistics store.")
+    parser.add_argument("store_path")
+    parser.add_argument("channel", choices=CHANNELS + ("colourfulness",))
+    parser.add_argument("--region", default="0,0,1,1",
+                        help="top,left,bottom,right in fractions of the frame, e.g. 0,0,0.333,1 for the top third")
+    parser.add_argument("--csv", default=None, help="Write per-frame values to this CSV file")
+    args = parser.parse_args(argv)
+
+    store = TileStats(args.store_path)
+    region = tuple(float(value) for value in args.region.split(","))
+    if args.channel == "colourfulness":
+        means = store.region_colourfulness(region)
+        variances = np.full(len(means), np.nan)
+    else:
+        means, variances = store.region_stats(args.channel, region)
+
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["frame", "mean", "variance"])
+            for i, (mean, variance) in enumerate(zip(means, variances)):
+                writer.writerow([i + 1, mean, variance])
+    print(f"{args.channel} over {region}: mean {np.mean(means):.3f} across {len(means)} frames")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
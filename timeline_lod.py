@@ -0,0 +1,209 @@
+import math
+import numpy as np
+
+LEVEL_FACTOR = 4  # Frames per bucket grow by this factor from one level to the next
+ZOOM_STEP = 1.5
+MIN_VIEW_FRAMES = 10
+
+
+def build_minmax_pyramid(values, factor=LEVEL_FACTOR):
+    """
+    Min/max decimation pyramid of a per-frame series.
+
+    Level k holds the minimum and maximum of each bucket of factor**k frames; level 0 is the
+    series itself. NaNs are ignored unless a whole bucket is NaN. The pyramid takes about
+    2 / (factor - 1) times the memory of the series on top of it.
+
+    Returns:
+        list of (ndarray, ndarray): (mins, maxs) per level, the last level a single bucket.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    levels = [(values, values)]
+    mins, maxs = values, values
+    while len(mins) > 1:
+        pad = (-len(mins)) % factor
+        if pad:
+            mins = np.concatenate([mins, np.full(pad, np.nan)])
+            maxs = np.concatenate([maxs, np.full(pad, np.nan)])
+        mins = np.fmin.reduce(mins.reshape(-1, factor), axis=1)
+        maxs = np.fmax.reduce(maxs.reshape(-1, factor), axis=1)
+        levels.append((mins, maxs))
+    return levels
+
+
+def level_for_range(num_frames, pixels, num_levels, factor=LEVEL_FACTOR):
+    """The coarsest level whose buckets are no wider than one pixel of a view of num_frames frames."""
+    frames_per_pixel = num_frames / max(pixels, 1)
+    if frames_per_pixel < factor:
+        return 0
+    return min(int(math.log(frames_per_pixel, factor) + 1e-9), num_levels - 1)
+
+
+def level_polyline(levels, level, start, end, factor=LEVEL_FACTOR):
+    """
+    The points drawing frames start..end at one pyramid level: the series itself at level 0,
+    otherwise each bucket as a vertical stroke from its minimum to its maximum.
+
+    Returns:
+        tuple: (x, y) arrays.
+    """
+    bucket = factor ** level
+    mins, maxs = levels[level]
+    first = max(int(start) // bucket, 0)
+    last = min(int(math.ceil((end + 1) / bucket)), len(mins))
+    if level == 0:
+        return np.arange(first, last, dtype=np.float64), mins[first:last]
+    x = np.arange(first, last) * bucket + (bucket - 1) / 2
+    return np.repeat(x, 2), np.column_stack((mins[first:last], maxs[first:last])).ravel()
+
+
+class MetricTimeline:
+    """
+    Draws a per-frame metric on a matplotlib Axes at the level of detail its pixel width needs,
+    with a playhead marker that is moved by blitting instead of redrawing the figure.
+
+    Scrolling over the axes zooms around the cursor and a double click shows the whole series.
+    When zooming in, the next coarser level is drawn first and the full detail follows through
+    `schedule`.
+
+    Parameters:
+        ax (Axes): Axes to draw on.
+        canvas (FigureCanvas): Canvas of the axes' figure; must support blitting.
+        schedule (callable): schedule(func) runs func later, e.g. Tk's after_idle. None runs it at once.
+    """
+
+    def __init__(self, ax, canvas, schedule=None):
+        self.ax = ax
+        self.canvas = canvas
+        self.schedule = schedule or (lambda func: func())
+        self.pyramids = {}  # Metric name -> pyramid, built once per loaded metric
+        self.name = None
+        self.levels = None
+        self.num_frames = 0
+        self.view = (0, 0)
+        self.drawn_level = None
+        self.playhead = 0
+        self._background = None
+        self._view_token = 0
+
+        self.line = None
+        self.marker = None
+        self._create_artists()
+        canvas.mpl_connect("draw_event", self._on_draw)
+        canvas.mpl_connect("resize_event", lambda event: self.redraw())
+        canvas.mpl_connect("scroll_event", self._on_scroll)
+        canvas.mpl_connect("button_press_event", self._on_click)
+
+    def _create_artists(self):
+        self.line, = self.ax.plot([], [], "-", linewidth=0.5, color="royalblue")
+        self.marker, = self.ax.plot([], [], "o", color="orange", markersize=4, zorder=3, animated=True)
+
+    def clear_metrics(self):
+        self.pyramids = {}
+
+    def set_metric(self, name, values, title=None):
+        """Shows a metric over its whole length. Its pyramid is built the first time it is shown."""
+        if name not in self.pyramids:
+            self.pyramids[name] = build_minmax_pyramid(values)
+        self.name = name
+        self.levels = self.pyramids[name]
+        self.num_frames = len(self.levels[0][0])
+
+        self.ax.clear()
+        self._create_artists()
+        self._background = None
+        self.drawn_level = None
+        self.ax.set_title(title or name, fontsize=5)
+        self.ax.set_xlabel("Frames", fontsize=3)
+        self.ax.set_ylabel("Value", fontsize=3)
+        self.ax.tick_params(axis='both', labelsize=3)
+        self.set_view(0, max(self.num_frames - 1, 1), progressive=False)
+
+    def pixel_width(self):
+        return max(int(self.ax.bbox.width), 1)
+
+    def set_view(self, start, end, progressive=True):
+        """
+        Shows frames start..end, clipped to the series.
+
+        Parameters:
+            progressive (bool): Draw the next coarser level first and the exact one after it.
+        """
+        if self.levels is None:
+            return
+        length = max(min(end - start, self.num_frames - 1), min(MIN_VIEW_FRAMES, self.num_frames - 1), 1)
+        start = min(max(start, 0), max(self.num_frames - 1 - length, 0))
+        self.view = (start, start + length)
+        self._view_token += 1
+
+        level = level_for_range(length, self.pixel_width(), len(self.levels))
+        if progressive and self.drawn_level is not None and level + 1 < min(self.drawn_level, len(self.levels)):
+            self._draw_level(level + 1)
+            token = self._view_token
+            self.schedule(lambda: self._view_token == token and self._draw_level(level))
+        else:
+            self._draw_level(level)
+
+    def redraw(self):
+        """Draws the current view again, e.g. after the axes changed width."""
+        if self.levels is not None:
+            self.set_view(*self.view, progressive=False)
+
+    def reset_view(self):
+        self.set_view(0, max(self.num_frames - 1, 1), progressive=False)
+
+    def zoom(self, center, factor):
+        """Zooms in (factor > 1) or out around frame center."""
+        start, end = self.view
+        length = (end - start) / factor
+        fraction = (center - start) / (end - start) if end > start else 0.5
+        new_start = center - fraction * length
+        self.set_view(int(round(new_start)), int(round(new_start + length)), progressive=factor > 1)
+
+    def _draw_level(self, level):
+        start, end = self.view
+        x, y = level_polyline(self.levels, level, start, end)
+        self.line.set_data(x, y)
+        self.ax.set_xlim(start, end)
+        finite = y[np.isfinite(y)]
+        if len(finite):
+            low, high = float(finite.min()), float(finite.max())
+            margin = (high - low) * 0.05 or 0.5
+            self.ax.set_ylim(low - margin, high + margin)
+        self.drawn_level = level
+        self.canvas.draw_idle()
+        return True
+
+    def set_playhead(self, frame):
+        """Moves the playhead marker. Only the marker is redrawn, over a saved background."""
+        self.playhead = frame
+        self._update_marker()
+        if self._background is None:
+            self.canvas.draw_idle()
+            return
+        self.canvas.restore_region(self._background)
+        self.ax.draw_artist(self.marker)
+        self.canvas.blit(self.ax.bbox)
+
+    def _update_marker(self):
+        if self.levels is None or self.num_frames == 0:
+            self.marker.set_data([], [])
+            return
+        frame = min(max(self.playhead, 0), self.num_frames - 1)
+        self.marker.set_data([frame], [self.levels[0][0][frame]])
+
+    def _on_draw(self, event):
+        # A full draw leaves out the animated marker: save the background, then draw the marker on top
+        self._background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self._update_marker()
+        self.ax.draw_artist(self.marker)
+        self.canvas.blit(self.ax.bbox)
+
+    def _on_scroll(self, event):
+        if event.inaxes is not self.ax or event.xdata is None:
+            return
+        self.zoom(event.xdata, ZOOM_STEP if event.button == "up" else 1 / ZOOM_STEP)
+
+    def _on_click(self, event):
+        if event.inaxes is self.ax and event.dblclick:
+            self.reset_view()
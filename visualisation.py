@@ -1,23 +1,59 @@
 import tkinter as tk
 from tkinter import filedialog
 import csv
-from PIL import Image, ImageTk
+from PIL import ImageTk
 import os
 from tkinter import ttk
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import matplotlib.pyplot as plt
 import numpy as np
 import re
+import time
+
+import metrics_store
+from frame_cache import FrameCache
+from playback import PlaybackClock, DEFAULT_FPS
+from timeline_lod import MetricTimeline
+
+FRAME_EXTENSIONS = ('png', 'jpg', 'jpeg')
+# Frame folders written by run.py, in the order their panels are shown
+PANEL_SUFFIXES = ("_raw", "_optical_flow", "_brightness_diff", "_optical_flow_clustering")
+MAX_PANELS = 4
+PANEL_COLUMNS = 2
 
 def natural_sort_key(s):
         """Sorts strings in a human-friendly way, handling mixed numbers and text."""
         return [int(text) if text.isdigit() else text.lower() for text in re.split(r'(\d+)', s)]
 
+def list_frames(folder):
+        return sorted([os.path.join(folder, f) for f in os.listdir(folder) if f.endswith(FRAME_EXTENSIONS)])
+
+def panel_folders(full_path, max_panels=MAX_PANELS):
+        """
+        The frame folders of a processed video to show side by side: raw, optical flow,
+        brightness difference and clustering first, then any other folder holding frames.
+
+        Returns:
+            list of (str, list of str): Folder path and its sorted frame paths.
+        """
+        def panel_order(name):
+            rank = next((i for i, suffix in enumerate(PANEL_SUFFIXES) if name.endswith(suffix)), len(PANEL_SUFFIXES))
+            return (rank, natural_sort_key(name))
+
+        panels = []
+        for name in sorted(os.listdir(full_path), key=panel_order):
+            folder = os.path.join(full_path, name)
+            if os.path.isdir(folder) and len(panels) < max_panels:
+                frames = list_frames(folder)
+                if frames:
+                    panels.append((folder, frames))
+        return panels
+
 class FramePlayer:
         
     def __init__(self, root, parent_directory):
         
-        self.num_videos_to_display = 2
+        self.num_videos_to_display = 0  # One panel per frame folder of the selected video
         
         self.root = root
         self.root.title("Frame Player")
@@ -26,12 +62,7 @@ class FramePlayer:
         self.frame = tk.Frame(root)
         self.frame.pack(fill=tk.BOTH, expand=True)
         
-        self.canvas1 = tk.Canvas(self.frame)
-        self.canvas1.grid(row=0, column=0, sticky="nsew")
-        self.canvas2 = tk.Canvas(self.frame)
-        self.canvas2.grid(row=0, column=1, sticky="nsew")
-        # self.canvas3 = tk.Canvas(self.frame)
-        # self.canvas3.grid(row=1, column=0, columnspan=2, sticky="nsew")
+        self.canvases = []
         
         self.frame.grid_rowconfigure(0, weight=1)
         self.frame.grid_rowconfigure(1, weight=1)
@@ -46,14 +77,19 @@ class FramePlayer:
         self.ax.set_xlabel("Frame", fontsize=4)
         self.ax.set_ylabel("Value", fontsize=4)
         self.ax.tick_params(axis='both', labelsize=4)
-        self.line, = self.ax.plot([], [], "r-", linewidth=0.5)  # Thinner line
         
         self.canvas_plot = FigureCanvasTkAgg(self.fig, master=root)
         self.canvas_plot.get_tk_widget().pack(fill=tk.X, expand=False, padx=20, pady=20)
+        # Level-of-detail metric plot: scroll to zoom around the cursor, double click to show everything
+        self.timeline = MetricTimeline(self.ax, self.canvas_plot, schedule=self.root.after_idle)
         
         self.btn_play_pause = tk.Button(root, text="Play", command=self.toggle_playback)
         self.btn_play_pause.pack()
         
+        # Playback counters
+        self.stats_label = tk.Label(root, text="", font=("Helvetica", 9))
+        self.stats_label.pack()
+        
         self.dropdown_label = tk.Label(root, text="Select Dataset Folder:")
         self.dropdown_label.pack()
         
@@ -74,11 +110,14 @@ class FramePlayer:
         self.slider = tk.Scale(root, from_=0, to=100, orient=tk.HORIZONTAL, command=self.set_frame, length=800)
         self.slider.pack(fill=tk.X)
         
-        self.folders = [[], [], []]
-        self.frame_indices = [0, 0, 0]
+        self.folders = []
+        self.current_frame = 0  # Shared timeline of all panels
+        self.num_frames = 0
         self.playing = False
         self.metrics_data = {}
-        self.loaded_images = [[], [], []]  # Store preloaded images for fast display
+        self.frame_caches = []  # Display-sized frames, decoded on demand and prefetched
+        self.play_direction = 1
+        self.clock = PlaybackClock(0, fps=DEFAULT_FPS)
         
         self.root.bind("<Configure>", self.resize_canvases)
         self.populate_dropdown()
@@ -108,47 +147,17 @@ class FramePlayer:
         
         
     def update_graph(self, full_redraw=True):
-        """Optimized: Only update the scatter marker when moving frames."""
+        """
+        Redraws the metric timeline when switching metrics or reloading data, otherwise only
+        moves the playhead marker (blitted, without redrawing the figure).
+        """
         if not self.metrics_data or not self.selected_metric:
             return  # Exit if no data is loaded
 
-        # Get the metric values (cache them for performance)
-        if not hasattr(self, "cached_metric_values") or full_redraw:
-            self.cached_metric_values = self.metrics_data.get(self.selected_metric, [])
-
-        metric_values = self.cached_metric_values
-        frames = list(range(len(metric_values)))
-
-        # Ensure the current frame is within range
-        current_frame = self.frame_indices[0]
-        if current_frame >= len(metric_values):
-            current_frame = len(metric_values) - 1
-
         if full_redraw:
-            # **Redraw the entire graph only when switching metrics or reloading data**
-            self.ax.clear()
-            self.line, = self.ax.plot(frames, metric_values, "r-", linewidth=0.5, label=self.selected_metric, color="royalblue")
-
-            # **Create the scatter marker ONCE and store the reference**
-            self.current_marker = self.ax.scatter([current_frame], [metric_values[current_frame]], 
-                                                color="orange", s=20, zorder=3, label="Current Frame")
-
-            # Formatting
-            self.ax.set_title(self.selected_metric, fontsize=5)
-            self.ax.set_xlabel("Frames", fontsize=3)
-            self.ax.set_ylabel("Value", fontsize=3)
-            self.ax.tick_params(axis='both', labelsize=3)
-            self.ax.set_xticks(frames[::100])  # Reduce x-ticks
-            self.ax.legend(fontsize=6, loc="upper right")
-
-        else:
-            # **Only move the marker, instead of redrawing everything**
-            self.current_marker.set_offsets([[current_frame, metric_values[current_frame]]])
+            self.timeline.set_metric(self.selected_metric, self.metrics_data.get(self.selected_metric, []))
+        self.timeline.set_playhead(self.current_frame)
 
-        self.canvas_plot.draw_idle()  # Use draw_idle() instead of draw() for better performance
-
-
-        
     def on_metric_selected(self, event):
         """Handles when the user selects a new metric."""
         self.selected_metric = self.metric_var.get()
@@ -165,15 +174,14 @@ class FramePlayer:
     def load_selected_folder(self, event):
         """Loads images and metrics when a folder is selected from the dropdown."""
         
-        # 1. Close previously opened images to prevent memory leaks
-        for i in range(self.num_videos_to_display):
-            for img in self.loaded_images[i]:
-                img.close()
-            self.loaded_images[i] = []  # Clear loaded images
+        # 1. Stop playback and the frame caches of the previous folder
+        if self.playing:
+            self.toggle_playback()
+        self.close_frame_caches()
 
         # 2. Reset state
-        self.folders = [[], [], []]
-        self.frame_indices = [0, 0, 0]
+        self.folders = []
+        self.current_frame = 0
         self.metrics_data = {}
 
         # 3. Reset UI elements
@@ -187,20 +195,18 @@ class FramePlayer:
         selected_folder = self.folder_var.get()
         full_path = os.path.join(self.parent_directory, selected_folder)
         
-        subfolders = sorted([os.path.join(full_path, d) for d in os.listdir(full_path) if os.path.isdir(os.path.join(full_path, d))])
-        if len(subfolders) >= self.num_videos_to_display:
-            for i in range(self.num_videos_to_display):
-                self.folders[i] = sorted([os.path.join(subfolders[i], f) for f in os.listdir(subfolders[i]) if f.endswith(('png', 'jpg', 'jpeg'))])
-                self.frame_indices[i] = 0
-                self.loaded_images[i] = [Image.open(f) for f in self.folders[i]]  # Pre-load images
-                
-            self.slider.config(to=len(self.folders[0]) - 1)
+        panels = panel_folders(full_path)
+        self.folders = [frames for _, frames in panels]
+        self.frame_caches = [FrameCache(frames) for frames in self.folders]
+        self.build_panels(len(panels))
+        self.set_timeline_length()
+        if panels:
             self.show_frame()
 
         # 5. Load metrics
         print(f"Loading: {full_path}")
-        metrics_file = os.path.join(full_path, "brightness.csv")
-        if os.path.exists(metrics_file):
+        metrics_files = [os.path.join(full_path, metrics_store.METRICS_FILENAME), os.path.join(full_path, "brightness.csv")]
+        if any(os.path.exists(f) for f in metrics_files):
             self.metrics_data = self.load_metrics(full_path)
             
         self.update_graph()
@@ -209,38 +215,62 @@ class FramePlayer:
     def load_folder(self, index):
         folder_selected = filedialog.askdirectory()
         if folder_selected:
-            self.folders[index] = sorted([os.path.join(folder_selected, f) for f in os.listdir(folder_selected) if f.endswith(('png', 'jpg', 'jpeg'))])
-            self.frame_indices[index] = 0
-            self.loaded_images[index] = [Image.open(f) for f in self.folders[index]]  # Pre-load images
-            if self.folders[index]:
-                self.slider.config(to=len(self.folders[index]) - 1)
+            if index >= len(self.folders):
+                index = len(self.folders)
+                self.folders.append([])
+                self.frame_caches.append(None)
+                self.build_panels(len(self.folders))
+            self.folders[index] = list_frames(folder_selected)
+            if self.frame_caches[index] is not None:
+                self.frame_caches[index].close()
+            self.frame_caches[index] = FrameCache(self.folders[index])
+            self.set_timeline_length()
             self.show_frame()
     
 
+    def close_frame_caches(self):
+        for cache in self.frame_caches:
+            if cache is not None:
+                cache.close()
+        self.frame_caches = []
+
+    def build_panels(self, num_panels):
+        """Replaces the frame canvases with num_panels canvases, PANEL_COLUMNS per row."""
+        for canvas in self.canvases:
+            canvas.destroy()
+        self.canvases = []
+        for i in range(num_panels):
+            canvas = tk.Canvas(self.frame)
+            canvas.grid(row=i // PANEL_COLUMNS, column=i % PANEL_COLUMNS, sticky="nsew")
+            self.canvases.append(canvas)
+        self.num_videos_to_display = num_panels
+
+    def set_timeline_length(self):
+        """The timeline spans the longest panel; shorter panels hold their last frame."""
+        self.num_frames = max((len(frames) for frames in self.folders), default=0)
+        self.clock.num_frames = self.num_frames
+        self.current_frame = min(self.current_frame, max(self.num_frames - 1, 0))
+        self.slider.config(to=max(self.num_frames - 1, 0))
+
     def load_metrics(self, full_path):
-        # Define the CSV files to read from
-        csv_files = {
-            "brightness": os.path.join(full_path, "brightness.csv"),
-            "optical_flow_magnitude": os.path.join(full_path, "optical_flow_magnitude.csv"),
-            "HS_colourfulness": os.path.join(full_path, "HS_colourfulness.csv")
-            
-        }
-        
+        metric_names = ["brightness", "optical_flow_magnitude", "HS_colourfulness"]
         metrics_dict = {}
 
-        for metric_name, file_name in csv_files.items():
-            if os.path.exists(file_name):  # Ensure the file exists before reading
-                with open(file_name, newline='') as csvfile:
-                    reader = csv.reader(csvfile)
-                    header = next(reader)  # Read and ignore the header (frame numbers)
-                    row = next(reader)  # Read the actual metric values
-                    
-                    metric = row[0]  # The first column contains the metric name
-                    values = list(map(float, row[1:]))  # Convert the remaining columns to float
-                    
+        metrics_file = os.path.join(full_path, metrics_store.METRICS_FILENAME)
+        if os.path.exists(metrics_file):
+            # Memory-mapped columns of the columnar metrics file, only the ones we plot
+            loaded = metrics_store.load_metrics(metrics_file, columns=metric_names)
+            metrics_dict = {name: loaded[name] for name in metric_names if name in loaded}
+        else:
+            # Older folders only have the one-row-wide CSVs
+            for metric_name in metric_names:
+                file_name = os.path.join(full_path, f"{metric_name}.csv")
+                if os.path.exists(file_name):  # Ensure the file exists before reading
+                    metric, values, _ = metrics_store.read_flat_csv(file_name)
                     metrics_dict[metric] = values  # Store values under the correct key
-        
+
         self.metrics_data = metrics_dict  # Store loaded metrics
+        self.timeline.clear_metrics()
 
         # Populate the dropdown with metric names
         metric_names = list(metrics_dict.keys())
@@ -283,13 +313,15 @@ class FramePlayer:
         #Per frame metrics
         
         # Create a string displaying the metrics for the current frame
-        frame_index = self.frame_indices[0]
+        frame_index = self.current_frame
         metrics_text = f"Frame {frame_index + 1}\n\n"
         values_text = f"     \n\n"
                 
         # Create a fixed-size container for metrics
         for metric, values in self.metrics_data.items():
-            value = f"{values[frame_index]:.3f}"
+            if len(values) == 0:
+                continue
+            value = f"{values[min(frame_index, len(values) - 1)]:.3f}"
             
             # Adjust the spacing between metric and value based on the length of the metric
             metrics_text += f"{metric}:\n"
@@ -300,46 +332,67 @@ class FramePlayer:
         
             
     def show_frame(self):
-        canvases = [self.canvas1, self.canvas2]
+        canvases = self.canvases
         for i in range(self.num_videos_to_display):
             if self.folders[i]:
-                # Get the image from pre-loaded list
-                img = self.loaded_images[i][self.frame_indices[i]]
                 width = canvases[i].winfo_width()
                 height = canvases[i].winfo_height()
-                if width > 0 and height > 0:
-                    img.thumbnail((width, height), Image.Resampling.LANCZOS)
+                if width > 1 and height > 1:
+                    # Every panel shows the shared timeline's frame, or its last one if it is shorter.
+                    # The cache decodes frames at canvas size and prefetches the ones after the playhead
+                    frame_index = min(self.current_frame, len(self.folders[i]) - 1)
+                    cache = self.frame_caches[i]
+                    cache.set_display_size((width, height))
+                    img = cache.get(frame_index)
+                    cache.seek(frame_index, self.play_direction)
                     photo = ImageTk.PhotoImage(img)
                     canvases[i].delete("all")  # Clear previous image
                     canvases[i].create_image(width // 2, height // 2, anchor=tk.CENTER, image=photo)
                     canvases[i].photo = photo  # Keep reference
-        self.slider.set(self.frame_indices[0])
+        self.slider.set(self.current_frame)
         self.show_metrics()  # Update metrics display when a frame is shown
     
     def toggle_playback(self):
         self.playing = not self.playing
         self.btn_play_pause.config(text="Pause" if self.playing else "Play")
         if self.playing:
+            self.clock.reset_stats()
+            self.clock.seek(self.current_frame)
             self.play_frames()
+        else:
+            self.clock.stop()
 
     def play_frames(self):
-        if self.playing:
-            for i in range(self.num_videos_to_display):
-                if self.folders[i]:
-                    self.frame_indices[i] = (self.frame_indices[i] + 1) % len(self.folders[i])
-            
+        """
+        Shows the frame the playback clock says is due. When rendering takes longer than a
+        frame interval, the frames in between are dropped, so playback keeps real time and
+        all panels stay on the same frame.
+        """
+        if not self.playing:
+            return
+        frame = self.clock.tick()
+        if frame is not None:
+            start = time.perf_counter()
+            self.play_direction = 1
+            self.current_frame = frame
             self.show_frame()
             self.update_graph(full_redraw=False)  # Only move the marker
-            self.root.after(33, self.play_frames)  # ~30 FPS
+            self.root.update_idletasks()  # Draw now, so the render time includes drawing
+            self.clock.record_render(time.perf_counter() - start)
+            self.stats_label.config(text=self.clock.status_text())
+        self.root.after(max(1, int(self.clock.seconds_until_next() * 1000)), self.play_frames)
     
     def resize_canvases(self, event):
         self.show_frame()
     
     def set_frame(self, value):
         frame_number = int(value)
-        for i in range(self.num_videos_to_display):
-            if self.folders[i]:
-                self.frame_indices[i] = frame_number % len(self.folders[i])
+        if frame_number == self.current_frame or self.num_frames == 0:
+            return  # The slider echoing show_frame's slider.set
+        self.play_direction = 1 if frame_number > self.current_frame else -1
+        self.current_frame = frame_number % self.num_frames
+        if self.playing:
+            self.clock.seek(self.current_frame)  # Continue playing from here
         self.show_frame()
         self.update_graph(full_redraw=False)  # **Only move the marker**
 